@@ -1,3 +1,18 @@
 from django.contrib import admin
 
-# Register your models here.
+from . import models
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = (
+        'created', 'view', 'duration', 'params'
+    )
+    list_filter = (
+        'view',
+    )
+    readonly_fields = (
+        'created', 'view', 'params', 'duration', 'sql', 'plan'
+    )
+
+
+admin.site.register(models.SlowQuery, SlowQueryAdmin)
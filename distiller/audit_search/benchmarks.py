@@ -0,0 +1,468 @@
+"""
+Benchmark the search page against a synthetic FAC dataset.
+
+`generate_dataset` fills the FAC tables with random audits, CFDAs, findings
+and assistance listings, at a multiple of production row counts.
+`run_benchmarks` then runs each representative search (see `SEARCH_SHAPES`)
+through `single_audit_search` and reports latency percentiles and query
+counts, so changes to `AuditQuerySet` can be compared. `run_render_benchmark`
+times rendering a page of results, and compares the memory used to hold it
+as `AuditRow`s and as `Audit` instances.
+
+See the `benchmark_search` management command.
+"""
+
+import itertools
+import math
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List, NamedTuple
+
+from django.core.paginator import Paginator
+from django.db import connection, models as django_models
+from django.template.loader import render_to_string
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from distiller.data import models
+from distiller.data.etls import load_dumps, partitions
+from . import summaries
+
+
+# Approximate production row counts, for `scale=1`
+PRODUCTION_ROW_COUNTS = {
+    'audit': 320_000,
+    'cfda': 2_600_000,
+    'findingtext': 130_000,
+}
+
+AUDIT_YEARS = (2016, 2017, 2018, 2019)
+
+# Relative number of CFDAs per agency prefix; most awards come from a few
+# large agencies.
+AGENCY_WEIGHTS = {
+    '93': 30, '10': 20, '84': 15, '14': 10, '20': 10, '97': 5, '16': 5, '11': 5,
+}
+
+# Sub-agencies (assistance listing federal agencies) per agency prefix
+SUB_AGENCIES_PER_AGENCY = 3
+
+# Programs (CFDA numbers) per sub-agency
+PROGRAMS_PER_SUB_AGENCY = 20
+
+SORT_OPTIONS = (
+    'auditee_name', 'fy_end_date', 'fac_accepted_date', 'cog_over',
+    'material_weakness', 'qcosts', 'num_findings',
+)
+
+COPY_BATCH_SIZE = 10_000
+
+
+def sub_agency_name(prefix: str, index: int) -> str:
+    return f'Agency {prefix} Office {index}'
+
+
+# Representative searches, by name. `agency` is filled in by `run_benchmarks`.
+SEARCH_SHAPES = {
+    'agency': {},
+    'agency, findings only': {'findings': 'on'},
+    'sub-agency': {'sub_agency': sub_agency_name('{agency}', 0)},
+    'sub-agency, findings only': {
+        'sub_agency': sub_agency_name('{agency}', 0), 'findings': 'on',
+    },
+    'cognizant/oversight': {'agency_cog_oversight': 'on'},
+    'audit year': {'audit_year': '2019', 'findings': 'on'},
+    'accepted date range': {
+        'start_date': '2019-01-01', 'end_date': '2019-06-30', 'findings': 'on',
+    },
+    'last page': {'findings': 'on', 'page': '1000000'},
+    **{
+        f'sort by {sort}': {'sort': sort, 'findings': 'on'}
+        for sort in SORT_OPTIONS
+    },
+}
+
+
+def _instance(model, **values):
+    """
+    Build a `model` instance from `values`, with placeholders for any other
+    required fields.
+    """
+
+    placeholders = {
+        'JSONField': {},
+        'DateField': date(2019, 1, 1),
+        'BooleanField': False,
+        'IntegerField': 0,
+        'DecimalField': 0,
+    }
+    for field in model._meta.concrete_fields:  # pylint: disable=W0212
+        if (
+            field.null
+            or field.has_default()
+            or isinstance(field, django_models.AutoField)
+            or field.attname in values
+        ):
+            continue
+        values[field.attname] = placeholders.get(field.get_internal_type(), '')
+    return model(**values)
+
+
+def _copy(model, instances: Iterator) -> int:
+    count = 0
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(itertools.islice(instances, COPY_BATCH_SIZE))
+            if not batch:
+                return count
+            partitions.copy_instances(
+                cursor, model._meta.db_table, model, batch  # pylint: disable=W0212
+            )
+            count += len(batch)
+
+
+def _programs() -> Dict[str, List[str]]:
+    """
+    Return the CFDA numbers of each agency prefix.
+    """
+
+    return {
+        prefix: [
+            f'{prefix}.{number:03d}'
+            for number in range(SUB_AGENCIES_PER_AGENCY * PROGRAMS_PER_SUB_AGENCY)
+        ]
+        for prefix in AGENCY_WEIGHTS
+    }
+
+
+def _yield_listings(programs):
+    for prefix, program_numbers in programs.items():
+        for index, program_number in enumerate(program_numbers):
+            yield _instance(
+                models.AssistanceListing,
+                program_number=program_number,
+                program_title=f'Program {program_number}',
+                federal_agency=sub_agency_name(
+                    prefix, index // PROGRAMS_PER_SUB_AGENCY
+                ),
+            )
+
+
+def _yield_audits(rng, audit_count):
+    prefixes = list(AGENCY_WEIGHTS)
+    for index in range(audit_count):
+        audit_year = AUDIT_YEARS[index % len(AUDIT_YEARS)]
+        yield _instance(
+            models.Audit,
+            audit_year=audit_year,
+            dbkey=str(100_000 + index),
+            fy_end_date=date(audit_year, 6, 30),
+            period_covered='A',
+            ein=f'{rng.randrange(10 ** 9):09d}',
+            auditee_name=f'Auditee {rng.randrange(audit_count):07d}',
+            tot_fed_expend=rng.randrange(750_000, 50_000_000),
+            date_firewall=date(audit_year, 12, 31),
+            fac_accepted_date=date(audit_year, 7, 1) + timedelta(
+                days=rng.randrange(365)
+            ),
+            cog_over=rng.choice('CO'),
+            cog_agency=rng.choice(prefixes),
+            material_weakness=rng.random() < 0.1,
+            qcosts=rng.random() < 0.1,
+        )
+
+
+def _yield_cfdas(rng, audit_count, cfdas_per_audit, programs, first_cfda_ids):
+    """
+    Yield a random number of CFDAs per audit, noting the ID of each audit's
+    first CFDA in `first_cfda_ids`, by audit index.
+    """
+
+    prefixes = list(AGENCY_WEIGHTS)
+    weights = list(AGENCY_WEIGHTS.values())
+    elec_audits_id = 0
+    for index in range(audit_count):
+        first_cfda_ids[index] = elec_audits_id + 1
+        # Vary the number of awards per audit around the average.
+        for _ in range(max(1, round(rng.expovariate(1 / cfdas_per_audit)))):
+            elec_audits_id += 1
+            prefix = rng.choices(prefixes, weights)[0]
+            cfda_id = rng.choice(programs[prefix])
+            yield _instance(
+                models.CFDA,
+                elec_audits_id=elec_audits_id,
+                audit_year=AUDIT_YEARS[index % len(AUDIT_YEARS)],
+                dbkey=str(100_000 + index),
+                ein='123456789',
+                cfda_id=cfda_id,
+                agency_prefix=models.get_agency_prefix(cfda_id),
+                federal_program_name=f'Program {cfda_id}',
+                amount=rng.randrange(1_000, 5_000_000),
+            )
+
+
+def _yield_finding_texts(rng, audit_count, finding_text_rate, first_cfda_ids):
+    """
+    Yield a finding text, its finding and its corrective action plan for a
+    random `finding_text_rate` of audits.
+    """
+
+    seq_number = 0
+    for index in range(audit_count):
+        if rng.random() >= finding_text_rate:
+            continue
+        seq_number += 1
+        finding_ref_nums = f'2019-{seq_number % 1000:03d}'
+        audit_key = {
+            'audit_year': AUDIT_YEARS[index % len(AUDIT_YEARS)],
+            'dbkey': str(100_000 + index),
+            'finding_ref_nums': finding_ref_nums,
+        }
+        yield (
+            _instance(
+                models.FindingText,
+                seq_number=seq_number,
+                text=f'Finding {seq_number}',
+                charts_tables=False,
+                **audit_key,
+            ),
+            _instance(
+                models.Finding,
+                elec_audit_findings_id=seq_number,
+                elec_audits_id=first_cfda_ids[index],
+                repeat_finding=rng.random() < 0.3,
+                **audit_key,
+            ),
+            _instance(
+                models.CAPText,
+                seq_number=seq_number,
+                text=f'Corrective action plan {seq_number}',
+                charts_tables=False,
+                **audit_key,
+            ),
+        )
+
+
+def generate_dataset(scale: float, seed: int = 0) -> Dict[str, int]:
+    """
+    Fill the FAC tables with random data, at `scale` times production row
+    counts. Returns the number of rows created per table.
+    """
+
+    rng = random.Random(seed)
+    audit_count = max(1, round(PRODUCTION_ROW_COUNTS['audit'] * scale))
+    cfdas_per_audit = PRODUCTION_ROW_COUNTS['cfda'] / PRODUCTION_ROW_COUNTS['audit']
+    finding_text_rate = (
+        PRODUCTION_ROW_COUNTS['findingtext'] / PRODUCTION_ROW_COUNTS['audit']
+    )
+    programs = _programs()
+    first_cfda_ids: Dict[int, int] = {}
+
+    counts = {
+        'assistancelisting': _copy(
+            models.AssistanceListing, _yield_listings(programs)
+        ),
+        'audit': _copy(models.Audit, _yield_audits(rng, audit_count)),
+        'cfda': _copy(
+            models.CFDA,
+            _yield_cfdas(rng, audit_count, cfdas_per_audit, programs, first_cfda_ids)
+        ),
+    }
+
+    finding_texts, findings, cap_texts = [], [], []
+    for finding_text, finding, cap_text in _yield_finding_texts(
+        rng, audit_count, finding_text_rate, first_cfda_ids
+    ):
+        finding_texts.append(finding_text)
+        findings.append(finding)
+        cap_texts.append(cap_text)
+    counts['findingtext'] = _copy(models.FindingText, iter(finding_texts))
+    counts['finding'] = _copy(models.Finding, iter(findings))
+    counts['captext'] = _copy(models.CAPText, iter(cap_texts))
+
+    load_dumps.update_audit_agencies()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    return counts
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    params: dict
+    p50: float
+    p95: float
+    queries: int
+    status_code: int
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Nearest-rank percentile of `values`.
+    """
+
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_benchmarks(
+    agency: str = '93',
+    repeat: int = 10,
+    shapes: Dict[str, dict] = SEARCH_SHAPES,
+) -> List[BenchmarkResult]:
+    """
+    Run each search in `shapes` for `agency` `repeat` times, after a warm-up
+    run, through the search view.
+    """
+
+    # Imported here so the search view's dependencies are only loaded when
+    # benchmarking.
+    from .views import single_audit_search
+
+    request_factory = RequestFactory()
+    results = []
+    for name, shape in shapes.items():
+        params = {
+            'agency': agency,
+            'fmt': 'html',
+            **{key: value.format(agency=agency) for key, value in shape.items()},
+        }
+
+        single_audit_search(request_factory.get('/', params))
+
+        durations = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = single_audit_search(request_factory.get('/', params))
+                durations.append(time.perf_counter() - start)
+
+        results.append(BenchmarkResult(
+            name=name,
+            params=params,
+            p50=percentile(durations, 50),
+            p95=percentile(durations, 95),
+            queries=len(queries),
+            status_code=response.status_code,
+        ))
+
+    return results
+
+
+def audit_row_values(dbkey: int, num_finding_texts: int = 20) -> dict:
+    """
+    Return the `values()` of a search result, as selected by
+    `summaries.AUDIT_ROW_VALUES`, with `num_finding_texts` long finding texts.
+    """
+
+    finding_texts = [
+        {
+            'seq_number': dbkey * 100 + index,
+            'audit_year': 2019,
+            'dbkey': str(dbkey),
+            'finding_ref_nums': f'2019-{index:03}',
+            'text': 'Finding text. ' * 200,
+            'findings': [{
+                'cfda_id': '93.045',
+                'federal_program_name': 'Nutrition Services',
+                'amount': '1234.00',
+                'modified_opinion': False,
+                'material_weakness': True,
+                'significant_deficiency': False,
+                'questioned_costs': False,
+                'repeat_finding': True,
+            }],
+            'cap_texts': [{'text': 'CAP text'}],
+        }
+        for index in range(num_finding_texts)
+    ]
+    return {
+        **{field: None for field in summaries.AUDIT_ROW_VALUES},
+        'audit_year': Decimal(2019),
+        'dbkey': str(dbkey),
+        'auditee_name': f'Auditee {dbkey}',
+        'fy_end_date': date(2019, 6, 30),
+        'fac_accepted_date': date(2020, 1, 15),
+        'cog_over': 'C',
+        'cog_agency': '93',
+        'tot_fed_expend': Decimal(1_000_000),
+        'num_findings': num_finding_texts,
+        'finding_texts_json': finding_texts,
+        'current_audit_id': dbkey,
+        'current_audit_version': 1,
+        'current_audit_file_name': f'{dbkey}20191.pdf',
+    }
+
+
+class RenderBenchmarkResult(NamedTuple):
+    results: int
+    finding_texts: int
+    p50: float
+    row_bytes: int
+    audit_bytes: int
+
+
+def _traced_memory(build):
+    tracemalloc.start()
+    try:
+        built = build()
+        return tracemalloc.get_traced_memory()[0], built
+    finally:
+        tracemalloc.stop()
+
+
+def run_render_benchmark(
+    agency: str = '93',
+    results: int = 25,
+    finding_texts: int = 20,
+    repeat: int = 10,
+) -> RenderBenchmarkResult:
+    """
+    Render a search results page of `results` synthetic audits, with
+    `finding_texts` finding texts each, `repeat` times, and measure the
+    memory used to hold the page as `AuditRow`s and as `Audit` instances.
+    """
+
+    values = [
+        audit_row_values(dbkey, finding_texts)
+        for dbkey in range(100_000, 100_000 + results)
+    ]
+    row_bytes, rows = _traced_memory(
+        lambda: [summaries.AuditRow(**row) for row in values]
+    )
+    audit_bytes, _audits = _traced_memory(lambda: [
+        models.Audit(**{name: row[name] for name in summaries.AUDIT_ROW_FIELDS})
+        for row in values
+    ])
+
+    # Imported here so the search view's dependencies are only loaded when
+    # benchmarking.
+    from .forms import AgencySelectionForm
+
+    request = RequestFactory().get('/', {'agency': agency})
+    page = Paginator(rows, results).get_page(1)
+    durations = []
+    # Only rendering is measured: don't require collected static files.
+    with override_settings(
+        STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'
+    ):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render_to_string('audit_search/search.html', {
+                'form': AgencySelectionForm(request.GET),
+                'page': page,
+                'finding_texts': summaries.get_page_finding_texts(page.object_list),
+            }, request=request)
+            durations.append(time.perf_counter() - start)
+
+    return RenderBenchmarkResult(
+        results=results,
+        finding_texts=finding_texts,
+        p50=percentile(durations, 50),
+        row_bytes=row_bytes,
+        audit_bytes=audit_bytes,
+    )
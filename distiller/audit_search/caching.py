@@ -0,0 +1,76 @@
+"""
+Caching of pages that only change when FAC data is loaded.
+
+FAC tables are reloaded nightly, so rendered pages are cached per "load
+version": the time of the most recent table load or document crawl. A new
+load changes the version, which changes both the cache keys and the
+ETag/Last-Modified used to answer conditional requests.
+"""
+
+import functools
+
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+from distiller.data import models
+
+
+LOAD_VERSION_CACHE_KEY = 'audit_search:load_version'
+
+# Seconds to reuse the load version before checking `ETLLog` again. Loads run
+# in a separate process, so this bounds how long stale pages are served.
+LOAD_VERSION_TIMEOUT = 60
+
+# Seconds to keep a rendered page for a given load version
+PAGE_TIMEOUT = 24 * 60 * 60
+
+
+def get_load_version():
+    """
+    Return the time of the most recent data load, or None if nothing has
+    been loaded.
+    """
+
+    version = cache.get(LOAD_VERSION_CACHE_KEY)
+    if version is None:
+        last_change = models.ETLLog.objects.get_most_recent_data_change()
+        # Cache an empty version, so unloaded databases are not re-queried.
+        version = last_change.created if last_change else ''
+        cache.set(LOAD_VERSION_CACHE_KEY, version, LOAD_VERSION_TIMEOUT)
+
+    return version or None
+
+
+def _etag(request, *args, **kwargs):
+    version = get_load_version()
+    if version is None:
+        return None
+    return f'{request.path}:{version.timestamp():.0f}'
+
+
+def _last_modified(request, *args, **kwargs):
+    return get_load_version()
+
+
+def cache_per_load(view):
+    """
+    Cache a view's responses until the next data load, keyed by the request
+    path and the load version, and answer conditional GETs with 304s.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        version = get_load_version()
+        if version is None or request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        # The path identifies the page, e.g. by audit pk.
+        key = f'audit_search:page:{request.path}:{version.timestamp():.0f}'
+        response = cache.get(key)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response, PAGE_TIMEOUT)
+        return response
+
+    return condition(etag_func=_etag, last_modified_func=_last_modified)(wrapper)
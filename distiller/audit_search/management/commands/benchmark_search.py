@@ -0,0 +1,87 @@
+"""
+This module contains a Django management command to benchmark the search
+page against a synthetic FAC dataset.
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from distiller.data import models
+from ... import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark search queries against a synthetic FAC dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=0.01,
+            help='Dataset size, as a multiple of production row counts',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=10,
+            help='Times to run each search',
+        )
+        parser.add_argument(
+            '--agency',
+            default='93',
+            choices=list(benchmarks.AGENCY_WEIGHTS),
+            help='Agency prefix to search for',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for the dataset',
+        )
+
+    def handle(self, *args, **options):
+        if models.Audit.objects.exists():
+            raise CommandError(
+                'The database already has audits; benchmark with an empty database.'
+            )
+
+        # The dataset is generated and searched in a transaction that is
+        # rolled back, leaving the database empty again.
+        with transaction.atomic():
+            sys.stdout.write(f'Generating dataset at {options["scale"]}x...\n')
+            sys.stdout.flush()
+            counts = benchmarks.generate_dataset(options['scale'], seed=options['seed'])
+            for table, count in counts.items():
+                sys.stdout.write(f'\t{table}: {count} rows\n')
+
+            sys.stdout.write(f'Running searches {options["repeat"]} times each...\n')
+            sys.stdout.flush()
+            results = benchmarks.run_benchmarks(
+                agency=options['agency'],
+                repeat=options['repeat'],
+            )
+            render = benchmarks.run_render_benchmark(
+                agency=options['agency'],
+                repeat=options['repeat'],
+            )
+
+            transaction.set_rollback(True)
+
+        sys.stdout.write(
+            f'{"search":<32} {"p50 ms":>8} {"p95 ms":>8} {"queries":>8}\n'
+        )
+        for result in results:
+            sys.stdout.write(
+                f'{result.name:<32} {result.p50 * 1000:>8.1f} '
+                f'{result.p95 * 1000:>8.1f} {result.queries:>8}'
+                + ('' if result.status_code == 200 else f'  (HTTP {result.status_code})')
+                + '\n'
+            )
+
+        sys.stdout.write(
+            f'Rendered {render.results} results with {render.finding_texts} '
+            f'finding texts each in {render.p50 * 1000:.1f}ms (p50); held in '
+            f'{render.row_bytes} bytes as rows, {render.audit_bytes} bytes as Audits\n'
+        )
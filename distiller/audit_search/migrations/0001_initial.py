@@ -0,0 +1,29 @@
+# Generated by Django 3.1.14 on 2026-10-19 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('view', models.CharField(max_length=128)),
+                ('params', models.JSONField(default=dict)),
+                ('sql', models.TextField()),
+                ('duration', models.FloatField(help_text='Seconds')),
+                ('plan', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name_plural': 'slow queries',
+            },
+        ),
+    ]
@@ -1,3 +1,37 @@
 from django.db import models
 
-# Create your models here.
+
+# Number of slow queries kept; older ones are deleted as new ones are logged.
+SLOW_QUERY_LOG_SIZE = 500
+
+
+class SlowQueryManager(models.Manager):
+    def log(self, **fields):
+        """
+        Log a slow query, dropping the oldest beyond `SLOW_QUERY_LOG_SIZE`.
+        """
+
+        slow_query = self.create(**fields)
+        self.filter(id__lte=slow_query.id - SLOW_QUERY_LOG_SIZE).delete()
+        return slow_query
+
+
+class SlowQuery(models.Model):
+    """
+    A search query that took longer than `settings.SLOW_QUERY_THRESHOLD`,
+    with the request parameters that generated it and its query plan.
+    """
+
+    objects = SlowQueryManager()
+
+    created = models.DateTimeField(auto_now_add=True)
+    view = models.CharField(max_length=128)
+    # Non-empty query parameters of the request, sorted by name
+    params = models.JSONField(default=dict)
+    sql = models.TextField()
+    duration = models.FloatField(help_text='Seconds')
+    # Output of EXPLAIN (ANALYZE, BUFFERS)
+    plan = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name_plural = 'slow queries'
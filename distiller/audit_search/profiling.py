@@ -0,0 +1,123 @@
+"""
+Capture slow search queries, with their query plans.
+
+When `settings.SLOW_QUERY_THRESHOLD` is set, views decorated with
+`log_slow_queries` time each database query they make. Those that take
+longer than the threshold are logged as `SlowQuery` rows, along with the
+request parameters and `EXPLAIN (ANALYZE, BUFFERS)` output, so slow searches
+can be reproduced from real traffic. Streaming responses (CSV exports) run
+their queries while the content is sent, so those are timed as the content
+is consumed, and logged once it has been sent.
+
+EXPLAIN ANALYZE runs the query again, so this roughly doubles the cost of
+each slow query; leave the setting unset unless investigating performance.
+"""
+
+import functools
+import time
+from typing import Tuple
+
+from django.conf import settings
+from django.db import connection
+
+from .models import SlowQuery
+
+
+def normalize_params(query_dict) -> dict:
+    """
+    Return the non-empty parameters of `query_dict` (`request.GET`), sorted
+    by name. Parameters given more than once map to a list of values.
+    """
+
+    params = {}
+    for name, values in sorted(query_dict.lists()):
+        values = [value for value in values if value]
+        if values:
+            params[name] = values[0] if len(values) == 1 else values
+    return params
+
+
+class SlowQueryRecorder:
+    """
+    Database execute wrapper collecting SELECT queries slower than
+    `threshold` seconds, as (sql, params, duration).
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.slow_queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.monotonic() - start
+            if (
+                duration > self.threshold
+                and not many
+                and sql.lstrip().upper().startswith('SELECT')
+            ):
+                self.slow_queries.append((sql, params, duration))
+
+
+def explain(sql: str, params) -> Tuple[str, str]:
+    """
+    Return the query with its parameters filled in, and its query plan.
+    """
+
+    with connection.cursor() as cursor:
+        query = cursor.mogrify(sql, params).decode()
+        cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {query}')
+        return query, '\n'.join(row[0] for row in cursor.fetchall())
+
+
+def _log_slow_queries(view, request, recorder: SlowQueryRecorder):
+    params = normalize_params(request.GET)
+    for sql, sql_params, duration in recorder.slow_queries:
+        query, plan = explain(sql, sql_params)
+        SlowQuery.objects.log(
+            view=view.__name__,
+            params=params,
+            sql=query,
+            duration=duration,
+            plan=plan,
+        )
+
+
+def _record_streaming_content(view, request, content, recorder: SlowQueryRecorder):
+    try:
+        with connection.execute_wrapper(recorder):
+            yield from content
+    finally:
+        _log_slow_queries(view, request, recorder)
+
+
+def log_slow_queries(view):
+    """
+    Log the view's database queries that are slower than
+    `settings.SLOW_QUERY_THRESHOLD` seconds, including those made while
+    streaming the response.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if settings.SLOW_QUERY_THRESHOLD is None:
+            return view(request, *args, **kwargs)
+
+        recorder = SlowQueryRecorder(settings.SLOW_QUERY_THRESHOLD)
+        with connection.execute_wrapper(recorder):
+            response = view(request, *args, **kwargs)
+
+        # Plans are captured once the view is done, so they are not counted
+        # as queries of the view itself.
+        if response.streaming:
+            response.streaming_content = _record_streaming_content(
+                view, request, response.streaming_content, recorder
+            )
+        else:
+            _log_slow_queries(view, request, recorder)
+
+        return response
+
+    return wrapper
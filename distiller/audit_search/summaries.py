@@ -0,0 +1,182 @@
+"""
+Lightweight, read-only views of a page of search results.
+
+Rows are populated with `values()`, and finding texts are decoded from the
+JSON aggregated by `AuditQuerySet.with_finding_texts_json`, rather than
+hydrating full model instances.
+"""
+
+import os
+from decimal import Decimal
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+
+from distiller.data.models import (
+    CURRENT_DOCUMENT_FIELDS, CURRENT_DOCUMENT_TYPES
+)
+
+
+class FindingSummary(NamedTuple):
+    cfda_id: Optional[str]
+    federal_program_name: Optional[str]
+    amount: Optional[Decimal]
+    modified_opinion: Optional[bool]
+    material_weakness: Optional[bool]
+    significant_deficiency: Optional[bool]
+    questioned_costs: Optional[bool]
+    repeat_finding: Optional[bool]
+
+
+class CAPTextSummary(NamedTuple):
+    text: str
+
+
+class FindingTextSummary(NamedTuple):
+    seq_number: int
+    audit_year: int
+    dbkey: str
+    finding_ref_nums: str
+    text: str
+    findings: Tuple[FindingSummary, ...]
+    cap_texts: Tuple[CAPTextSummary, ...]
+
+
+def _decode_finding(finding: dict) -> FindingSummary:
+    amount = finding['amount']
+    return FindingSummary(**{
+        **finding,
+        'amount': Decimal(amount) if amount is not None else None,
+    })
+
+
+def decode_finding_texts(finding_texts_json: List[dict]) -> List[FindingTextSummary]:
+    return [
+        FindingTextSummary(**{
+            **finding_text,
+            'findings': tuple(
+                _decode_finding(finding)
+                for finding in finding_text['findings']
+            ),
+            'cap_texts': tuple(
+                CAPTextSummary(**cap_text)
+                for cap_text in finding_text['cap_texts']
+            ),
+        })
+        for finding_text in finding_texts_json
+    ]
+
+
+def get_page_finding_texts(audits: Iterable) -> List[FindingTextSummary]:
+    """
+    Return the distinct finding texts of a page of audits annotated with
+    `finding_texts_json`, in (audit year, dbkey, reference number) order.
+    """
+
+    finding_texts = {}
+    for audit in audits:
+        for finding_text in decode_finding_texts(audit.finding_texts_json):
+            finding_texts[finding_text.seq_number] = finding_text
+
+    return sorted(
+        finding_texts.values(),
+        key=lambda f: (f.audit_year, f.dbkey, f.finding_ref_nums)
+    )
+
+
+class DocumentSummary(NamedTuple):
+    file_type: str
+    version: int
+    file_name: str
+
+    def get_absolute_url(self):
+        return os.path.join(settings.FAC_DOWNLOAD_ROOT, self.file_name)
+
+
+# `Audit` columns used by the search results template
+AUDIT_ROW_FIELDS = (
+    'audit_year',
+    'dbkey',
+    'auditee_name',
+    'fy_end_date',
+    'fac_accepted_date',
+    'qcosts',
+    'cog_over',
+    'cog_agency',
+    'oversight_agency',
+    'tot_fed_expend',
+    'ein',
+    'duns',
+    'street1',
+    'street2',
+    'city',
+    'state',
+    'zipcode',
+    'auditee_contact',
+    'auditee_title',
+    'auditee_phone',
+    'auditee_fax',
+    'auditee_email',
+    'auditee_date_signed',
+    'cpa_firm_name',
+    'auditor_ein',
+    'cpa_street1',
+    'cpa_street2',
+    'cpa_city',
+    'cpa_state',
+    'cpa_zipcode',
+    'cpa_contact',
+    'cpa_title',
+    'cpa_phone',
+    'cpa_fax',
+    'cpa_email',
+    'cpa_date_signed',
+)
+
+# Annotations added by `filter_num_findings`, `with_finding_texts_json` and
+# `with_current_documents`
+AUDIT_ROW_ANNOTATIONS = (
+    'num_findings',
+    'finding_texts_json',
+) + tuple(
+    f'current_{file_type}_{field}'
+    for file_type in CURRENT_DOCUMENT_TYPES
+    for field in CURRENT_DOCUMENT_FIELDS
+)
+
+# Pass to `values()` to select the columns of an `AuditRow`
+AUDIT_ROW_VALUES = AUDIT_ROW_FIELDS + AUDIT_ROW_ANNOTATIONS
+
+
+class AuditRow:
+    """
+    A search result, with only the columns the search results template uses.
+    """
+
+    __slots__ = AUDIT_ROW_VALUES + ('_current_documents',)
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            setattr(self, name, value)
+        self._current_documents = None
+
+    @property
+    def current_documents(self):
+        if self._current_documents is None:
+            self._current_documents = {
+                file_type: DocumentSummary(
+                    file_type=file_type,
+                    version=getattr(self, f'current_{file_type}_version'),
+                    file_name=getattr(self, f'current_{file_type}_file_name'),
+                ) if getattr(self, f'current_{file_type}_id') else None
+                for file_type in CURRENT_DOCUMENT_TYPES
+            }
+        return self._current_documents
+
+    @property
+    def has_repeat_finding(self):
+        return any(
+            finding['repeat_finding']
+            for finding_text in self.finding_texts_json
+            for finding in finding_text['findings']
+        )
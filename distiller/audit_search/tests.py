@@ -1,3 +1,306 @@
-from django.test import TestCase
+import os
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
 
-# Create your tests here.
+import pytest
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from distiller.data import models
+from distiller.data.etls import load_dumps
+from . import benchmarks, summaries
+from .caching import cache_per_load
+from .forms import AgencySelectionForm
+from .models import SlowQuery
+from .profiling import SlowQueryRecorder, normalize_params
+
+
+# Tests that query the search results need a PostgreSQL database (as in CI).
+requires_db = pytest.mark.skipif(
+    'DATABASE_URL' not in os.environ,
+    reason='requires a PostgreSQL database (set DATABASE_URL)',
+)
+
+FINDING_TEXTS_JSON = [{
+    'seq_number': 12,
+    'audit_year': 2019,
+    'dbkey': '100010',
+    'finding_ref_nums': '2019-001',
+    'text': 'Finding text',
+    'findings': [{
+        'cfda_id': '93.045',
+        'federal_program_name': 'Nutrition Services',
+        'amount': '1234.00',
+        'modified_opinion': False,
+        'material_weakness': True,
+        'significant_deficiency': False,
+        'questioned_costs': False,
+        'repeat_finding': True,
+    }],
+    'cap_texts': [{'text': 'CAP text'}],
+}]
+
+
+def test_decode_finding_texts():
+    finding_text, = summaries.decode_finding_texts(FINDING_TEXTS_JSON)
+
+    assert finding_text.finding_ref_nums == '2019-001'
+    assert finding_text.findings[0].cfda_id == '93.045'
+    assert finding_text.findings[0].amount == Decimal('1234.00')
+    assert finding_text.cap_texts == (summaries.CAPTextSummary('CAP text'),)
+
+
+def test_page_finding_texts_are_distinct():
+    row = summaries.AuditRow(**{
+        **benchmarks.audit_row_values(100010),
+        'finding_texts_json': FINDING_TEXTS_JSON,
+    })
+
+    assert len(summaries.get_page_finding_texts([row, row])) == 1
+    assert row.has_repeat_finding
+
+
+def test_finding_texts_json_is_one_statement():
+    audits = models.Audit.objects.filter_cfda_prefix('93').filter_num_findings(
+        require_findings=True
+    ).with_finding_texts_json()
+
+    sql = str(audits.query)
+    assert sql.count('json_agg') == 3
+    assert not audits._prefetch_related_lookups  # pylint: disable=W0212
+    # The correlated subquery must not be added to the GROUP BY.
+    assert 'json_agg' not in sql.split('GROUP BY')[-1]
+
+
+def test_audit_row_current_documents():
+    row = summaries.AuditRow(**benchmarks.audit_row_values(100010))
+
+    assert row.current_documents['form'] is None
+    assert row.current_documents['audit'].get_absolute_url().endswith(
+        '10001020191.pdf'
+    )
+    assert row.has_repeat_finding
+
+
+@pytest.fixture
+def load_version(monkeypatch):
+    cache.clear()
+    last_load = models.ETLLog(
+        operation='load_table',
+        created=datetime(2020, 9, 1, 2, 0, tzinfo=timezone.utc),
+    )
+    monkeypatch.setattr(
+        models.ETLLog.objects, 'get_most_recent_data_change', lambda: last_load
+    )
+    yield last_load
+    cache.clear()
+
+
+def test_pages_cached_per_load(rf, load_version):
+    renders = []
+
+    @cache_per_load
+    def view(request, audit_id):
+        renders.append(audit_id)
+        return HttpResponse(f'audit {audit_id}')
+
+    first = view(rf.get('/1/'), audit_id=1)
+    assert view(rf.get('/1/'), audit_id=1).content == first.content == b'audit 1'
+    view(rf.get('/2/'), audit_id=2)
+    assert renders == [1, 2]
+
+    # A new load renders the page again.
+    load_version.created = datetime(2020, 9, 2, 2, 0, tzinfo=timezone.utc)
+    cache.clear()
+    view(rf.get('/1/'), audit_id=1)
+    assert renders == [1, 2, 1]
+
+
+def test_conditional_get_per_load(rf, load_version):
+    @cache_per_load
+    def view(request, audit_id):
+        return HttpResponse(f'audit {audit_id}')
+
+    response = view(rf.get('/1/'), audit_id=1)
+    assert response['Last-Modified'] == 'Tue, 01 Sep 2020 02:00:00 GMT'
+
+    not_modified = view(
+        rf.get('/1/', HTTP_IF_NONE_MATCH=response['ETag']), audit_id=1
+    )
+    assert not_modified.status_code == 304
+
+    not_modified = view(
+        rf.get('/1/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']),
+        audit_id=1,
+    )
+    assert not_modified.status_code == 304
+
+
+@pytest.fixture
+def audits_with_findings(db):
+    for dbkey in range(100010, 100040):
+        dbkey = str(dbkey)
+        models.Audit.objects.create(
+            audit_year=2019,
+            dbkey=dbkey,
+            fy_end_date=date(2019, 6, 30),
+            period_covered='A',
+            ein='123456789',
+            auditee_name=f'Auditee {dbkey}',
+            tot_fed_expend=1_000_000,
+            date_firewall=date(2019, 12, 31),
+            fac_accepted_date=date(2020, 1, 15),
+        )
+        cfda = models.CFDA.objects.create(
+            elec_audits_id=int(dbkey),
+            audit_year=2019,
+            dbkey=dbkey,
+            ein='123456789',
+            cfda_id='93.045',
+            agency_prefix='93',
+            amount=Decimal('1234.00'),
+        )
+        for index, ref in enumerate(('2019-001', '2019-002')):
+            seq_number = int(dbkey) * 10 + index
+            models.FindingText.objects.create(
+                seq_number=seq_number,
+                audit_year=2019,
+                dbkey=dbkey,
+                finding_ref_nums=ref,
+                text=f'Finding {ref}',
+                charts_tables=False,
+            )
+            models.Finding.objects.create(
+                elec_audit_findings_id=seq_number,
+                audit_year=2019,
+                dbkey=dbkey,
+                elec_audits=cfda,
+                finding_ref_nums=ref,
+                repeat_finding=ref == '2019-002',
+            )
+            models.CAPText.objects.create(
+                seq_number=seq_number,
+                audit_year=2019,
+                dbkey=dbkey,
+                finding_ref_nums=ref,
+                text=f'CAP {ref}',
+                charts_tables=False,
+            )
+
+    load_dumps.update_audit_agencies()
+
+
+@pytest.fixture
+def static_storage(settings):
+    # Render pages without requiring collected static files.
+    settings.STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+
+@requires_db
+def test_search_query_count(
+    client, audits_with_findings, static_storage, django_assert_num_queries
+):
+    # The form's sub-agencies, the result count, the page of results, and
+    # two load status queries.
+    with django_assert_num_queries(5):
+        response = client.get('/', {'agency': '93', 'findings': 'on', 'fmt': 'html'})
+
+    assert response.status_code == 200
+    assert len(response.context['page'].object_list) == 25
+    assert len(response.context['finding_texts']) == 50
+    assert response.context['finding_texts'][0].findings[0].cfda_id == '93.045'
+
+
+def test_normalize_params(rf):
+    request = rf.get('/', {
+        'sort': '', 'agency': '93', 'audit_year': ['2019', '2018'], 'page': '2'
+    })
+    assert list(normalize_params(request.GET).items()) == [
+        ('agency', '93'),
+        ('audit_year', ['2019', '2018']),
+        ('page', '2'),
+    ]
+
+
+def test_slow_query_recorder():
+    recorder = SlowQueryRecorder(threshold=0.05)
+
+    def execute(sql, params, many, context):
+        if 'slow' in sql:
+            time.sleep(0.06)
+
+    recorder(execute, 'SELECT slow FROM data_audit', ['93'], False, {})
+    recorder(execute, 'SELECT fast FROM data_audit', [], False, {})
+    recorder(execute, 'UPDATE slow SET x = 1', [], False, {})
+
+    assert [(sql, params) for sql, params, _duration in recorder.slow_queries] == [
+        ('SELECT slow FROM data_audit', ['93']),
+    ]
+
+
+@requires_db
+def test_slow_queries_logged(client, audits_with_findings, static_storage, settings, monkeypatch):
+    settings.SLOW_QUERY_THRESHOLD = 0
+    monkeypatch.setattr('distiller.audit_search.models.SLOW_QUERY_LOG_SIZE', 3)
+
+    client.get('/', {'agency': '93', 'findings': 'on', 'fmt': 'html', 'sort': ''})
+
+    slow_queries = list(SlowQuery.objects.order_by('id'))
+    assert len(slow_queries) == 3
+    assert slow_queries[-1].view == 'single_audit_search'
+    assert slow_queries[-1].params == {'agency': '93', 'findings': 'on', 'fmt': 'html'}
+    assert any("'93'" in slow_query.sql for slow_query in slow_queries)
+    assert 'Buffers' in slow_queries[-1].plan or 'actual time' in slow_queries[-1].plan
+
+
+@requires_db
+def test_slow_export_queries_logged(client, audits_with_findings, settings):
+    settings.SLOW_QUERY_THRESHOLD = 0
+
+    response = client.get('/', {'agency': '93', 'fmt': 'csv'})
+    logged = SlowQuery.objects.count()
+    b''.join(response.streaming_content)
+
+    # The export query runs, and is logged, as the content is streamed.
+    assert SlowQuery.objects.count() > logged
+    assert SlowQuery.objects.order_by('-id')[0].params == {'agency': '93', 'fmt': 'csv'}
+
+
+def test_percentile():
+    durations = [0.5, 0.1, 0.3, 0.2, 0.4]
+    assert benchmarks.percentile(durations, 50) == 0.3
+    assert benchmarks.percentile(durations, 95) == 0.5
+    assert benchmarks.percentile([0.1], 95) == 0.1
+
+
+def test_benchmark_search_shapes_are_valid(monkeypatch):
+    monkeypatch.setattr(
+        models.AssistanceListing.objects, 'distinct_agencies',
+        lambda agency: [benchmarks.sub_agency_name(agency, 0)]
+    )
+    for name, shape in benchmarks.SEARCH_SHAPES.items():
+        params = {
+            'agency': '93',
+            'fmt': 'html',
+            **{key: value.format(agency='93') for key, value in shape.items()},
+        }
+        form = AgencySelectionForm(params)
+        assert form.is_valid(), (name, form.errors)
+
+
+@requires_db
+@pytest.mark.django_db
+def test_benchmark_search(settings):
+    settings.STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+    counts = benchmarks.generate_dataset(scale=0.001)
+    assert counts['audit'] == 320
+    assert counts['cfda'] > counts['audit']
+
+    results = benchmarks.run_benchmarks(repeat=2)
+
+    assert [result.name for result in results] == list(benchmarks.SEARCH_SHAPES)
+    for result in results:
+        assert result.status_code == 200, result.name
+        assert result.p50 <= result.p95
+        assert result.queries <= 6, result.name
@@ -18,7 +18,11 @@ from django.shortcuts import render
 from distiller.data.constants import AGENCIES_BY_PREFIX
 from distiller.data.etls import selenium_scraper
 from distiller.data import models
+from distiller.instrumentation.metrics import ROWS_EXPORTED
+from . import summaries
+from .caching import cache_per_load
 from .forms import AgencySelectionForm
+from .profiling import log_slow_queries
 
 
 class Echo:
@@ -39,6 +43,17 @@ def get_load_status():
     }
 
 
+def _count_exported_rows(rows):
+    count = 0
+    try:
+        for row in rows:
+            count += 1
+            yield row
+    finally:
+        ROWS_EXPORTED.inc(count)
+
+
+@log_slow_queries
 def single_audit_search(request):
     form = AgencySelectionForm(request.GET or None)
 
@@ -49,21 +64,11 @@ def single_audit_search(request):
             audit_year=form.cleaned_data['audit_year'],
             start_date=form.cleaned_data['start_date'],
             end_date=form.cleaned_data['end_date'],
-        ).prefetch_related(
-            'finding_texts',
-            'finding_texts__findings',
-            'finding_texts__findings__elec_audits',
-            'finding_texts__cap_texts',
-            'documents',
-        )
+        ).with_finding_texts_json().with_current_documents()
 
-        # If specified, filter by sub-agency name. To do this, we need to query
-        # for matching CFDA numbers first.
+        # If specified, filter by sub-agency name.
         if form.cleaned_data['sub_agency']:
-            cfdas = models.AssistanceListing.objects.get_cfda_nums_for_agency(
-                form.cleaned_data['sub_agency']
-            )
-            audits = audits.filter_cfda_list(cfdas)
+            audits = audits.filter_federal_agency(form.cleaned_data['sub_agency'])
 
         # Otherwise, filter by parent agency prefix
         else:
@@ -76,28 +81,27 @@ def single_audit_search(request):
                 form.cleaned_data['agency']
             )
 
+        audits = audits.filter_num_findings(require_findings=form.cleaned_data['findings'])
+
+        # Sorting comes after `filter_num_findings`, which annotates `num_findings`.
         if form.cleaned_data['sort']:
             prefix = '-' if form.cleaned_data.get('order') == 'asc' else ''
             audits = audits.order_by(f'{prefix}{form.cleaned_data["sort"]}')
 
-        audits = audits.filter_num_findings(require_findings=form.cleaned_data['findings'])
-
-        page = Paginator(audits, 25).get_page(form.cleaned_data['page'] or 1)
+        page = Paginator(
+            audits.values(*summaries.AUDIT_ROW_VALUES), 25
+        ).get_page(form.cleaned_data['page'] or 1)
+        page.object_list = [
+            summaries.AuditRow(**values) for values in page.object_list
+        ]
 
-        finding_texts_set = set()
-        for audit in page.object_list:
-            finding_texts_set.update(audit.finding_texts.all())
-
-        finding_texts = sorted(
-            finding_texts_set,
-            key=lambda f: (f.audit_year, f.dbkey, f.finding_ref_nums)
-        )
+        finding_texts = summaries.get_page_finding_texts(page.object_list)
 
         if form.cleaned_data['fmt'] == 'csv':
             writer = csv.writer(Echo())
             rows = itertools.chain(
                 (EXPORT_COLUMNS,),
-                audits.values_list(*EXPORT_COLUMNS),
+                _count_exported_rows(audits.values_list(*EXPORT_COLUMNS)),
             )
             response = StreamingHttpResponse(
                 (writer.writerow(row) for row in rows),
@@ -185,6 +189,7 @@ EXPORT_COLUMNS = [
 ]
 
 
+@cache_per_load
 def view_audit(request, audit_id):
     audit = models.Audit.objects.get(pk=audit_id)
     #audit = access.get_audit(audit_id)
@@ -197,6 +202,7 @@ def view_audit(request, audit_id):
     })
 
 
+@cache_per_load
 def view_finding(request, finding_id):
     finding = models.Finding.objects.get(pk=finding_id)
 
@@ -1,4 +1,7 @@
+import json
+
 from django.contrib import admin
+from django.utils.html import format_html
 
 from . import models
 
@@ -44,6 +47,15 @@ class CAPTextAdmin(admin.ModelAdmin):
     )
 
 
+class AuditAgencyAdmin(admin.ModelAdmin):
+    list_display = (
+        'audit_year', 'dbkey', 'agency_prefix', 'federal_agency', 'total_amount'
+    )
+    list_filter = (
+        'agency_prefix',
+    )
+
+
 class PDFExtractAdmin(admin.ModelAdmin):
     list_display = (
         'id', 'audit_year', 'dbkey', 'finding_ref_nums'
@@ -52,8 +64,35 @@ class PDFExtractAdmin(admin.ModelAdmin):
 
 class ETLLogAdmin(admin.ModelAdmin):
     list_display = (
-        'created', 'operation', 'target'
+        'created', 'operation', 'target', 'duration', 'rows_loaded',
+        'rows_rejected', 'peak_rss_mb'
     )
+    list_filter = (
+        'operation',
+    )
+    readonly_fields = ('metrics_table',)
+    exclude = ('metrics',)
+
+    def duration(self, obj):
+        # Other phases may be nested, or summed across workers.
+        total = obj.metrics.get('phases', {}).get('total')
+        if total is None:
+            return None
+        return f'{total:.1f}s'
+
+    def rows_loaded(self, obj):
+        return obj.metrics.get('counts', {}).get('rows_loaded')
+
+    def rows_rejected(self, obj):
+        return obj.metrics.get('counts', {}).get('rows_rejected')
+
+    def peak_rss_mb(self, obj):
+        return obj.metrics.get('peak_rss_mb')
+    peak_rss_mb.short_description = 'Peak RSS (MB)'
+
+    def metrics_table(self, obj):
+        return format_html('<pre>{}</pre>', json.dumps(obj.metrics, indent=2))
+    metrics_table.short_description = 'Metrics'
 
 
 admin.site.register(models.AssistanceListing, AssistanceListingAdmin)
@@ -62,5 +101,6 @@ admin.site.register(models.CFDA, CFDAAdmin)
 admin.site.register(models.Finding, FindingAdmin)
 admin.site.register(models.FindingText, FindingTextAdmin)
 admin.site.register(models.CAPText, CAPTextAdmin)
+admin.site.register(models.AuditAgency, AuditAgencyAdmin)
 admin.site.register(models.PDFExtract, PDFExtractAdmin)
 admin.site.register(models.ETLLog, ETLLogAdmin)
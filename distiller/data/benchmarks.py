@@ -0,0 +1,374 @@
+"""
+Benchmark FAC table loads against synthetic table dumps.
+
+`generate_dumps` writes yearly zips of pipe-delimited rows, named and laid
+out like the Single Audit Database's (`gen19.zip`, `cfda19.zip`, ...). Like
+the real files, rows mix Latin-1 and UTF-8 encodings, nullable columns are
+often empty or blank-padded, dates are `DD-MON-YY`, and years before 2019
+have the since-removed `CPAFOREIGN`/`CPACOUNTRY` columns.
+
+`run_benchmark` then downloads and loads each table with `load_dumps`, from
+a local directory or from a local HTTP server (see `serve_directory`), and
+reports the time, throughput and peak memory of each.
+
+See the `benchmark_etl` management command.
+"""
+
+import contextlib
+import functools
+import http.server
+import os
+import random
+import threading
+import time
+import zipfile
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+from .etls import load_dumps
+from .etls.metrics import get_peak_rss_mb
+
+
+# FAC dump tables, in load order
+DUMP_TABLES = ('audit', 'cfda', 'finding', 'findingtext', 'captext')
+
+DUMP_YEARS = (2017, 2018, 2019)
+
+# Approximate production ratios of rows per audit
+CFDAS_PER_AUDIT = 8
+FINDING_AUDIT_RATE = 0.4
+MAX_FINDINGS_PER_AUDIT = 3
+
+# Rates of NULL patterns in nullable columns: empty, or padded with blanks
+EMPTY_RATE = 0.1
+BLANK_RATE = 0.02
+
+# Share of rows encoded as UTF-8 rather than Latin-1
+UTF8_RATE = 0.1
+
+# Columns only found in `gen` dumps before 2019
+RETIRED_AUDIT_COLUMNS = ('CPAFOREIGN', 'CPACOUNTRY')
+RETIRED_AUDIT_COLUMNS_UNTIL = 2019
+
+AGENCY_PREFIXES = ('93', '10', '84', '14', '20', '97', '16', '11')
+STATES = ('AL', 'CA', 'DC', 'IL', 'NM', 'NY', 'PR', 'TX', 'VA', 'WA')
+
+# Words for text columns, including non-ASCII Latin-1 characters whose
+# encoding varies from row to row.
+WORDS = (
+    'audit', 'county', 'district', 'school', 'program', 'federal', 'grant',
+    'compliance', 'controls', 'reporting', 'eligibility', 'cost', 'the',
+    'of', 'and', 'for', 'Española', 'Peñasco', 'Café', 'São', 'Coöp',
+    'Montréal', 'Señor', 'Niño',
+)
+
+
+def _fac_date(value: date) -> str:
+    return value.strftime('%d-%b-%y').upper()
+
+
+def _text(rng: random.Random, max_length: int) -> str:
+    words = []
+    length = -1
+    while True:
+        word = rng.choice(WORDS)
+        if length + 1 + len(word) > max_length:
+            return ' '.join(words) or word[:max_length]
+        words.append(word)
+        length += 1 + len(word)
+
+
+def _value_generator(table: dict, column: str) -> Callable:
+    """
+    Return a function of (random generator, audit year) generating values
+    of `column` of `table`, based on the column's sanitizer and model field.
+    """
+
+    sanitizer = table['sanitizers'].get(column)
+    field = table['model']._meta.get_field(  # pylint: disable=W0212
+        table['field_mapping'][column]
+    )
+    field_type = field.get_internal_type()
+
+    if sanitizer is load_dumps.date_fmt:
+        def generate(rng, year):
+            return _fac_date(date(year, 1, 1) + timedelta(days=rng.randrange(730)))
+    elif sanitizer is load_dumps.boolean:
+        def generate(rng, _year):
+            return rng.choice('YN')
+    elif field.choices:
+        choices = [value for value, _label in field.choices]
+
+        def generate(rng, _year):
+            return rng.choice(choices)
+    elif field_type in ('IntegerField', 'DecimalField'):
+        def generate(rng, _year):
+            return str(rng.randrange(1, 10 ** 6))
+    elif field_type == 'CharField' and field.max_length <= 12:
+        def generate(rng, _year):
+            return str(rng.randrange(10 ** field.max_length)).zfill(field.max_length)
+    else:
+        # UTF-8 rows are read as Latin-1, which may double the length of
+        # non-ASCII text; leave room for that within `max_length`.
+        max_length = (field.max_length or 2000) // 2
+
+        def generate(rng, _year):
+            return _text(rng, rng.randrange(max_length // 2, max_length + 1))
+
+    if not field.null:
+        return generate
+
+    def generate_nullable(rng, year):
+        roll = rng.random()
+        if roll < EMPTY_RATE:
+            return ''
+        if roll < EMPTY_RATE + BLANK_RATE:
+            return ' ' * rng.randrange(1, 4)
+        return generate(rng, year)
+
+    return generate_nullable
+
+
+class DumpWriter:
+    """
+    Write the rows of one table's dump for one year, as a zip containing a
+    single pipe-delimited file.
+    """
+
+    def __init__(self, table_name: str, path: str, columns: Sequence[str]):
+        table = load_dumps.FAC_TABLES[table_name]
+        self.columns = list(columns)
+        self.generators = {
+            column: _value_generator(table, column)
+            for column in table['field_mapping']
+        }
+        self.count = 0
+
+        file_name = os.path.basename(path)[:-len('.zip')] + '.txt'
+        self._zip_file = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+        self._out_file = self._zip_file.open(file_name, 'w')
+        self._write_line(self.columns, 'latin-1')
+
+    def _write_line(self, values, encoding):
+        self._out_file.write(('|'.join(values) + '\r\n').encode(encoding))
+
+    def write(self, rng: random.Random, year: int, **values) -> None:
+        """
+        Write a row of `values` by column name. Other columns are filled
+        with random values.
+        """
+
+        self._write_line(
+            [
+                values[column] if column in values
+                else self.generators[column](rng, year) if column in self.generators
+                else ''
+                for column in self.columns
+            ],
+            'utf-8' if rng.random() < UTF8_RATE else 'latin-1',
+        )
+        self.count += 1
+
+    def close(self) -> None:
+        self._out_file.close()
+        self._zip_file.close()
+
+
+def dump_file_name(table_name: str, year: int) -> str:
+    """
+    Return the name of `table_name`'s dump for `year`, as in its source URLs.
+    """
+
+    suffix = f'{year % 100:02d}.zip'
+    for source_url in load_dumps.FAC_TABLES[table_name]['source_urls']:
+        if source_url.endswith(suffix):
+            return os.path.basename(source_url)
+    raise ValueError(f'No {table_name} dump for {year}')
+
+
+def _dump_columns(table_name: str, year: int) -> List[str]:
+    columns = [
+        column for column in load_dumps.FAC_TABLES[table_name]['field_mapping']
+        if column not in RETIRED_AUDIT_COLUMNS
+    ]
+    if table_name == 'audit' and year < RETIRED_AUDIT_COLUMNS_UNTIL:
+        position = columns.index('CPAEMAIL') + 1
+        columns[position:position] = RETIRED_AUDIT_COLUMNS
+    return columns
+
+
+def _write_year(rng, year, audits_per_year, writers, ids):
+    """
+    Write `audits_per_year` audits for `year`, with their CFDAs, findings,
+    finding texts and corrective action plans. `ids` holds the last ID used
+    for each table's primary key, across years.
+    """
+
+    for index in range(audits_per_year):
+        key = {'AUDITYEAR': str(year), 'DBKEY': str(index + 1)}
+        ein = f'{rng.randrange(10 ** 9):09d}'
+        fy_end_date = date(year, rng.choice((3, 6, 9, 12)), 28)
+
+        writers['audit'].write(
+            rng, year,
+            EIN=ein,
+            STATE=rng.choice(STATES),
+            CPASTATE=rng.choice(STATES),
+            COGAGENCY=rng.choice(AGENCY_PREFIXES),
+            OVERSIGHTAGENCY=rng.choice(AGENCY_PREFIXES),
+            FYENDDATE=_fac_date(fy_end_date),
+            FACACCEPTEDDATE=_fac_date(
+                fy_end_date + timedelta(days=rng.randrange(30, 270))
+            ),
+            **key,
+        )
+
+        cfda_ids = []
+        for _ in range(max(1, round(rng.expovariate(1 / CFDAS_PER_AUDIT)))):
+            ids['cfda'] += 1
+            cfda_ids.append(ids['cfda'])
+            cfda = f'{rng.choice(AGENCY_PREFIXES)}.{rng.randrange(1000):03d}'
+            writers['cfda'].write(
+                rng, year,
+                ELECAUDITSID=str(ids['cfda']),
+                EIN=ein,
+                CFDA=cfda,
+                **key,
+            )
+
+        if rng.random() >= FINDING_AUDIT_RATE:
+            continue
+
+        for number in range(1, rng.randint(1, MAX_FINDINGS_PER_AUDIT) + 1):
+            finding_ref_nums = f'{year}-{number:03d}'
+            ids['finding'] += 1
+            writers['finding'].write(
+                rng, year,
+                ELECAUDITFINDINGSID=str(ids['finding']),
+                ELECAUDITSID=str(rng.choice(cfda_ids)),
+                FINDINGSREFNUMS=finding_ref_nums,
+                **key,
+            )
+            for table_name in ('findingtext', 'captext'):
+                ids[table_name] += 1
+                writers[table_name].write(
+                    rng, year,
+                    SEQ_NUMBER=str(ids[table_name]),
+                    FINDINGREFNUMS=finding_ref_nums,
+                    **key,
+                )
+
+
+def generate_dumps(
+    target_dir: str,
+    audits_per_year: int,
+    years: Sequence[int] = DUMP_YEARS,
+    seed: int = 0,
+) -> Dict[str, int]:
+    """
+    Write synthetic dumps of each of `DUMP_TABLES` for `years` to
+    `target_dir`. Returns the number of rows written per table.
+    """
+
+    rng = random.Random(seed)
+    os.makedirs(target_dir, exist_ok=True)
+    counts = {table_name: 0 for table_name in DUMP_TABLES}
+    ids = {table_name: 0 for table_name in DUMP_TABLES}
+
+    for year in years:
+        with contextlib.ExitStack() as stack:
+            writers = {}
+            for table_name in DUMP_TABLES:
+                writers[table_name] = DumpWriter(
+                    table_name,
+                    os.path.join(target_dir, dump_file_name(table_name, year)),
+                    _dump_columns(table_name, year),
+                )
+                stack.callback(writers[table_name].close)
+
+            _write_year(rng, year, audits_per_year, writers, ids)
+
+        for table_name, writer in writers.items():
+            counts[table_name] += writer.count
+
+    return counts
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):  # pylint: disable=W0221
+        pass
+
+
+@contextlib.contextmanager
+def serve_directory(directory: str) -> Iterator[str]:
+    """
+    Serve `directory` over HTTP on localhost, yielding its root URL.
+    """
+
+    server = http.server.ThreadingHTTPServer(
+        ('127.0.0.1', 0),
+        functools.partial(_QuietHandler, directory=directory),
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class BenchmarkResult(NamedTuple):
+    table: str
+    rows: int
+    download_seconds: float
+    load_seconds: float
+    megabytes: float
+    peak_rss_mb: float
+    peak_worker_rss_mb: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.load_seconds if self.load_seconds else 0
+
+
+def run_benchmark(
+    source_root: str,
+    target_dir: str,
+    tables: Sequence[str] = DUMP_TABLES,
+    workers: Optional[int] = None,
+) -> List[BenchmarkResult]:
+    """
+    Download each of `tables` from `source_root` to `target_dir`, and load
+    it into the database, parsing with `workers` processes (default:
+    `settings.ETL_PARSE_WORKERS`).
+
+    Peak memory is that of this process, and of the largest parse worker, so
+    it only grows from one table to the next; benchmark one table at a time
+    to compare them.
+    """
+
+    results = []
+    for table_name in tables:
+        start = time.perf_counter()
+        download_metrics = load_dumps.download_table(
+            table_name, target_dir=target_dir, source_root=source_root
+        )
+        download_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        load_metrics = load_dumps.update_table(
+            table_name, source_dir=target_dir, workers=workers
+        )
+        load_seconds = time.perf_counter() - start
+
+        results.append(BenchmarkResult(
+            table=table_name,
+            rows=load_metrics.counts.get('rows_loaded', 0),
+            download_seconds=download_seconds,
+            load_seconds=load_seconds,
+            megabytes=download_metrics.counts.get('bytes_downloaded', 0) / 2 ** 20,
+            peak_rss_mb=get_peak_rss_mb(),
+            peak_worker_rss_mb=get_peak_rss_mb(children=True),
+        ))
+    return results
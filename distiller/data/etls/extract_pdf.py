@@ -13,6 +13,7 @@ from ...gateways import files
 from ...extraction import nlp, pdf_utils
 from ...extraction.analyze import analyze
 from ...fac_scraper.models import FacDocument
+from .metrics import RunMetrics
 
 
 def setup():
@@ -23,17 +24,40 @@ def get_all_pdfs():
     return FacDocument.objects.all().values_list('pk', flat=True)
 
 
-def process_audit_pdf(processor, pdf_id):
+def process_audit_pdf(processor, pdf_id, metrics=None):
+    document = FacDocument.objects.get(id=pdf_id)
+    process_audit_file(
+        processor,
+        audit_year=document.audit_year,
+        dbkey=document.dbkey,
+        file_name=document.file_name,
+        metrics=metrics,
+    )
+
+
+def process_audit_file(processor, *, audit_year, dbkey, file_name, metrics=None):
+    """
+    Extract findings and corrective action plans from the audit PDF saved as
+    `file_name` in `FAC_DOCUMENT_DIR`, and save a `PDFExtract` per audit
+    number found. Returns the number of extracts saved.
+    """
+
+    metrics = metrics or RunMetrics()
     try:
-        document = FacDocument.objects.get(id=pdf_id)
-        pdf = files.input_file(f"{settings.FAC_DOCUMENT_DIR}/{document.file_name}", mode='rb')
-        errors = pdf_utils.errors(pdf)
+        with metrics.phase('read'):
+            pdf = files.input_file(f"{settings.FAC_DOCUMENT_DIR}/{file_name}", mode='rb')
+            errors = pdf_utils.errors(pdf)
         if errors:
             sys.stdout.write(f'Could not read file: {errors}. Bailing out.\n')
             sys.stdout.flush()
-            return
+            metrics.count('pdfs_rejected')
+            return 0
 
-        audit_results = analyze(processor, pdf)
+        with metrics.phase('analyze'):
+            metrics.count('pages', pdf_utils.page_length(pdf))
+            audit_results = analyze(processor, pdf)
+        metrics.count('pdfs_extracted')
+        metrics.count('rows_loaded', len(audit_results))
         for result in audit_results:
             audit_num = result["audit"]
             page_number = result["page_number"]
@@ -41,14 +65,19 @@ def process_audit_pdf(processor, pdf_id):
             cap_data = result["cap_data"]
             sys.stdout.write(f'Found audit {audit_num} on page {page_number}.\n')
             sys.stdout.flush()
-            PDFExtract(audit_year=document.audit_year,
-                       dbkey=document.dbkey,
-                       finding_ref_nums=audit_num,
-                       finding_text=json.dumps(finding_data),
-                       cap_text=json.dumps(cap_data),
-                       last_updated=datetime.now(),
-            ).save()
+            with metrics.phase('save'):
+                PDFExtract(audit_year=audit_year,
+                           dbkey=dbkey,
+                           finding_ref_nums=audit_num,
+                           finding_text=json.dumps(finding_data),
+                           cap_text=json.dumps(cap_data),
+                           last_updated=datetime.now(),
+                ).save()
+
+        return len(audit_results)
 
     except files.FileOpenFailure as e:
         sys.stdout.write(f'Could not read PDF: {e}, skipping...\n')
         sys.stdout.flush()
+        metrics.count('pdfs_missing')
+        return 0
@@ -5,20 +5,27 @@ This module imports all columns defined in `key.xls`, available here:
 https://harvester.census.gov/facdissem/PublicDataDownloads.aspx
 """
 
+import collections
 import csv
 import io
+import itertools
 import json
+import operator
 import os
 import shutil
 import sys
-from collections import namedtuple
 from datetime import datetime
+from typing import Optional
+from urllib.parse import urlparse
 from zipfile import ZipFile
 
+from django.conf import settings
 from django.db import connection, transaction
 
 from .. import models
 from ...gateways import files
+from . import parallel, partitions, quarantine, shadow_tables
+from .metrics import RunMetrics
 
 
 FAC_ROOT_URL = 'https://www2.census.gov/pub/outgoing/govs/singleaudit'
@@ -29,58 +36,181 @@ FAC_START_YEAR = 2013
 csv.register_dialect('piped', delimiter='|', quoting=csv.QUOTE_NONE, lineterminator='\r\n')
 
 
-def iterate_piped_csv(in_file):
+class PipedReader:
     """
-    Iterator for rows in a CSV, yielding dict-like subscriptable namedtuples.
+    CSV reader of a pipe-delimited file's rows, as lists. `line` is the last
+    line read, so that lines the CSV reader can't read can be quarantined as
+    they were.
     """
 
-    reader = csv.reader(in_file, dialect='piped')
+    def __init__(self, in_file):
+        self.line = ''
+        self._reader = csv.reader(self._read_lines(in_file), dialect='piped')
 
-    try:
-        header_row = next(reader)
-    except StopIteration:
-        return
+    def _read_lines(self, in_file):
+        for self.line in in_file:
+            yield self.line
 
-    Row = namedtuple('Row', header_row)
+    def __iter__(self):
+        return self
 
-    success_count = 0
-    ignore_count = 0
-    for data in reader:
-        try:
-            yield Row(*data)
-            success_count += 1
-        except TypeError:
-            print('Ignoring row', data)
-            ignore_count += 1
+    def __next__(self):
+        return next(self._reader)
+
+    @property
+    def line_num(self) -> int:
+        return self._reader.line_num
 
-    print(f'Done iterating rows. Yielded {success_count}, ignored {ignore_count}')
+
+def read_piped_csv(in_file):
+    """
+    Reader for pipe-delimited FAC table dumps, yielding rows as lists. The
+    first row is the header.
+    """
+
+    return PipedReader(in_file)
+
+
+def _normalize_column_name(name: str) -> str:
+    # Some dumps start with a UTF-8 byte order mark, read as Latin-1.
+    return name.strip().lstrip('\ufeff\xef\xbb\xbf')
+
+
+class InvalidValue(ValueError):
+    """
+    A column's value could not be sanitized.
+    """
+
+    def __init__(self, column, value, error):
+        super().__init__(f'{column}={value!r}: {error}')
+        self.column = column
+
+
+class ColumnProjection:
+    """
+    The positions of a table's mapped columns in a dump file, compiled from
+    the file's header.
+
+    Column layouts vary from year to year: columns are added, dropped and
+    reordered. Mapped columns missing from a file are loaded as NULL, and
+    columns that aren't mapped are skipped.
+
+    Rows may be given as bytes in `encoding`, in which case only the values
+    of mapped columns are decoded.
+    """
+
+    def __init__(self, header, field_mapping, sanitizers, required=(), encoding=None):
+        positions = {}
+        for position, name in enumerate(header):
+            positions.setdefault(_normalize_column_name(name), position)
+
+        self.width = len(header)
+        self.encoding = encoding
+        self.missing = [column for column in field_mapping if column not in positions]
+        self.ignored = [
+            _normalize_column_name(name) for name in header
+            if _normalize_column_name(name) not in field_mapping
+        ]
+        missing_required = [column for column in required if column in self.missing]
+        if missing_required:
+            raise ValueError(
+                f'Required columns missing from file: {", ".join(missing_required)}'
+            )
+
+        mapped = [column for column in field_mapping if column in positions]
+        self._fields = [
+            (column, field_mapping[column], sanitizers.get(column))
+            for column in mapped
+        ]
+        self._get_values = operator.itemgetter(
+            *[positions[column] for column in mapped]
+        )
+        if len(mapped) == 1:
+            get_value = self._get_values
+            self._get_values = lambda values: (get_value(values),)
+        self._missing_fields = {field_mapping[column]: None for column in self.missing}
+
+    def describe(self) -> str:
+        return (
+            f'{self.width} columns; missing: {", ".join(self.missing) or "none"}; '
+            f'not loaded: {", ".join(self.ignored) or "none"}'
+        )
+
+    def project(self, values) -> dict:
+        """
+        Return the sanitized values of the mapped columns of a row, by model
+        field name. Blank values are NULL.
+        """
+
+        row = dict(self._missing_fields)
+        for (column, field_name, sanitizer), value in zip(
+            self._fields, self._get_values(values)
+        ):
+            if self.encoding:
+                value = value.decode(self.encoding)
+            value = value.strip() or None
+            if sanitizer:
+                try:
+                    value = sanitizer(value)
+                except (ValueError, KeyError, TypeError) as error:
+                    raise InvalidValue(column, value, error) from error
+            row[field_name] = value
+        return row
+
+
+# Size of the chunks tables are downloaded in
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def _copy_file(src_file, dest_file) -> int:
+    """
+    Copy `src_file` to `dest_file`, returning the number of bytes copied.
+    """
+
+    size = 0
+    while True:
+        chunk = src_file.read(DOWNLOAD_CHUNK_SIZE)
+        if not chunk:
+            return size
+        dest_file.write(chunk)
+        size += len(chunk)
 
 def download_table(
     table_name: str,
     target_dir: str,
     log_to_db: bool = False,
-) -> None:
+    source_root: Optional[str] = None,
+) -> RunMetrics:
     """
     Download given table to specified location. Target files will be in the
     form: <target-root>/<table-name>/<timestamp>/<file-name>
+
+    If given, files are downloaded from `source_root` (a local directory or
+    URL mirroring the source files) rather than their source URLs.
     """
 
     table = FAC_TABLES[table_name]
     timestamp = datetime.now().isoformat().replace(':', '-')
     target_dir = os.path.join(target_dir, table_name, timestamp)
+    metrics = RunMetrics()
 
     for source_path in table['source_urls']:
+        if source_root is not None:
+            source_path = os.path.join(source_root, os.path.basename(source_path))
         sys.stdout.write(f'Loading {source_path}...')
         sys.stdout.flush()
         file_name = os.path.basename(source_path)
 
         # Do the copy operation from source to destination
         try:
-            with files.input_file(source_path, mode='rb') as src_file:
+            with metrics.phase('download'), \
+                    files.input_file(source_path, mode='rb') as src_file:
                 if source_path.endswith('.zip'):
                     # We can't stream data out of a zip file, so load the
                     # entire thing into memory.
-                    with ZipFile(io.BytesIO(src_file.read())) as zip_file:
+                    zip_bytes = src_file.read()
+                    metrics.count('bytes_downloaded', len(zip_bytes))
+                    with ZipFile(io.BytesIO(zip_bytes)) as zip_file:
                         for zip_entry in zip_file.namelist():
                             with zip_file.open(zip_entry) as zip_entry_file:
                                 target_path = os.path.join(target_dir, zip_entry)
@@ -90,44 +220,57 @@ def download_table(
                 else:
                     target_path = os.path.join(target_dir, file_name)
                     with files.output_file(target_path, mode='wb') as dest_file:
-                        shutil.copyfileobj(src_file, dest_file)
+                        metrics.count(
+                            'bytes_downloaded', _copy_file(src_file, dest_file)
+                        )
 
         # If we can't open, the file probably doesn't exist. This will happen
         # with current audit year table dumps early in the year.
         except files.FileOpenFailure:
             sys.stdout.write('Load failure, skipping...\n')
             sys.stdout.flush()
+            metrics.count('files_missing')
             continue
 
+        metrics.count('files_downloaded')
+
         sys.stdout.write('Done!\n')
         sys.stdout.flush()
 
     if log_to_db:
-        models.ETLLog.objects.log_download_table(table_name)
+        models.ETLLog.objects.log_download_table(
+            table_name, metrics=metrics.as_dict()
+        )
+
+    return metrics
 
-@transaction.atomic
 def update_table(
     table_name: str,
     source_dir: str,
     delete_existing: bool = True,
     batch_size: int = 1_000,
     log_to_db: bool = False,
-) -> None:
+    workers: Optional[int] = None,
+) -> RunMetrics:
     """
     Get the Distiller's database in sync with the latest from the Single Audit
     Database.
+
+    Reloads (`delete_existing`) fill a copy of the table, or of each audit
+    year's partition of partitioned tables, which is swapped in once loaded.
+    The live table remains readable for the duration of the load.
+
+    Reloads of pipe-delimited dumps are parsed in chunks by `workers`
+    processes (default: `settings.ETL_PARSE_WORKERS`) while this process
+    COPYs the parsed rows. Dumps on the local filesystem are memory-mapped
+    rather than read into memory.
     """
 
     table = FAC_TABLES[table_name]
-
-    if delete_existing:
-        sys.stdout.write(f'Clearing {table_name} table... ')
-        sys.stdout.flush()
-        # Clear the existing table.
-        # We could DELETE here rather than TRUNCATE, which would be safe
-        # transactionally, but performance is very poor for the larger tables.
-        with connection.cursor() as cursor:
-            cursor.execute(f'TRUNCATE TABLE {table["model"]._meta.db_table}')  # pylint: disable=W0212
+    metrics = RunMetrics()
+    if workers is None:
+        workers = settings.ETL_PARSE_WORKERS
+    parse_in_chunks = table['file_reader'] is read_piped_csv
 
     sys.stdout.write(f'Loading {table_name}...\n')
     sys.stdout.flush()
@@ -138,95 +281,560 @@ def update_table(
     if not dump_dirs:
         sys.stdout.write('No table dump exists. Exiting...\n')
         sys.stdout.flush()
-        return
+        return metrics
 
     most_recent_dump_dir = dump_dirs[-1]
-
     file_paths = files.glob(os.path.join(most_recent_dump_dir, '*'))
+
+    quarantine_dir = quarantine.get_quarantine_dir(
+        source_dir, table_name, most_recent_dump_dir
+    )
+
+    if delete_existing and table.get('partitioned'):
+        partition_loader = partitions.PartitionLoader(
+            table['model'], batch_size=batch_size
+        )
+        with metrics.phase('load'):
+            if parse_in_chunks:
+                for copy_rows in _yield_parsed_rows(
+                    file_paths, table_name, metrics, quarantine_dir, workers
+                ):
+                    with metrics.phase('copy'):
+                        for audit_year, rows in copy_rows.items():
+                            partition_loader.load_rows(audit_year, rows)
+            else:
+                for instances in _yield_file_instances(
+                    file_paths, table, metrics, quarantine_dir
+                ):
+                    partition_loader.load(instances)
+        with metrics.phase('index'):
+            partition_loader.finish()
+        with metrics.phase('swap'):
+            partition_loader.swap_partitions()
+
+    elif delete_existing:
+        shadow_table = shadow_tables.ShadowTable(
+            table['model']._meta.db_table  # pylint: disable=W0212
+        )
+        with metrics.phase('load'):
+            shadow_table.create()
+            if parse_in_chunks:
+                for copy_rows in _yield_parsed_rows(
+                    file_paths, table_name, metrics, quarantine_dir, workers
+                ):
+                    # Chunks with no accepted rows have nothing to copy.
+                    rows = copy_rows.get(None)
+                    if not rows:
+                        continue
+                    with metrics.phase('copy'), connection.cursor() as cursor:
+                        partitions.copy_rows(
+                            cursor, shadow_table.shadow, table['model'], rows
+                        )
+            else:
+                for instances in _yield_file_instances(
+                    file_paths, table, metrics, quarantine_dir
+                ):
+                    _copy_in_batches(
+                        shadow_table.shadow, table['model'], instances, batch_size
+                    )
+        with metrics.phase('index'):
+            shadow_table.finish()
+        with metrics.phase('swap'):
+            shadow_table.swap()
+
+    else:
+        with metrics.phase('load'), transaction.atomic():
+            for instances in _yield_file_instances(
+                file_paths, table, metrics, quarantine_dir
+            ):
+                table['model'].objects.bulk_create(
+                    instances,
+                    batch_size=batch_size
+                )
+
+    sys.stdout.write('Done!\n')
+    _write_rejected_summary(metrics, quarantine_dir)
+
+    with metrics.phase('after_load'):
+        for after_load in table.get('after_load', ()):
+            after_load()
+
+    if log_to_db:
+        models.ETLLog.objects.log_load_table(
+            table_name, metrics=metrics.as_dict()
+        )
+
+    return metrics
+
+
+def replay_quarantine(
+    table_name: str,
+    source_dir: str,
+    batch_size: int = 1_000,
+    log_to_db: bool = False,
+) -> RunMetrics:
+    """
+    Load the rows quarantined by the most recent load of a table that are
+    now accepted, e.g. after a fix to the table's sanitizers. Rows still
+    rejected remain quarantined.
+
+    The rows still rejected from each quarantine file are written to a new
+    file, which only replaces it once the replayed rows are committed.
+    """
+
+    table = FAC_TABLES[table_name]
+    metrics = RunMetrics()
+
+    sys.stdout.write(f'Replaying quarantined {table_name} rows...\n')
+    sys.stdout.flush()
+
+    dump_dirs = files.glob(f'{os.path.join(source_dir, table_name)}/*/')
+    if not dump_dirs:
+        sys.stdout.write('No table dump exists. Exiting...\n')
+        sys.stdout.flush()
+        return metrics
+
+    quarantine_dir = quarantine.get_quarantine_dir(
+        source_dir, table_name, dump_dirs[-1]
+    )
+    quarantine_paths = files.glob(os.path.join(quarantine_dir, '*.csv.gz'))
+
+    # Unreadable rows are read again from their raw line, which is only kept
+    # for pipe-delimited dumps.
+    dialect = 'piped' if table['file_reader'] is read_piped_csv else 'excel'
+    # Replacement quarantine files, and the files they replace
+    replacements = []
+
+    def replace_quarantine_files():
+        for replay_path, quarantine_path in replacements:
+            files.move(replay_path, quarantine_path)
+
+    try:
+        with metrics.phase('load'), transaction.atomic():
+            for quarantine_path in quarantine_paths:
+                sys.stdout.write(f'\tReplaying {quarantine_path}...\n')
+                sys.stdout.flush()
+
+                with files.input_file(
+                    quarantine_path, mode='r', encoding='latin-1', newline=''
+                ) as in_file:
+                    quarantined = io.StringIO(in_file.read())
+
+                replay_path = quarantine.get_replay_path(quarantine_path)
+                replacements.append((replay_path, quarantine_path))
+                quarantine_file = quarantine.QuarantineFile(replay_path)
+                try:
+                    table['model'].objects.bulk_create(
+                        _yield_reader_instances(
+                            quarantine.QuarantineReader(quarantined, dialect=dialect),
+                            metrics=metrics,
+                            quarantine_file=quarantine_file,
+                            **table
+                        ),
+                        batch_size=batch_size,
+                    )
+                    quarantine_file.open()
+                finally:
+                    quarantine_file.close()
+
+            transaction.on_commit(replace_quarantine_files)
+    except Exception:
+        # Nothing was replayed; leave the quarantine files as they were.
+        for replay_path, _quarantine_path in replacements:
+            files.delete(replay_path)
+        raise
+
+    sys.stdout.write('Done!\n')
+    _write_rejected_summary(metrics, quarantine_dir)
+
+    if metrics.counts.get('rows_loaded'):
+        with metrics.phase('after_load'):
+            for after_load in table.get('after_load', ()):
+                after_load()
+
+    if log_to_db:
+        models.ETLLog.objects.log_replay_table(
+            table_name, metrics=metrics.as_dict()
+        )
+
+    return metrics
+
+
+def _write_rejected_summary(metrics, quarantine_dir):
+    if not metrics.counts.get('rows_rejected'):
+        return
+
+    prefix = 'rows_rejected_'
+    reasons = ', '.join(
+        f'{name[len(prefix):]}: {count}'
+        for name, count in sorted(metrics.counts.items())
+        if name.startswith(prefix)
+    )
+    sys.stdout.write(
+        f'Quarantined {metrics.counts["rows_rejected"]} rows ({reasons}) '
+        f'in {quarantine_dir}\n'
+    )
+    sys.stdout.flush()
+
+
+def _read_dump_file(file_path, metrics) -> str:
+    with files.input_file(file_path, mode='r', encoding='latin-1') as csv_file:
+        # This is very much less than ideal, because it would be preferable
+        # to rely on smart_open's ability to stream a file object, as it's
+        # read, over the network.
+        #
+        # However, some files (CFDA tables) have unusual character encoding
+        # problems when streamed. As a result, we will load the entire file
+        # into memory, and then process it after.
+        #
+        # NOTE: This appears to be because the FAC files have characters in
+        # multiple character encodings, and smart_open doesn't handle such
+        # files correctly in some circumstances.
+        with metrics.phase('read'):
+            text = csv_file.read()
+    metrics.count('files_read')
+    return text
+
+
+def _get_quarantine_file(quarantine_dir, file_path):
+    if quarantine_dir is None:
+        return None
+    return quarantine.QuarantineFile(
+        quarantine.get_quarantine_path(quarantine_dir, file_path)
+    )
+
+
+def _yield_file_instances(file_paths, table, metrics, quarantine_dir=None):
+    """
+    Yield an iterator of model instances per table dump file. Rows rejected
+    from each file are quarantined in `quarantine_dir`, if given.
+    """
+
     for file_path in file_paths:
         sys.stdout.write(f'\tImporting {file_path}...\n')
         sys.stdout.flush()
 
-        with files.input_file(file_path, mode='r', encoding='latin-1') as csv_file:
-            # This is very much less than ideal, because it would be preferable
-            # to rely on smart_open's ability to stream a file object, as it's
-            # read, over the network.
-            #
-            # However, some files (CFDA tables) have unusual character encoding
-            # problems when streamed. As a result, we will load the entire file
-            # into memory, and then process it after.
-            #
-            # NOTE: This appears to be because the FAC files have characters in
-            # multiple character encodings, and smart_open doesn't handle such
-            # files correctly in some circumstances.
-            file_bytes = csv_file.read()
-            csv_file = io.StringIO(file_bytes)
-
-            table["model"].objects.bulk_create(
-                _yield_model_instances(csv_file, **table),
-                batch_size=batch_size
+        csv_file = io.StringIO(_read_dump_file(file_path, metrics))
+        quarantine_file = _get_quarantine_file(quarantine_dir, file_path)
+        try:
+            yield _yield_model_instances(
+                csv_file,
+                metrics=metrics,
+                quarantine_file=quarantine_file,
+                **table
             )
+        finally:
+            if quarantine_file is not None:
+                quarantine_file.close()
 
-    sys.stdout.write('Done!\n')
 
-    if log_to_db:
-        models.ETLLog.objects.log_load_table(table_name)
+def _parse_chunk(table_name, header_line, lines):
+    """
+    Parse a chunk of the lines of a pipe-delimited dump file into CSV rows
+    ready to COPY. Run by worker processes.
+    """
+
+    return _parse_rows(
+        FAC_TABLES[table_name], read_piped_csv(io.StringIO(header_line + lines))
+    )
+
+
+def _parse_mapped_chunk(table_name, file_path, header, start, end):
+    """
+    Parse the lines of a local pipe-delimited dump file between offsets
+    `start` and `end` into CSV rows ready to COPY. Run by worker processes,
+    which map the file rather than being sent its contents.
+    """
+
+    with parallel.map_file(file_path) as mapped:
+        return _parse_rows(
+            FAC_TABLES[table_name],
+            parallel.MappedLineReader(mapped, start, end, header),
+            encoding='latin-1',
+        )
 
 
-def _sanitize_row(row, *, field_mapping, sanitizers, **_kwargs):
-    sanitized_row = {}
-    for csv_column_name, model_field_name in field_mapping.items():
-        # Strip off excess whitespace and handle NULL values.
+def _parse_rows(table, reader, encoding=None):
+    # Parse a chunk's rows from `reader`, whose first row is the file's
+    # header, into a `ParsedChunk`.
+    metrics = RunMetrics()
+    # Number rejected rows from the chunk's first line, after the header.
+    rejected = parallel.RejectedRows(line_offset=-1)
+    instances_by_year = collections.defaultdict(list)
+
+    with metrics.phase('parse'):
+        for instance in _yield_reader_instances(
+            reader,
+            metrics=metrics,
+            quarantine_file=rejected,
+            report_columns=False,
+            encoding=encoding,
+            **table
+        ):
+            audit_year = int(instance.audit_year) if table.get('partitioned') else None
+            instances_by_year[audit_year].append(instance)
+
+        copy_rows = {
+            audit_year: partitions.format_copy_rows(table['model'], instances)
+            for audit_year, instances in instances_by_year.items()
+        }
+
+    return parallel.ParsedChunk(copy_rows, rejected.rows, metrics, reader.line_num - 1)
+
+
+def _split_dump_file(file_path, table_name, metrics):
+    """
+    Get the header of a pipe-delimited dump file, the worker function
+    parsing its chunks, and the worker's arguments for each chunk.
+
+    Local files are memory-mapped, and workers are given the offsets of
+    their chunk to map it themselves. Other files are read into memory, and
+    workers are sent their chunk.
+    """
+
+    if urlparse(file_path).scheme == '':
+        with metrics.phase('read'), parallel.map_file(file_path) as mapped:
+            header_end = mapped.find(b'\n') + 1 or len(mapped)
+            header_line = mapped[:header_end].decode('latin-1')
+            chunks = list(parallel.split_lines(mapped, header_end))
+        metrics.count('files_read')
+        header = next(read_piped_csv([header_line]), [])
+        return header, _parse_mapped_chunk, (
+            (table_name, file_path, header, chunk.start, chunk.end)
+            for chunk in chunks
+        )
+
+    text = _read_dump_file(file_path, metrics)
+    header_end = text.find('\n') + 1 or len(text)
+    header_line = text[:header_end]
+    return next(read_piped_csv([header_line]), []), _parse_chunk, (
+        (table_name, header_line, text[chunk.start:chunk.end])
+        for chunk in parallel.split_lines(text, header_end)
+    )
+
+
+def _yield_parsed_rows(file_paths, table_name, metrics, quarantine_dir, workers):
+    """
+    Yield CSV rows ready to COPY, by audit year for partitioned tables (else
+    under `None`), per chunk of each pipe-delimited table dump file, as
+    parsed by `workers` processes. Rows rejected from each file are
+    quarantined in `quarantine_dir`, if given.
+    """
+
+    table = FAC_TABLES[table_name]
+    for file_path in file_paths:
+        sys.stdout.write(f'\tImporting {file_path}...\n')
+        sys.stdout.flush()
+
+        header, parse_chunk, chunk_args = _split_dump_file(
+            file_path, table_name, metrics
+        )
+        if not header:
+            continue
+
+        # Check the file's columns before starting workers.
+        projection = ColumnProjection(
+            header,
+            table['field_mapping'],
+            table['sanitizers'],
+            required=_required_columns(table['model'], table['field_mapping']),
+        )
+        sys.stdout.write(f'\tColumns: {projection.describe()}\n')
+        sys.stdout.flush()
 
-        # Try attribute lookup first, then dict-like lookup
+        quarantine_file = _get_quarantine_file(quarantine_dir, file_path)
+        if quarantine_file is not None:
+            quarantine_file.header = header
+        # Line number of the first line of the next chunk
+        first_line = 2
         try:
-            value = getattr(row, csv_column_name)
-        except:
-            value = row.get(csv_column_name)
+            for parsed in parallel.map_bounded(parse_chunk, chunk_args, workers):
+                metrics.merge(parsed.metrics)
+                if quarantine_file is not None:
+                    for reason, values, line, detail in parsed.rejected:
+                        if line is not None:
+                            line += first_line - 1
+                        quarantine_file.write(reason, values, line=line, detail=detail)
+                first_line += parsed.lines
+                yield parsed.copy_rows
+        finally:
+            if quarantine_file is not None:
+                quarantine_file.close()
 
-        if type(value) == str:
-            value = value.strip() or None
 
-        if csv_column_name in sanitizers:
-            sanitized_row[model_field_name] = sanitizers[csv_column_name](value)
-        else:
-            sanitized_row[model_field_name] = value
+def _copy_in_batches(table_name, model, instances, batch_size):
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(itertools.islice(instances, batch_size))
+            if not batch:
+                break
+            partitions.copy_instances(cursor, table_name, model, batch)
+
+
+def update_audit_agencies() -> None:
+    """
+    Rebuild the audit/agency bridge table from the CFDA table and the
+    assistance listings, in bulk.
+    """
+
+    sys.stdout.write('Updating audit agencies... ')
+    sys.stdout.flush()
+
+    # pylint: disable=W0212
+    shadow_table = shadow_tables.ShadowTable(models.AuditAgency._meta.db_table)
+    cfda_table = models.CFDA._meta.db_table
+    listing_table = models.AssistanceListing._meta.db_table
+
+    shadow_table.create()
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            INSERT INTO {shadow_table.shadow}
+                (audit_year, dbkey, agency_prefix, federal_agency, total_amount)
+            SELECT
+                cfda.audit_year,
+                cfda.dbkey,
+                cfda.agency_prefix,
+                listing.federal_agency,
+                SUM(cfda.amount)
+            FROM {cfda_table} cfda
+            LEFT JOIN {listing_table} listing
+                ON listing.program_number = cfda.cfda_id
+            WHERE cfda.agency_prefix IS NOT NULL
+            GROUP BY
+                cfda.audit_year,
+                cfda.dbkey,
+                cfda.agency_prefix,
+                listing.federal_agency
+        ''')
+    shadow_table.finish()
+    shadow_table.swap()
+
+    sys.stdout.write('Done!\n')
+
+
+def _required_columns(model, field_mapping):
+    """
+    Return the columns of `field_mapping` that can't be loaded as NULL.
+    """
+
+    return [
+        column for column, field_name in field_mapping.items()
+        if not model._meta.get_field(field_name).null  # pylint: disable=W0212
+    ]
+
+
+def _yield_rows(
+    reader,
+    *,
+    field_mapping,
+    sanitizers,
+    model=None,
+    metrics=None,
+    quarantine_file=None,
+    report_columns=True,
+    encoding=None,
+    **_kwargs
+):
+    """
+    Yield the sanitized rows of `reader`, a CSV reader whose first row is the
+    header, or a `csv.DictReader`. Rows after the header are given as bytes
+    in `encoding`, if set.
+
+    Rows that can't be read, don't match the header or fail sanitizing are
+    rejected, and written to `quarantine_file` if given.
+    """
+
+    metrics = metrics or RunMetrics()
+
+    if isinstance(reader, csv.DictReader):
+        header, reader = reader.fieldnames or [], reader.reader
+    else:
+        header = next(reader, [])
+    if not header:
+        return
 
-    return sanitized_row
+    projection = ColumnProjection(
+        header,
+        field_mapping,
+        sanitizers,
+        required=_required_columns(model, field_mapping) if model else (),
+        encoding=encoding,
+    )
+    if report_columns:
+        sys.stdout.write(f'\tColumns: {projection.describe()}\n')
+        sys.stdout.flush()
+    if quarantine_file is not None:
+        quarantine_file.header = header
 
+    def reject(reason, values, detail=''):
+        metrics.count('rows_rejected')
+        metrics.count(f'rows_rejected_{reason}')
+        if quarantine_file is not None:
+            if encoding:
+                values = [value.decode(encoding) for value in values]
+            quarantine_file.write(
+                reason, values, line=getattr(reader, 'line_num', None), detail=detail
+            )
 
-def _yield_rows(reader, *, field_mapping, sanitizers, **_kwargs):
     while True:
         try:
-            row = next(reader)
+            values = next(reader)
         except StopIteration:
             break
-        except Exception as e:  # pylint: disable=W0703
-            print('CSV parsing error.', e)
+        except csv.Error as error:
+            metrics.count('rows_read')
+            line = getattr(reader, 'line', '').rstrip('\r\n')
+            reject(quarantine.UNREADABLE, [line] if line else [], detail=str(error))
             continue
-        sanitized_row = _sanitize_row(
-            row,
-            field_mapping=field_mapping,
-            sanitizers=sanitizers
-        )
-        if sanitized_row is not None:
-            yield sanitized_row
+        if not values:
+            continue
+        metrics.count('rows_read')
+
+        if len(values) < projection.width:
+            reject(quarantine.TOO_FEW_COLUMNS, values)
+            continue
+        if len(values) > projection.width:
+            reject(quarantine.TOO_MANY_COLUMNS, values)
+            continue
+        try:
+            row = projection.project(values)
+        except InvalidValue as error:
+            reject(quarantine.INVALID_VALUE, values, detail=str(error))
+            continue
+        yield row
+
+
+def _yield_model_instances(csv_file, *, file_reader, **kwargs):
+    return _yield_reader_instances(file_reader(csv_file), **kwargs)
 
 
-def _yield_model_instances(
-    csv_file,
+def _yield_reader_instances(
+    reader,
     *,
     model,
     field_mapping,
     sanitizers,
-    file_reader,
+    computed_fields=None,
+    metrics=None,
+    quarantine_file=None,
+    report_columns=True,
+    encoding=None,
     **_kwargs
 ):
+    metrics = metrics or RunMetrics()
     for row in _yield_rows(
-        file_reader(csv_file),
+        reader,
         field_mapping=field_mapping,
-        sanitizers=sanitizers
+        sanitizers=sanitizers,
+        model=model,
+        metrics=metrics,
+        quarantine_file=quarantine_file,
+        report_columns=report_columns,
+        encoding=encoding,
     ):
+        for model_field_name, compute in (computed_fields or {}).items():
+            row[model_field_name] = compute(row)
+        metrics.count('rows_loaded')
         yield model(**row)
 
 
@@ -270,7 +878,8 @@ FAC_TABLES = {
             'https://s3.amazonaws.com/falextracts/Assistance%20Listings/datagov/AssistanceListings_DataGov_PUBLIC_CURRENT.csv'  # pylint: disable=C0301
         ],
         'model': models.AssistanceListing,
-        'file_reader': csv.DictReader,
+        'file_reader': csv.reader,
+        'after_load': (update_audit_agencies,),
         'field_mapping': {
             'Program Title': 'program_title',
             'Program Number': 'program_number',
@@ -330,7 +939,7 @@ FAC_TABLES = {
     'audit': {
         'source_urls': _fac_urls('gen'),
         'model': models.Audit,
-        'file_reader': iterate_piped_csv,
+        'file_reader': read_piped_csv,
         'field_mapping': {
             'AUDITYEAR': 'audit_year',
             'DBKEY': 'dbkey',
@@ -397,9 +1006,10 @@ FAC_TABLES = {
             'AUDITOR_EIN': 'auditor_ein',
             'FACACCEPTEDDATE': 'fac_accepted_date',
 
-            # These columns are not in 2019 exports:
-            # 'CPAFOREIGN': 'cpa_foreign',
-            # 'CPACOUNTRY': 'cpa_country',
+            # These columns are not in exports from 2019 on, whose audits
+            # load them as NULL:
+            'CPAFOREIGN': 'cpa_foreign',
+            'CPACOUNTRY': 'cpa_country',
         },
         'sanitizers': {
             'FYENDDATE': date_fmt,
@@ -429,7 +1039,8 @@ FAC_TABLES = {
     'cfda': {
         'source_urls': _fac_urls('cfda'),
         'model': models.CFDA,
-        'file_reader': iterate_piped_csv,
+        'partitioned': True,
+        'file_reader': read_piped_csv,
         'field_mapping': {
             'AUDITYEAR': 'audit_year',
             'DBKEY': 'dbkey',
@@ -468,12 +1079,17 @@ FAC_TABLES = {
             'PASSTHROUGHAWARD': boolean,
             'MAJORPROGRAM': boolean,
             'QCOSTS2': boolean,
-        }
+        },
+        'computed_fields': {
+            'agency_prefix': lambda row: models.get_agency_prefix(row['cfda_id']),
+        },
+        'after_load': (update_audit_agencies,),
     },
     'finding': {
         'source_urls': _fac_urls('findings'),
         'model': models.Finding,
-        'file_reader': iterate_piped_csv,
+        'partitioned': True,
+        'file_reader': read_piped_csv,
         'field_mapping': {
             'DBKEY': 'dbkey',
             'AUDITYEAR': 'audit_year',
@@ -505,7 +1121,8 @@ FAC_TABLES = {
     'findingtext': {
         'source_urls': _fac_urls('findingstext'),
         'model': models.FindingText,
-        'file_reader': iterate_piped_csv,
+        'partitioned': True,
+        'file_reader': read_piped_csv,
         'field_mapping': {
             'SEQ_NUMBER': 'seq_number',
             'DBKEY': 'dbkey',
@@ -521,7 +1138,8 @@ FAC_TABLES = {
     'captext': {
         'source_urls': _fac_urls('captext'),
         'model': models.CAPText,
-        'file_reader': iterate_piped_csv,
+        'partitioned': True,
+        'file_reader': read_piped_csv,
         'field_mapping': {
             'SEQ_NUMBER': 'seq_number',
             'DBKEY': 'dbkey',
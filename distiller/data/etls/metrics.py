@@ -0,0 +1,87 @@
+"""
+Measure ETL runs, for logging with `ETLLog`.
+
+Usage:
+
+    metrics = RunMetrics()
+    with metrics.phase('load'):
+        for row in rows:
+            metrics.count('rows_loaded')
+    models.ETLLog.objects.log_load_table(table_name, metrics=metrics.as_dict())
+"""
+
+import contextlib
+import resource
+import sys
+import time
+from typing import Dict
+
+
+def get_peak_rss_mb(children: bool = False) -> float:
+    """
+    Return the peak resident set size of this process, in megabytes, or with
+    `children`, that of its largest terminated child process (e.g. parse
+    workers).
+    """
+
+    peak_rss = resource.getrusage(
+        resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    ).ru_maxrss
+    # Linux reports kilobytes; macOS reports bytes.
+    if sys.platform == 'darwin':
+        peak_rss //= 1024
+    return round(peak_rss / 1024, 1)
+
+
+class RunMetrics:
+    """
+    Seconds spent in each phase of a run, and counts of what it processed
+    (rows read, bytes downloaded, ...).
+
+    Phases may be nested, and worker phases sum time across processes, so
+    `as_dict` also reports the run's wall-clock time, since the metrics were
+    created, as the `total` phase.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.phases: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Time the enclosed block as phase `name`. Phases entered repeatedly,
+        e.g. once per file, accumulate.
+        """
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.monotonic() - start
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def merge(self, other: 'RunMetrics') -> None:
+        """
+        Add the phase times and counts of `other`, e.g. a worker's, to these.
+        """
+
+        for name, seconds in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0) + seconds
+        for name, amount in other.counts.items():
+            self.count(name, amount)
+
+    def as_dict(self) -> dict:
+        return {
+            'phases': {
+                **{
+                    name: round(seconds, 3) for name, seconds in self.phases.items()
+                },
+                'total': round(time.monotonic() - self.started, 3),
+            },
+            'counts': dict(self.counts),
+            'peak_rss_mb': get_peak_rss_mb(),
+        }
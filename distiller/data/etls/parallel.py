@@ -0,0 +1,180 @@
+"""
+Parse table dumps in worker processes while the main process writes to the
+database.
+
+Pipe-delimited dumps have one row per line, so a dump can be split into
+chunks of lines (`split_lines`) that are parsed independently. Chunks are
+mapped over a pool of worker processes with `map_bounded`, which keeps a
+bounded number of chunks in flight: when the database falls behind, parsing
+pauses rather than buffering the whole file as parsed rows.
+
+Dumps on the local filesystem are memory-mapped rather than read into
+memory: only the chunks' offsets are sent to workers, which map the file
+themselves and split its lines and fields as bytes (`MappedLineReader`).
+"""
+
+import collections
+import contextlib
+import itertools
+import mmap
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+)
+
+from .metrics import RunMetrics
+
+
+# Approximate size of the chunks of lines parsed by each worker, in
+# characters (or bytes, for memory-mapped files)
+PARSE_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Chunks in flight per worker, parsed or being parsed, before parsing waits
+# for the database
+CHUNKS_PER_WORKER = 2
+
+
+class LineChunk(NamedTuple):
+    start: int
+    end: int
+
+
+def split_lines(
+    text: Union[str, bytes, mmap.mmap],
+    start: int = 0,
+    chunk_size: Optional[int] = None,
+) -> Iterator[LineChunk]:
+    """
+    Split `text` from offset `start` into chunks of about `chunk_size`
+    characters (default: `PARSE_CHUNK_SIZE`) that end on line boundaries.
+    `start` is the offset of a line. `text` may be bytes or a memory-mapped
+    file, which is only read around chunk boundaries.
+    """
+
+    chunk_size = chunk_size or PARSE_CHUNK_SIZE
+    newline = '\n' if isinstance(text, str) else b'\n'
+    while start < len(text):
+        end = text.find(newline, min(start + chunk_size, len(text)) - 1)
+        end = len(text) if end == -1 else end + 1
+        yield LineChunk(start, end)
+        start = end
+
+
+@contextlib.contextmanager
+def map_file(path: str) -> Iterator[Union[mmap.mmap, bytes]]:
+    """
+    Memory-map the local file `path`, read-only. Empty files, which can't
+    be mapped, are mapped as empty bytes.
+    """
+
+    with open(path, 'rb') as in_file:
+        if not os.fstat(in_file.fileno()).st_size:
+            yield b''
+            return
+        with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+class MappedLineReader:
+    """
+    Reader of the lines of `mapped[start:end]`, a memory-mapped dump file,
+    yielding `header` and then each line's fields as bytes, split on
+    `delimiter`. Implements the reader interface of `csv.reader`: `line_num`
+    is the number of lines read, counting the header.
+
+    Fields aren't decoded, so that only those that are loaded are.
+    """
+
+    def __init__(
+        self,
+        mapped: Union[mmap.mmap, bytes],
+        start: int,
+        end: int,
+        header: Sequence[str],
+        delimiter: bytes = b'|',
+    ):
+        self._mapped = mapped
+        self._position = start
+        self._end = end
+        self._header: Optional[List[str]] = list(header)
+        self._delimiter = delimiter
+        self.line_num = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> list:
+        if self._header is not None:
+            header, self._header = self._header, None
+            self.line_num += 1
+            return header
+
+        if self._position >= self._end:
+            raise StopIteration
+        end = self._mapped.find(b'\n', self._position, self._end)
+        end = self._end if end == -1 else end + 1
+        line = self._mapped[self._position:end].rstrip(b'\r\n')
+        self._position = end
+        self.line_num += 1
+        return line.split(self._delimiter) if line else []
+
+
+def map_bounded(
+    function: Callable,
+    args: Iterable[Tuple],
+    workers: int,
+    max_pending: Optional[int] = None,
+) -> Iterator:
+    """
+    Yield `function(*arguments)` for each of `args`, in order, computed by
+    `workers` forked processes (or by this process, for one worker). At most
+    `max_pending` results (default: `CHUNKS_PER_WORKER` per worker) are
+    computed ahead of those consumed.
+    """
+
+    if workers <= 1:
+        yield from itertools.starmap(function, args)
+        return
+
+    max_pending = max_pending or workers * CHUNKS_PER_WORKER
+    with ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context('fork')
+    ) as executor:
+        pending: collections.deque = collections.deque()
+        for arguments in args:
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+            pending.append(executor.submit(function, *arguments))
+        while pending:
+            yield pending.popleft().result()
+
+
+class RejectedRows:
+    """
+    Rows rejected by a worker, kept to be quarantined by the main process.
+    Implements the writer interface of `quarantine.QuarantineFile`, with
+    line numbers offset by `line_offset`.
+    """
+
+    def __init__(self, line_offset: int = 0):
+        self.line_offset = line_offset
+        self.header: List[str] = []
+        self.rows: List[tuple] = []
+
+    def write(self, reason, values, line=None, detail='') -> None:
+        if line is not None:
+            line += self.line_offset
+        self.rows.append((reason, values, line, detail))
+
+
+class ParsedChunk(NamedTuple):
+    # CSV rows ready to COPY, by audit year for partitioned tables (else
+    # under `None`)
+    copy_rows: dict
+    # Rejected rows, with line numbers counted from the chunk's first line
+    rejected: List[tuple]
+    metrics: RunMetrics
+    # Number of lines in the chunk
+    lines: int
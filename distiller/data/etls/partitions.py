@@ -0,0 +1,225 @@
+"""
+Load FAC tables that are partitioned by audit year.
+
+The largest FAC tables are partitioned by `audit_year` (see migration
+`0025_partition_by_audit_year`). Rather than truncating a whole table on
+reload, each audit year is loaded into a standalone table, which then
+replaces that year's partition with `ATTACH PARTITION`.
+"""
+
+import csv
+import io
+import sys
+from typing import Dict, Iterable, List
+
+from django.db import connection, models, transaction
+from psycopg2.extras import Json
+
+from .shadow_tables import clone_indexes, index_build_memory
+
+
+# Rows for audit years without a partition of their own are stored in the
+# default partition, `<table>_default`.
+DEFAULT_PARTITION_SUFFIX = 'default'
+
+
+def partition_name(model, audit_year) -> str:
+    return f'{model._meta.db_table}_y{int(audit_year)}'  # pylint: disable=W0212
+
+
+class _CopyNull:
+    """
+    Written unquoted, and empty, by a `csv.QUOTE_NONNUMERIC` writer, which
+    quotes everything else that isn't a number (including None). COPY reads
+    unquoted empty values as NULL, and quoted ones as empty strings.
+    """
+
+    def __float__(self):
+        # Makes the writer treat the value as a number, so it isn't quoted.
+        return 0.0
+
+    def __str__(self):
+        return ''
+
+
+COPY_NULL = _CopyNull()
+
+
+def _copy_value(value):
+    if value is None:
+        return COPY_NULL
+    # JSON fields are adapted for use as SQL parameters; COPY wants the JSON.
+    if isinstance(value, Json):
+        return value.dumps(value.adapted)
+    return value
+
+
+def _copy_fields(model) -> List[models.Field]:
+    # Serial primary keys are left to the database.
+    return [
+        field for field in model._meta.concrete_fields  # pylint: disable=W0212
+        if not isinstance(field, models.AutoField)
+    ]
+
+
+def format_copy_rows(model, instances: Iterable) -> str:
+    """
+    Format model instances as CSV rows for `copy_rows`.
+    """
+
+    fields = _copy_fields(model)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for instance in instances:
+        writer.writerow(
+            _copy_value(
+                field.get_db_prep_save(getattr(instance, field.attname), connection)
+            )
+            for field in fields
+        )
+    return buffer.getvalue()
+
+
+def copy_rows(cursor, table_name: str, model, rows: str) -> None:
+    """
+    COPY CSV rows formatted by `format_copy_rows` into `table_name`, which
+    has the model's columns.
+    """
+
+    columns = ', '.join(
+        connection.ops.quote_name(field.column) for field in _copy_fields(model)
+    )
+    cursor.copy_expert(
+        f'COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv)',
+        io.StringIO(rows),
+    )
+
+
+def copy_instances(cursor, table_name: str, model, instances: Iterable) -> None:
+    """
+    COPY model instances into `table_name`, which has the model's columns.
+    """
+
+    copy_rows(cursor, table_name, model, format_copy_rows(model, instances))
+
+
+class PartitionLoader:
+    """
+    Load model instances into a standalone table per audit year, then swap
+    each in as that year's partition.
+    """
+
+    def __init__(self, model, batch_size: int):
+        self.model = model
+        self.batch_size = batch_size
+        self.parent = model._meta.db_table  # pylint: disable=W0212
+        self.pending: Dict[int, List] = {}
+        # Names of the partitioned table's indexes, cloned per audit year
+        self.index_names: Dict[int, List[str]] = {}
+
+    def _load_table(self, audit_year: int) -> str:
+        return f'{partition_name(self.model, audit_year)}_load'
+
+    def _create_load_table(self, cursor, audit_year: int) -> None:
+        load_table = self._load_table(audit_year)
+        cursor.execute(f'DROP TABLE IF EXISTS {load_table}')
+        # Unlogged and unindexed until loaded; see `finish`.
+        cursor.execute(
+            f'CREATE UNLOGGED TABLE {load_table} '
+            f'(LIKE {self.parent} INCLUDING DEFAULTS)'
+        )
+        # With this constraint in place, ATTACH PARTITION doesn't need to scan
+        # the table to validate the partition bound.
+        cursor.execute(
+            f'ALTER TABLE {load_table} ADD CONSTRAINT {load_table}_year '
+            f'CHECK (audit_year IS NOT NULL AND audit_year = {audit_year})'
+        )
+
+    def _flush(self, cursor, audit_year: int) -> None:
+        if not self.pending[audit_year]:
+            return
+        copy_instances(
+            cursor, self._load_table(audit_year), self.model, self.pending[audit_year]
+        )
+        self.pending[audit_year] = []
+
+    def _start_year(self, cursor, audit_year: int) -> None:
+        if audit_year not in self.pending:
+            self._create_load_table(cursor, audit_year)
+            self.pending[audit_year] = []
+
+    def load(self, instances: Iterable) -> None:
+        with connection.cursor() as cursor:
+            for instance in instances:
+                audit_year = int(instance.audit_year)
+                self._start_year(cursor, audit_year)
+
+                self.pending[audit_year].append(instance)
+                if len(self.pending[audit_year]) >= self.batch_size:
+                    self._flush(cursor, audit_year)
+
+            for audit_year in self.pending:
+                self._flush(cursor, audit_year)
+
+    def load_rows(self, audit_year: int, rows: str) -> None:
+        """
+        Load CSV rows for `audit_year` formatted by `format_copy_rows`.
+        """
+
+        with connection.cursor() as cursor:
+            self._start_year(cursor, audit_year)
+            copy_rows(cursor, self._load_table(audit_year), self.model, rows)
+
+    def finish(self) -> None:
+        """
+        Index, log and analyze each loaded audit year's table, ahead of the
+        swap.
+        """
+
+        # Build each load table's indexes, matching the partitioned table's
+        # so ATTACH PARTITION adopts them, before any locks are taken. They
+        # are renamed once the partition they replace is dropped.
+        with connection.cursor() as cursor, index_build_memory(cursor):
+            for audit_year in sorted(self.pending):
+                sys.stdout.write(f'\tIndexing {audit_year} partition...\n')
+                sys.stdout.flush()
+                load_table = self._load_table(audit_year)
+                self.index_names[audit_year] = clone_indexes(
+                    cursor, self.parent, load_table, f'_y{audit_year}_load'
+                )
+                cursor.execute(f'ALTER TABLE {load_table} SET LOGGED')
+                cursor.execute(f'ANALYZE {load_table}')
+
+    def swap_partitions(self) -> None:
+        """
+        Replace the partition of each loaded audit year with its load table.
+        """
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for audit_year in sorted(self.pending):
+                sys.stdout.write(f'\tAttaching {audit_year} partition...\n')
+                sys.stdout.flush()
+                partition = partition_name(self.model, audit_year)
+                load_table = self._load_table(audit_year)
+
+                cursor.execute(f'DROP TABLE IF EXISTS {partition}')
+                # Rows for this year may have been added to the default
+                # partition outside of a load; they are superseded now.
+                cursor.execute(
+                    f'DELETE FROM {self.parent}_{DEFAULT_PARTITION_SUFFIX} '
+                    f'WHERE audit_year = %s',
+                    [audit_year]
+                )
+                cursor.execute(f'ALTER TABLE {load_table} RENAME TO {partition}')
+                for name in self.index_names[audit_year]:
+                    cursor.execute(
+                        f'ALTER INDEX {name}_y{audit_year}_load '
+                        f'RENAME TO {name}_y{audit_year}'
+                    )
+                cursor.execute(
+                    f'ALTER TABLE {self.parent} ATTACH PARTITION {partition} '
+                    f'FOR VALUES IN ({audit_year})'
+                )
+                cursor.execute(
+                    f'ALTER TABLE {partition} DROP CONSTRAINT {load_table}_year'
+                )
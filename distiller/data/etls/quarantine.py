@@ -0,0 +1,157 @@
+"""
+Quarantine rows rejected while loading table dumps.
+
+Rejected rows are written, as they were read, to a gzipped CSV per dump
+file (i.e. per table and audit year), with the reason they were rejected:
+
+    <dump root>/quarantine/<table>/<dump timestamp>/<dump file name>.csv.gz
+
+Rows the CSV reader can't read are written as their raw line, in a single
+column.
+
+Quarantined rows can be replayed into the database once the loader is fixed
+to accept them (see `load_dumps.replay_quarantine`).
+"""
+
+import csv
+import io
+import os
+import sys
+from typing import List, Optional
+
+from ...gateways import files
+
+
+# Directory of quarantined rows, under the root of the table dumps
+QUARANTINE_DIR = 'quarantine'
+
+# Reasons rows are rejected
+TOO_FEW_COLUMNS = 'too_few_columns'
+TOO_MANY_COLUMNS = 'too_many_columns'
+INVALID_VALUE = 'invalid_value'
+UNREADABLE = 'unreadable'
+
+# Columns preceding the dump's own in a quarantine file
+QUARANTINE_COLUMNS = ['reason', 'detail', 'line']
+
+
+def get_quarantine_dir(source_dir: str, table_name: str, dump_dir: str) -> str:
+    """
+    Return the directory of rows quarantined from the dump files in
+    `dump_dir`.
+    """
+
+    return os.path.join(
+        source_dir,
+        QUARANTINE_DIR,
+        table_name,
+        os.path.basename(dump_dir.rstrip('/')),
+    )
+
+
+def get_quarantine_path(quarantine_dir: str, file_path: str) -> str:
+    return os.path.join(quarantine_dir, f'{os.path.basename(file_path)}.csv.gz')
+
+
+def get_replay_path(quarantine_path: str) -> str:
+    """
+    Return the path of the file written by a replay of `quarantine_path`,
+    which replaces it once the replayed rows are committed.
+    """
+
+    root, ext = os.path.splitext(quarantine_path)
+    return f'{root}.replay{ext}'
+
+
+class QuarantineFile:
+    """
+    Writer of rows rejected from a dump file. Unless opened explicitly, the
+    file is only created if a row is rejected.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header: List[str] = []
+        self.counts = {}
+        self._file = None
+        self._writer = None
+
+    def open(self) -> None:
+        """
+        Create the file, if not already created, replacing any previous one.
+        """
+
+        if self._file is not None:
+            return
+        self._file = io.TextIOWrapper(
+            files.output_file(self.path, mode='wb'),
+            encoding='latin-1',
+            errors='replace',
+            newline='',
+        )
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(QUARANTINE_COLUMNS + self.header)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts.values())
+
+    def write(
+        self,
+        reason: str,
+        values: List[str],
+        line: Optional[int] = None,
+        detail: str = '',
+    ) -> None:
+        self.open()
+        self._writer.writerow([reason, detail, line or ''] + values)
+        self.counts[reason] = self.counts.get(reason, 0) + 1
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        summary = ', '.join(
+            f'{reason}: {count}' for reason, count in sorted(self.counts.items())
+        )
+        sys.stdout.write(
+            f'\tQuarantined {self.count} rows ({summary}) to {self.path}\n'
+        )
+        sys.stdout.flush()
+
+
+class QuarantineReader:
+    """
+    Reader of a quarantine file's rows, as a CSV reader of the original dump
+    file: the dump's header, then each quarantined row. `line_num` is the
+    line of the last row read in the dump.
+
+    Unreadable rows are read again from their raw line, as `dialect`, and
+    raise `csv.Error` if they still can't be, or if the line wasn't kept.
+    """
+
+    def __init__(self, in_file, dialect: str = 'excel'):
+        self._reader = csv.reader(in_file)
+        header = next(self._reader, None)
+        self._header = header[len(QUARANTINE_COLUMNS):] if header else None
+        self._dialect = dialect
+        self.line_num: Optional[int] = None
+        self.line = ''
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> List[str]:
+        if self._header is not None:
+            header, self._header = self._header, None
+            return header
+        reason, detail, line, *values = next(self._reader)
+        self.line_num = int(line) if line else None
+        if reason != UNREADABLE:
+            return values
+
+        self.line = values[0] if values else ''
+        if not self.line:
+            raise csv.Error(detail)
+        return next(csv.reader([self.line], dialect=self._dialect))
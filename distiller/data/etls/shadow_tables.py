@@ -0,0 +1,184 @@
+"""
+Reload tables without blocking readers for the duration of the load.
+
+A table is reloaded into an unlogged "shadow" copy with no indexes. Once
+loaded, the shadow table's indexes and constraints are built, it is made
+durable and analyzed, and it is swapped in for the live table by renaming
+in a short transaction. Readers are only blocked while the tables are
+renamed.
+"""
+
+import contextlib
+import re
+import sys
+from typing import List, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+
+
+# Matches an index definition from `pg_indexes`, e.g.
+# CREATE INDEX data_audit_dbkey_idx ON public.data_audit USING btree (dbkey)
+INDEX_DEFINITION = re.compile(
+    r'^(?P<create>CREATE (?:UNIQUE )?INDEX) (?P<name>\S+) ON (?:ONLY )?\S+ (?P<rest>USING .*)$'
+)
+
+
+# Constraints backed by an index (primary keys and unique constraints).
+# Their index names must be unique in the schema, so their clones are
+# suffixed until the swap.
+INDEX_CONSTRAINT_TYPES = ('p', 'u')
+
+
+def get_constraint_definitions(cursor, table: str) -> List[Tuple[str, str, str]]:
+    """
+    Return the (name, type, definition) of the primary key, unique, check
+    and foreign key constraints on `table`. Types are `pg_constraint.contype`
+    codes.
+    """
+
+    cursor.execute('''
+        SELECT conname, contype, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'c', 'f')
+    ''', [table])
+    return cursor.fetchall()
+
+
+def get_index_definitions(cursor, table: str) -> List[Tuple[str, str]]:
+    """
+    Return the (name, definition) of indexes on `table` that don't back
+    constraints.
+    """
+
+    constraint_names = {
+        name for name, _type, _definition in get_constraint_definitions(cursor, table)
+    }
+    cursor.execute(
+        'SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s',
+        [table]
+    )
+    return [
+        (name, definition)
+        for name, definition in cursor.fetchall()
+        if name not in constraint_names
+    ]
+
+
+def clone_indexes(cursor, source: str, target: str, suffix: str) -> List[str]:
+    """
+    Build the constraints and indexes of `source` on `target`, naming each
+    index (and constraint backed by one) after the original plus `suffix`.
+    Returns the original names of those, to rename once swapped in. Check
+    and foreign key constraints keep their names, which only need to be
+    unique per table (and which ATTACH PARTITION matches by).
+    """
+
+    names = []
+    for name, contype, definition in get_constraint_definitions(cursor, source):
+        if contype not in INDEX_CONSTRAINT_TYPES:
+            cursor.execute(f'ALTER TABLE {target} ADD CONSTRAINT {name} {definition}')
+            continue
+        cursor.execute(
+            f'ALTER TABLE {target} ADD CONSTRAINT {name}{suffix} {definition}'
+        )
+        names.append(name)
+
+    for name, definition in get_index_definitions(cursor, source):
+        match = INDEX_DEFINITION.match(definition)
+        cursor.execute(
+            f'{match["create"]} {name}{suffix} ON {target} {match["rest"]}'
+        )
+        names.append(name)
+
+    return names
+
+
+@contextlib.contextmanager
+def index_build_memory(cursor):
+    """
+    Raise `maintenance_work_mem` for index builds on `cursor`'s session to
+    `settings.ETL_MAINTENANCE_WORK_MEM`, restoring it afterwards.
+    """
+
+    cursor.execute(
+        'SET maintenance_work_mem = %s', [settings.ETL_MAINTENANCE_WORK_MEM]
+    )
+    try:
+        yield
+    finally:
+        cursor.execute('RESET maintenance_work_mem')
+
+
+def get_owned_sequences(cursor, table: str) -> List[Tuple[str, str]]:
+    """
+    Return the (column, sequence) of serial columns of `table`.
+    """
+
+    cursor.execute('''
+        SELECT attname, pg_get_serial_sequence(%s, attname)
+        FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+    ''', [table, table])
+    return [
+        (column, sequence)
+        for column, sequence in cursor.fetchall()
+        if sequence
+    ]
+
+
+class ShadowTable:
+    """
+    An unlogged, unindexed copy of `table` to load into, then swap in.
+    """
+
+    SUFFIX = '_shadow'
+
+    def __init__(self, table: str):
+        self.table = table
+        self.shadow = f'{table}{self.SUFFIX}'
+        # Names of the live table's indexes, cloned onto the shadow table
+        self.index_names: List[str] = []
+
+    def create(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.shadow}')
+            cursor.execute(
+                f'CREATE UNLOGGED TABLE {self.shadow} '
+                f'(LIKE {self.table} INCLUDING DEFAULTS)'
+            )
+
+    def finish(self) -> None:
+        """
+        Index, log and analyze the loaded shadow table, ahead of the swap.
+        """
+
+        sys.stdout.write(f'\tIndexing {self.shadow}...\n')
+        sys.stdout.flush()
+        # Nothing reads the shadow table, so its indexes are built with plain
+        # (faster) rather than concurrent index builds.
+        with connection.cursor() as cursor, index_build_memory(cursor):
+            self.index_names = clone_indexes(
+                cursor, self.table, self.shadow, self.SUFFIX
+            )
+            # The swapped-in table must survive a crash like any other.
+            cursor.execute(f'ALTER TABLE {self.shadow} SET LOGGED')
+            cursor.execute(f'ANALYZE {self.shadow}')
+
+    def swap(self) -> None:
+        """
+        Replace the live table with the shadow table.
+        """
+
+        sys.stdout.write(f'\tSwapping {self.shadow} in for {self.table}...\n')
+        sys.stdout.flush()
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Serial sequences would be dropped with the live table.
+            for column, sequence in get_owned_sequences(cursor, self.table):
+                cursor.execute(
+                    f'ALTER SEQUENCE {sequence} OWNED BY {self.shadow}.{column}'
+                )
+            cursor.execute(f'DROP TABLE {self.table}')
+            cursor.execute(f'ALTER TABLE {self.shadow} RENAME TO {self.table}')
+            for name in self.index_names:
+                cursor.execute(f'ALTER INDEX {name}{self.SUFFIX} RENAME TO {name}')
@@ -0,0 +1,110 @@
+"""
+This module contains a Django management command to benchmark downloading
+and loading FAC tables from synthetic table dumps.
+"""
+
+import contextlib
+import os
+import sys
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ... import benchmarks, models
+
+
+class Command(BaseCommand):
+    help = 'Benchmark FAC table loads against synthetic table dumps'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--audits-per-year',
+            type=int,
+            default=10_000,
+            help='Audits in each year of the dumps',
+        )
+        parser.add_argument(
+            '--years',
+            type=int,
+            nargs='+',
+            default=list(benchmarks.DUMP_YEARS),
+            help='Audit years to generate dumps for',
+        )
+        parser.add_argument(
+            '--table',
+            dest='tables',
+            action='append',
+            choices=benchmarks.DUMP_TABLES,
+            help='Table to load (repeatable; default: all FAC dump tables)',
+        )
+        parser.add_argument(
+            '--http',
+            action='store_true',
+            help='Download the dumps from a local HTTP server',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Processes parsing the dumps (default: ETL_PARSE_WORKERS)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for the dumps',
+        )
+
+    def handle(self, *args, **options):
+        if models.Audit.objects.exists():
+            raise CommandError(
+                'The database already has audits; benchmark with an empty database.'
+            )
+
+        tables = options['tables'] or benchmarks.DUMP_TABLES
+
+        with tempfile.TemporaryDirectory() as work_dir, \
+                contextlib.ExitStack() as stack:
+            source_dir = os.path.join(work_dir, 'source')
+            sys.stdout.write(
+                f'Generating dumps of {options["audits_per_year"]} audits per '
+                f'year for {", ".join(map(str, options["years"]))}...\n'
+            )
+            sys.stdout.flush()
+            counts = benchmarks.generate_dumps(
+                source_dir,
+                options['audits_per_year'],
+                years=options['years'],
+                seed=options['seed'],
+            )
+            for table, count in counts.items():
+                sys.stdout.write(f'\t{table}: {count} rows\n')
+
+            source_root = source_dir
+            if options['http']:
+                source_root = stack.enter_context(
+                    benchmarks.serve_directory(source_dir)
+                )
+
+            # Tables are loaded in a transaction that is rolled back, leaving
+            # the database empty again.
+            with transaction.atomic():
+                results = benchmarks.run_benchmark(
+                    source_root,
+                    os.path.join(work_dir, 'dumps'),
+                    tables=tables,
+                    workers=options['workers'],
+                )
+                transaction.set_rollback(True)
+
+        sys.stdout.write(
+            f'{"table":<12} {"rows":>10} {"MB":>8} {"download s":>11} '
+            f'{"load s":>8} {"rows/s":>10} {"peak RSS MB":>12} {"worker MB":>10}\n'
+        )
+        for result in results:
+            sys.stdout.write(
+                f'{result.table:<12} {result.rows:>10} {result.megabytes:>8.1f} '
+                f'{result.download_seconds:>11.2f} {result.load_seconds:>8.2f} '
+                f'{result.rows_per_second:>10.0f} {result.peak_rss_mb:>12.1f} '
+                f'{result.peak_worker_rss_mb:>10.1f}\n'
+            )
@@ -9,7 +9,12 @@ import sys
 from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from distiller.gateways import files
+from distiller.instrumentation import registry
+from distiller.instrumentation.metrics import record_pdf_extraction
 from ...etls import extract_pdf
+from ...etls.metrics import RunMetrics
+from ...models import ETLLog
 
 
 class Command(BaseCommand):
@@ -19,6 +24,9 @@ class Command(BaseCommand):
         parser.add_argument(
             "--all", action="store_true", help="Extract all PDFs",
         )
+        parser.add_argument(
+            "--log", action="store_true", help="Log to database",
+        )
         parser.add_argument("pdf_ids", nargs="*", type=int)
 
     def handle(self, *args, **options):
@@ -29,7 +37,17 @@ class Command(BaseCommand):
             sys.stdout.write("Extracting all PDFs ...\n")
             sys.stdout.flush()
 
+        metrics = RunMetrics()
         for pdf_id in pdf_ids:
             sys.stdout.write(f'Extracting PDF id "{pdf_id}"...\n')
             sys.stdout.flush()
-            extract_pdf.process_audit_pdf(nlp, pdf_id)
+            extract_pdf.process_audit_pdf(nlp, pdf_id, metrics=metrics)
+
+        record_pdf_extraction(metrics)
+        registry.save_job_metrics("extract_pdfs")
+
+        if options["log"]:
+            target = "all" if options["all"] else ",".join(map(str, pdf_ids))
+            ETLLog.objects.log_pdf_extraction(target[:128], metrics=metrics.as_dict())
+
+        files.write_s3_call_counts(sys.stdout)
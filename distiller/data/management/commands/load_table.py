@@ -10,6 +10,7 @@ import sys
 from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from distiller.gateways import files
 from ...etls import load_dumps
 
 
@@ -44,3 +45,5 @@ class Command(BaseCommand):
                     source_dir=settings.LOAD_TABLE_ROOT,
                     log_to_db=options['log'],
                 )
+
+        files.write_s3_call_counts(sys.stdout)
@@ -0,0 +1,45 @@
+"""
+This module contains a Django management command to load rows quarantined
+by table loads, once the loader has been fixed to accept them.
+"""
+
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from distiller.gateways import files
+from ...etls import load_dumps
+
+
+class Command(BaseCommand):
+    help = 'Load quarantined rows of FAC tables that are now accepted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Replay quarantined rows of all supported FAC tables',
+        )
+        for table in load_dumps.FAC_TABLES_NAMES:
+            parser.add_argument(
+                f'--{table}',
+                action='store_true',
+                help=f'Replay quarantined rows of {table} FAC table',
+            )
+        parser.add_argument(
+            '--log',
+            action='store_true',
+            help='Log to database',
+        )
+
+    def handle(self, *args, **options):
+        for table in load_dumps.FAC_TABLES_NAMES:
+            if options['all'] or options[table]:
+                load_dumps.replay_quarantine(
+                    table,
+                    source_dir=settings.LOAD_TABLE_ROOT,
+                    log_to_db=options['log'],
+                )
+
+        files.write_s3_call_counts(sys.stdout)
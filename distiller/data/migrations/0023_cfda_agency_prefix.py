@@ -0,0 +1,27 @@
+# Generated by Django 3.1.14 on 2026-10-19 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0022_auto_20200831_2220'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cfda',
+            name='agency_prefix',
+            field=models.CharField(blank=True, help_text='Federal Agency Prefix', max_length=2, null=True),
+        ),
+        # Populate prefixes of existing rows before building the index.
+        migrations.RunSQL(
+            sql='UPDATE data_cfda SET agency_prefix = left(cfda_id, 2)',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='cfda',
+            index=models.Index(fields=['agency_prefix', 'audit_year', 'dbkey'], name='cfda_agency_prefix_audit_idx'),
+        ),
+    ]
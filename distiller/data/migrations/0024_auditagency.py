@@ -0,0 +1,39 @@
+# Generated by Django 3.1.14 on 2026-10-19 12:37
+
+import compositefk.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0023_cfda_agency_prefix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditAgency',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audit_year', models.DecimalField(decimal_places=0, help_text='Audit Year and DBKEY (database key) combined make up the primary key.', max_digits=4)),
+                ('dbkey', models.CharField(help_text='Audit Year and DBKEY (database key) combined make up the primary key.', max_length=6)),
+                ('agency_prefix', models.CharField(help_text='Federal Agency Prefix', max_length=2)),
+                ('federal_agency', models.TextField(blank=True, help_text='Federal Agency (030), from the assistance listings', null=True)),
+                ('total_amount', models.DecimalField(blank=True, decimal_places=2, help_text="Total Amount Expended for the Agency's Federal Programs", max_digits=16, null=True)),
+                ('audit', compositefk.fields.CompositeForeignKey(null_if_equal=[], on_delete=django.db.models.deletion.DO_NOTHING, related_name='agencies', to='data.audit', to_fields={'audit_year': compositefk.fields.LocalFieldValue('audit_year'), 'dbkey': compositefk.fields.LocalFieldValue('dbkey')})),
+            ],
+            options={
+                'verbose_name': 'audit agency',
+                'verbose_name_plural': 'audit agencies',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='auditagency',
+            index=models.Index(fields=['agency_prefix', 'audit_year', 'dbkey'], name='auditagency_prefix_audit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditagency',
+            index=models.Index(fields=['federal_agency', 'audit_year', 'dbkey'], name='auditagency_agency_audit_idx'),
+        ),
+    ]
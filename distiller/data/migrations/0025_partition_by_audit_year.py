@@ -0,0 +1,132 @@
+"""
+Partition the largest FAC tables by audit year.
+
+Each table is recreated as a list-partitioned table with a partition per
+audit year it contains, plus a default partition. PostgreSQL requires the
+partition key in the primary key, so primary keys become
+(<primary key>, audit_year); Django's view of the schema is unchanged.
+"""
+
+from django.db import migrations
+
+
+PARTITIONED_TABLES = {
+    'data_cfda': 'elec_audits_id',
+    'data_finding': 'elec_audit_findings_id',
+    'data_findingtext': 'seq_number',
+    'data_captext': 'seq_number',
+}
+
+
+def _get_constraints(cursor, table):
+    # The (name, type, columns) of the primary key and unique constraints on
+    # `table`. Django names some primary keys after the column, not the table.
+    cursor.execute('''
+        SELECT conname, contype, ARRAY(
+            SELECT attname FROM pg_attribute
+            WHERE attrelid = conrelid AND attnum = ANY(conkey)
+            ORDER BY array_position(conkey, attnum)
+        )
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'u')
+    ''', [table])
+    return cursor.fetchall()
+
+
+def _get_indexes(cursor, table, constraint_names):
+    cursor.execute(
+        'SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s',
+        [table]
+    )
+    return [
+        (name, definition)
+        for name, definition in cursor.fetchall()
+        if name not in constraint_names
+    ]
+
+
+def _constraint_columns(contype, columns, *, pk_columns, partitioned):
+    if contype == 'p':
+        return list(pk_columns)
+    # Unique constraints on a partitioned table must include the partition
+    # key.
+    columns = [column for column in columns if column != 'audit_year']
+    return columns + ['audit_year'] if partitioned else columns
+
+
+def _recreate_table(cursor, table, *, pk_columns, partitioned):
+    old_table = f'{table}_old'
+    constraints = _get_constraints(cursor, table)
+    indexes = _get_indexes(cursor, table, {name for name, _type, _columns in constraints})
+
+    # Drop constraints and indexes so their names can be reused, and so the
+    # copy below doesn't maintain them.
+    for name, _type, _columns in constraints:
+        cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT {name}')
+    for name, _definition in indexes:
+        cursor.execute(f'DROP INDEX {name}')
+    cursor.execute(f'ALTER TABLE {table} RENAME TO {old_table}')
+
+    cursor.execute(
+        f'CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        + (' PARTITION BY LIST (audit_year)' if partitioned else '')
+    )
+    if partitioned:
+        cursor.execute(
+            f'SELECT DISTINCT audit_year FROM {old_table} '
+            f'WHERE audit_year IS NOT NULL'
+        )
+        for audit_year, in cursor.fetchall():
+            cursor.execute(
+                f'CREATE TABLE {table}_y{int(audit_year)} PARTITION OF {table} '
+                f'FOR VALUES IN ({int(audit_year)})'
+            )
+        cursor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+    cursor.execute(f'INSERT INTO {table} SELECT * FROM {old_table}')
+    cursor.execute(f'DROP TABLE {old_table}')
+
+    for name, contype, columns in constraints:
+        columns = _constraint_columns(
+            contype, columns, pk_columns=pk_columns, partitioned=partitioned
+        )
+        cursor.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {name} '
+            f'{"PRIMARY KEY" if contype == "p" else "UNIQUE"} ({", ".join(columns)})'
+        )
+    # Index definitions were read before the rename, so refer to `table`.
+    for _name, definition in indexes:
+        cursor.execute(definition)
+
+
+def partition_tables(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for table, pk_column in PARTITIONED_TABLES.items():
+            _recreate_table(
+                cursor,
+                table,
+                pk_columns=(pk_column, 'audit_year'),
+                partitioned=True,
+            )
+
+
+def unpartition_tables(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for table, pk_column in PARTITIONED_TABLES.items():
+            _recreate_table(
+                cursor,
+                table,
+                pk_columns=(pk_column,),
+                partitioned=False,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0024_auditagency'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
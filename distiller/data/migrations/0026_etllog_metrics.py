@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-19 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0025_partition_by_audit_year'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='etllog',
+            name='metrics',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-19 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data', '0026_etllog_metrics'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='etllog',
+            name='operation',
+            field=models.CharField(choices=[('load_table', 'Load table'), ('download_table', 'Download table'), ('fac_crawl', 'FAC document crawl'), ('extract_pdfs', 'Extract PDFs')], max_length=16),
+        ),
+    ]
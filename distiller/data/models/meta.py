@@ -2,22 +2,39 @@ from django.db import models
 
 
 class ETLLogManager(models.Manager):
-    def log_download_table(self, table_name):
+    def log_download_table(self, table_name, metrics=None):
         return self.create(
             operation='download_table',
             target=table_name,
+            metrics=metrics or {},
         )
 
-    def log_load_table(self, table_name):
+    def log_load_table(self, table_name, metrics=None):
         return self.create(
             operation='load_table',
             target=table_name,
+            metrics=metrics or {},
         )
 
-    def log_fac_document_crawl(self, crawl_parameters):
+    def log_replay_table(self, table_name, metrics=None):
+        return self.create(
+            operation='replay_table',
+            target=table_name,
+            metrics=metrics or {},
+        )
+
+    def log_fac_document_crawl(self, crawl_parameters, metrics=None):
         return self.create(
             operation='fac_crawl',
             target=crawl_parameters,
+            metrics=metrics or {},
+        )
+
+    def log_pdf_extraction(self, target, metrics=None):
+        return self.create(
+            operation='extract_pdfs',
+            target=target,
+            metrics=metrics or {},
         )
 
     def get_most_recent_load_table(self):
@@ -26,6 +43,15 @@ class ETLLogManager(models.Manager):
     def get_most_recent_document_crawl(self):
         return self.filter(operation='fac_crawl').order_by('-created').first()
 
+    def get_most_recent_data_change(self):
+        """
+        Return the most recent operation that changed the loaded FAC data,
+        either a table load, a replay of quarantined rows or a document crawl.
+        """
+        return self.filter(
+            operation__in=('load_table', 'replay_table', 'fac_crawl')
+        ).order_by('-created').first()
+
 
 
 class ETLLog(models.Model):
@@ -39,6 +65,12 @@ class ETLLog(models.Model):
     operation = models.CharField(max_length=16, choices=(
         ('load_table', 'Load table'),
         ('download_table', 'Download table'),
+        ('replay_table', 'Replay quarantined rows'),
         ('fac_crawl', 'FAC document crawl'),
+        ('extract_pdfs', 'Extract PDFs'),
     ))
     target = models.CharField(max_length=128)
+    # Measurements of the operation, as recorded by `etls.metrics.RunMetrics`:
+    # {"phases": {"load": 12.5, ...}, "counts": {"rows_loaded": 1000, ...},
+    #  "peak_rss_mb": 210.4}
+    metrics = models.JSONField(default=dict, blank=True)
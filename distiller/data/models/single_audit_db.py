@@ -10,11 +10,40 @@ from datetime import date
 from typing import List, Optional
 
 from compositefk.fields import CompositeForeignKey
+from django.apps import apps
 from django.db import models
+from django.db.models.expressions import RawSQL
 
 from .assistance_listings import AssistanceListing
 
 
+# Length of the agency prefix of a CFDA number, e.g. "93" in "93.045"
+AGENCY_PREFIX_LENGTH = 2
+
+
+def get_agency_prefix(cfda_id: Optional[str]) -> Optional[str]:
+    return cfda_id[:AGENCY_PREFIX_LENGTH] if cfda_id else None
+
+
+def cfda_prefix_q(prefix: str, relation: str = '') -> models.Q:
+    """
+    Match CFDA numbers starting with `prefix`, by way of the indexed
+    `CFDA.agency_prefix`. A `LIKE` on the CFDA number itself can't use an
+    ordinary index under the database's collation.
+    """
+
+    if len(prefix) < AGENCY_PREFIX_LENGTH:
+        return models.Q(**{f'{relation}agency_prefix__startswith': prefix})
+
+    q_obj = models.Q(**{f'{relation}agency_prefix': get_agency_prefix(prefix)})
+    if len(prefix) > AGENCY_PREFIX_LENGTH:
+        # Narrowed by the agency prefix, so this filters few rows.
+        q_obj &= models.Q(**{
+            f'{relation}cfda__program_number__startswith': prefix
+        })
+    return q_obj
+
+
 class AuditQuerySet(models.QuerySet):
     def filter_dates(
         self,
@@ -42,9 +71,22 @@ class AuditQuerySet(models.QuerySet):
         )
 
     def filter_cfda_prefix(self, agency_prefix: str):
-        return self.filter(
-            cfdas__cfda__program_number__startswith=agency_prefix
-        )
+        # Agency prefixes are matched against the `AuditAgency` bridge table.
+        # Longer CFDA prefixes fall back to a join through `CFDA`.
+        if len(agency_prefix) == AGENCY_PREFIX_LENGTH:
+            return self._filter_audit_agencies(agency_prefix=agency_prefix)
+        return self.filter(cfda_prefix_q(agency_prefix, relation='cfdas__'))
+
+    def filter_federal_agency(self, federal_agency: str):
+        return self._filter_audit_agencies(federal_agency=federal_agency)
+
+    def _filter_audit_agencies(self, **kwargs):
+        # A semi-join, so an audit matching several agencies isn't duplicated.
+        return self.filter(models.Exists(AuditAgency.objects.filter(
+            audit_year=models.OuterRef('audit_year'),
+            dbkey=models.OuterRef('dbkey'),
+            **kwargs
+        )))
         # .annotate(
         #     cfda_award_sum=models.Sum(
         #         'cfdas__amount',
@@ -79,6 +121,108 @@ class AuditQuerySet(models.QuerySet):
 
         return audits
 
+    def with_current_documents(self):
+        """
+        Annotate each audit with its most recent form and audit documents,
+        from the precomputed current documents view. This replaces a
+        prefetch of every version of every audit's documents.
+        """
+
+        # Look up the model lazily; fac_scraper's models import this module.
+        CurrentDocument = apps.get_model('fac_scraper', 'CurrentDocument')
+
+        annotations = {}
+        for file_type in CURRENT_DOCUMENT_TYPES:
+            documents = CurrentDocument.objects.filter(
+                audit_year=models.OuterRef('audit_year'),
+                dbkey=models.OuterRef('dbkey'),
+                file_type=file_type,
+            )
+            for field in CURRENT_DOCUMENT_FIELDS:
+                annotations[f'current_{file_type}_{field}'] = models.Subquery(
+                    documents.values(field)[:1]
+                )
+
+        return self.annotate(**annotations)
+
+    def with_finding_texts_json(self):
+        """
+        Annotate each audit with `finding_texts_json`: its finding texts, with
+        the flags and CFDA program of each finding and the corrective action
+        plans, aggregated as JSON by the database.
+
+        The search results previously prefetched each of these relations,
+        costing a query per relation with a large `IN` list of composite keys.
+        """
+
+        return self.annotate(
+            finding_texts_json=_CorrelatedSQL(
+                FINDING_TEXTS_JSON_SQL.format(
+                    audit=Audit._meta.db_table,  # pylint: disable=W0212
+                    finding_text=FindingText._meta.db_table,  # pylint: disable=W0212
+                    finding=Finding._meta.db_table,  # pylint: disable=W0212
+                    cfda=CFDA._meta.db_table,  # pylint: disable=W0212
+                    cap_text=CAPText._meta.db_table,  # pylint: disable=W0212
+                ),
+                (),
+            )
+        )
+
+
+class _CorrelatedSQL(RawSQL):
+    """
+    A correlated subquery on the audit table. Its result depends only on the
+    audit row, so it doesn't need to be added to any `GROUP BY`.
+    """
+
+    def get_group_by_cols(self, alias=None):
+        return []
+
+
+FINDING_TEXTS_JSON_SQL = '''
+SELECT COALESCE(json_agg(json_build_object(
+    'seq_number', ft.seq_number,
+    'audit_year', ft.audit_year,
+    'dbkey', ft.dbkey,
+    'finding_ref_nums', ft.finding_ref_nums,
+    'text', ft.text,
+    'findings', (
+        SELECT COALESCE(json_agg(json_build_object(
+            'cfda_id', cfda.cfda_id,
+            'federal_program_name', cfda.federal_program_name,
+            'amount', cfda.amount::text,
+            'modified_opinion', f.modified_opinion,
+            'material_weakness', f.material_weakness,
+            'significant_deficiency', f.significant_deficiency,
+            'questioned_costs', f.questioned_costs,
+            'repeat_finding', f.repeat_finding
+        ) ORDER BY f.elec_audit_findings_id), '[]')
+        FROM {finding} f
+        LEFT JOIN {cfda} cfda
+            ON cfda.audit_year = f.audit_year AND cfda.elec_audits_id = f.elec_audits_id
+        WHERE f.audit_year = ft.audit_year
+            AND f.dbkey = ft.dbkey
+            AND f.finding_ref_nums = ft.finding_ref_nums
+    ),
+    'cap_texts', (
+        SELECT COALESCE(json_agg(json_build_object(
+            'text', cap.text
+        ) ORDER BY cap.seq_number), '[]')
+        FROM {cap_text} cap
+        WHERE cap.audit_year = ft.audit_year
+            AND cap.dbkey = ft.dbkey
+            AND cap.finding_ref_nums = ft.finding_ref_nums
+    )
+) ORDER BY ft.finding_ref_nums, ft.seq_number), '[]')
+FROM {finding_text} ft
+WHERE ft.audit_year = {audit}.audit_year AND ft.dbkey = {audit}.dbkey
+'''
+
+
+# Document types and fields annotated by `AuditQuerySet.with_current_documents`
+CURRENT_DOCUMENT_TYPES = ('form', 'audit')
+CURRENT_DOCUMENT_FIELDS = ('id', 'version', 'file_name')
+
 
 class Audit(models.Model):
     objects = AuditQuerySet.as_manager()
@@ -598,7 +742,7 @@ class Audit(models.Model):
 
 class CFDAManager(models.Manager):
     def filter_prefix(self, prefix):
-        return self.filter(cfda__startswith=prefix)
+        return self.filter(cfda_prefix_q(prefix))
 
     def get_audits_for_agency(self, agency_name):
         # Get CFDA numbers for the given agency name.
@@ -616,6 +760,10 @@ class CFDA(models.Model):
         verbose_name = 'CFDA number'
         indexes = [
            models.Index(fields=['audit_year', 'dbkey']),
+           models.Index(
+               fields=['agency_prefix', 'audit_year', 'dbkey'],
+               name='cfda_agency_prefix_audit_idx',
+           ),
         ]
 
     # Use findingscount and elecauditsid fields to link CFDA INFO and FINDINGS
@@ -663,6 +811,14 @@ class CFDA(models.Model):
         db_constraint=False,
         help_text='Federal Agency Prefix and Extension'
     )
+    # Agency prefix of `cfda`, stored at load time so agency searches can use
+    # an index.
+    agency_prefix = models.CharField(
+        null=True,
+        blank=True,
+        max_length=AGENCY_PREFIX_LENGTH,
+        help_text='Federal Agency Prefix'
+    )
     # 50 character max
     award_identification = models.CharField(
         null=True,
@@ -1028,3 +1184,65 @@ class CAPText(models.Model):
         },
         related_name='cap_texts'
     )
+
+
+class AuditAgency(models.Model):
+    """
+    The agencies each audit's federal awards are from, with the total amount
+    awarded by each. This is built from `CFDA` and `AssistanceListing` after
+    either is loaded, so audits can be filtered by agency without joining
+    through, and de-duplicating, the CFDA table.
+    """
+
+    class Meta:
+        verbose_name = 'audit agency'
+        verbose_name_plural = 'audit agencies'
+        indexes = [
+           models.Index(
+               fields=['agency_prefix', 'audit_year', 'dbkey'],
+               name='auditagency_prefix_audit_idx',
+           ),
+           models.Index(
+               fields=['federal_agency', 'audit_year', 'dbkey'],
+               name='auditagency_agency_audit_idx',
+           ),
+        ]
+
+    audit_year = models.DecimalField(
+        max_digits=4,
+        decimal_places=0,
+        help_text='Audit Year and DBKEY (database key) combined make up the primary key.'
+    )
+    dbkey = models.CharField(
+        max_length=6,
+        help_text='Audit Year and DBKEY (database key) combined make up the primary key.'
+    )
+
+    # Map to General/Audit
+    audit = CompositeForeignKey(
+        Audit,
+        on_delete=models.DO_NOTHING,
+        to_fields={
+           'audit_year': 'audit_year',
+           'dbkey': 'dbkey'
+        },
+        related_name='agencies'
+    )
+
+    agency_prefix = models.CharField(
+        max_length=AGENCY_PREFIX_LENGTH,
+        help_text='Federal Agency Prefix'
+    )
+    # Null for CFDA numbers that aren't in the assistance listings
+    federal_agency = models.TextField(
+        null=True,
+        blank=True,
+        help_text='Federal Agency (030), from the assistance listings'
+    )
+    total_amount = models.DecimalField(
+        null=True,
+        blank=True,
+        decimal_places=2,
+        max_digits=16,
+        help_text="Total Amount Expended for the Agency's Federal Programs"
+    )
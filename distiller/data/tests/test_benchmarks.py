@@ -0,0 +1,84 @@
+"""
+Tests for the synthetic FAC table dumps used to benchmark loads.
+"""
+
+import os
+import zipfile
+
+from .. import benchmarks
+from ..etls import load_dumps
+from ..etls.metrics import RunMetrics
+
+
+def _load_instances(dumps_dir, table_name):
+    """
+    Parse the downloaded dumps of `table_name` as `update_table` does.
+    """
+
+    table = load_dumps.FAC_TABLES[table_name]
+    file_paths = sorted(
+        os.path.join(root, file_name)
+        for root, _dirs, file_names in os.walk(os.path.join(dumps_dir, table_name))
+        for file_name in file_names
+    )
+    metrics = RunMetrics()
+    instances = [
+        instance
+        for file_instances in load_dumps._yield_file_instances(
+            file_paths, table, metrics
+        )
+        for instance in file_instances
+    ]
+    return instances, metrics
+
+
+def test_generated_dumps_load(tmp_path):
+    source_dir = str(tmp_path / 'source')
+    counts = benchmarks.generate_dumps(source_dir, 50, years=(2018, 2019))
+
+    assert sorted(os.listdir(source_dir)) == sorted(
+        benchmarks.dump_file_name(table_name, year)
+        for table_name in benchmarks.DUMP_TABLES
+        for year in (2018, 2019)
+    )
+    assert counts['audit'] == 100
+    assert counts['cfda'] >= counts['audit']
+    assert counts['findingtext'] == counts['captext'] == counts['finding']
+
+    with zipfile.ZipFile(os.path.join(source_dir, 'gen18.zip')) as zip_file:
+        header = zip_file.read('gen18.txt').split(b'\r\n', 1)[0].decode()
+    assert 'CPAFOREIGN' in header.split('|')
+
+    dumps_dir = str(tmp_path / 'dumps')
+    for table_name in benchmarks.DUMP_TABLES:
+        load_dumps.download_table(
+            table_name, target_dir=dumps_dir, source_root=source_dir
+        )
+        instances, metrics = _load_instances(dumps_dir, table_name)
+
+        assert len(instances) == counts[table_name]
+        assert metrics.counts.get('rows_rejected', 0) == 0
+
+    audits, _metrics = _load_instances(dumps_dir, 'audit')
+    assert all(audit.fy_end_date.year in (2018, 2019) for audit in audits)
+    assert any(audit.street2 is None for audit in audits)
+    assert all(
+        audit.cpa_country is None for audit in audits if audit.audit_year == '2019'
+    )
+
+
+def test_dumps_downloaded_over_http(tmp_path):
+    source_dir = str(tmp_path / 'source')
+    counts = benchmarks.generate_dumps(source_dir, 10, years=(2019,))
+
+    with benchmarks.serve_directory(source_dir) as source_root:
+        metrics = load_dumps.download_table(
+            'cfda', target_dir=str(tmp_path / 'dumps'), source_root=source_root
+        )
+
+    assert metrics.counts['files_downloaded'] == 1
+    assert metrics.counts['bytes_downloaded'] == os.path.getsize(
+        os.path.join(source_dir, 'cfda19.zip')
+    )
+    instances, _metrics = _load_instances(str(tmp_path / 'dumps'), 'cfda')
+    assert len(instances) == counts['cfda']
@@ -0,0 +1,174 @@
+"""
+Tests for CFDA agency prefix filtering.
+"""
+
+import io
+import os
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+
+from ..etls.load_dumps import FAC_TABLES, _yield_model_instances
+from .. import models
+
+
+# EXPLAIN tests need a PostgreSQL database (as in CI).
+requires_db = pytest.mark.skipif(
+    'DATABASE_URL' not in os.environ,
+    reason='requires a PostgreSQL database (set DATABASE_URL)',
+)
+
+CFDA_CSV = (
+    'AUDITYEAR|DBKEY|EIN|CFDA|ELECAUDITSID\n'
+    '2019|100010|123456789|93.045|1\n'
+    '2019|100010|123456789|10.555|2\n'
+)
+
+
+def test_agency_prefix_computed_at_load():
+    cfdas = list(_yield_model_instances(
+        io.StringIO(CFDA_CSV),
+        **{
+            **FAC_TABLES['cfda'],
+            'field_mapping': {
+                'AUDITYEAR': 'audit_year',
+                'DBKEY': 'dbkey',
+                'EIN': 'ein',
+                'CFDA': 'cfda_id',
+                'ELECAUDITSID': 'elec_audits_id',
+            },
+        }
+    ))
+
+    assert [cfda.agency_prefix for cfda in cfdas] == ['93', '10']
+
+
+def test_prefix_filters_use_agency_prefix():
+    sql = str(models.CFDA.objects.filter_prefix('93').query)
+    assert '"data_cfda"."agency_prefix" = 93' in sql
+    assert 'LIKE' not in sql
+
+    sql = str(models.CFDA.objects.filter_prefix('93.04').query)
+    assert '"data_cfda"."agency_prefix" = 93' in sql
+    assert 'LIKE 93.04%' in sql
+
+    sql = str(models.Audit.objects.filter_cfda_prefix('93.04').query)
+    assert '"data_cfda"."agency_prefix" = 93' in sql
+
+
+def test_audit_agency_filters_are_semi_joins():
+    sql = str(models.Audit.objects.filter_cfda_prefix('93').query)
+    assert 'EXISTS' in sql
+    assert '"data_auditagency" U0' in sql
+    assert 'U0."agency_prefix" = 93' in sql
+    assert 'data_cfda' not in sql
+
+    sql = str(models.Audit.objects.filter_federal_agency('Department of Energy').query)
+    assert 'EXISTS' in sql
+    assert 'U0."federal_agency" = Department of Energy' in sql
+
+
+# CFDAs are partitioned by audit year, and each partition's copy of
+# `cfda_agency_prefix_audit_idx` is named after its columns.
+CFDA_PREFIX_INDEX = 'agency_prefix_audit'
+
+
+def _explain(queryset):
+    with connection.cursor() as cursor:
+        # The test tables are tiny, so steer the planner off of seq scans.
+        cursor.execute('SET enable_seqscan = off')
+        try:
+            return queryset.explain()
+        finally:
+            cursor.execute('RESET enable_seqscan')
+
+
+@requires_db
+@pytest.mark.django_db
+def test_cfda_prefix_filter_uses_index():
+    plan = _explain(models.CFDA.objects.filter_prefix('93'))
+    assert CFDA_PREFIX_INDEX in plan
+
+
+@requires_db
+@pytest.mark.django_db
+def test_audit_prefix_filter_uses_index():
+    plan = _explain(
+        models.Audit.objects.filter_cfda_prefix('93').values('id')
+    )
+    assert 'auditagency_prefix_audit_idx' in plan
+
+    plan = _explain(
+        models.Audit.objects.filter_cfda_prefix('93.04').values('id')
+    )
+    assert CFDA_PREFIX_INDEX in plan
+
+
+@requires_db
+@pytest.mark.django_db
+def test_federal_agency_filter_uses_index():
+    plan = _explain(
+        models.Audit.objects.filter_federal_agency('Department of Energy').values('id')
+    )
+    assert 'auditagency_agency_audit_idx' in plan
+
+
+@requires_db
+@pytest.mark.django_db
+def test_finding_texts_json_prunes_cfda_partitions():
+    with connection.cursor() as cursor:
+        for audit_year in (2018, 2019):
+            cursor.execute(
+                f'CREATE TABLE data_cfda_y{audit_year} PARTITION OF data_cfda '
+                f'FOR VALUES IN ({audit_year})'
+            )
+    models.Audit.objects.create(
+        audit_year=2019,
+        dbkey='100010',
+        fy_end_date=date(2019, 6, 30),
+        period_covered='A',
+        ein='123456789',
+        auditee_name='Auditee',
+        tot_fed_expend=1_000_000,
+        date_firewall=date(2019, 12, 31),
+        fac_accepted_date=date(2020, 1, 15),
+    )
+    cfda = models.CFDA.objects.create(
+        elec_audits_id=1,
+        audit_year=2019,
+        dbkey='100010',
+        ein='123456789',
+        cfda_id='93.045',
+        agency_prefix='93',
+        amount=Decimal('1234.00'),
+    )
+    models.FindingText.objects.create(
+        seq_number=1,
+        audit_year=2019,
+        dbkey='100010',
+        finding_ref_nums='2019-001',
+        text='Finding',
+        charts_tables=False,
+    )
+    models.Finding.objects.create(
+        elec_audit_findings_id=1,
+        audit_year=2019,
+        dbkey='100010',
+        elec_audits=cfda,
+        finding_ref_nums='2019-001',
+    )
+
+    # Only the finding's audit year partition of CFDAs is scanned.
+    plan = models.Audit.objects.with_finding_texts_json().explain(analyze=True)
+    scans = {
+        line.split(' on ')[1].split()[0]: 'never executed' not in line
+        for line in plan.splitlines()
+        if 'Scan' in line and ' on data_cfda' in line
+    }
+    assert scans == {
+        'data_cfda_y2018': False,
+        'data_cfda_y2019': True,
+        'data_cfda_default': False,
+    }
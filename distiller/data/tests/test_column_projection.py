@@ -0,0 +1,49 @@
+"""
+Tests for loading table dumps whose column layout varies from year to year.
+"""
+
+import io
+
+import pytest
+
+from ..etls import load_dumps
+
+
+FINDING_TEXT = load_dumps.FAC_TABLES['findingtext']
+
+
+def _load(csv_text):
+    return list(load_dumps._yield_model_instances(
+        io.StringIO(csv_text), **FINDING_TEXT
+    ))
+
+
+def test_columns_mapped_by_header():
+    instances = _load(
+        'AUDITYEAR|SEQ_NUMBER|PAGE|DBKEY|FINDINGREFNUMS|CHARTSTABLES|TEXT\n'
+        '2019|1|3|100010|2019-001|Y|Finding \n'
+    )
+
+    assert len(instances) == 1
+    assert instances[0].seq_number == '1'
+    assert instances[0].audit_year == '2019'
+    assert instances[0].text == 'Finding'
+    assert instances[0].charts_tables is True
+
+
+def test_projection_describes_layout():
+    projection = load_dumps.ColumnProjection(
+        ['DBKEY', 'CPAFOREIGN'], {'DBKEY': 'dbkey', 'STATE': 'state'}, {}
+    )
+
+    assert projection.missing == ['STATE']
+    assert projection.ignored == ['CPAFOREIGN']
+    assert projection.project([' 100010 ', 'N']) == {'dbkey': '100010', 'state': None}
+
+
+def test_missing_required_column():
+    with pytest.raises(ValueError, match='SEQ_NUMBER'):
+        _load(
+            'AUDITYEAR|DBKEY|FINDINGREFNUMS|TEXT|CHARTSTABLES\n'
+            '2019|100010|2019-001|Finding|N\n'
+        )
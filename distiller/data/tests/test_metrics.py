@@ -0,0 +1,62 @@
+"""
+Tests for ETL run metrics.
+"""
+
+import io
+
+from ..etls import load_dumps
+from ..etls.metrics import RunMetrics
+from .. import models
+
+
+FINDING_TEXT_CSV = (
+    'SEQ_NUMBER|DBKEY|AUDITYEAR|FINDINGREFNUMS|TEXT|CHARTSTABLES\n'
+    '1|100010|2019|2019-001|Finding|N\n'
+    '2|100010|2019|2019-002\n'
+    '3|100010|2019|2019-003|Finding|N\n'
+)
+
+
+def test_phases_accumulate():
+    metrics = RunMetrics()
+    with metrics.phase('read'):
+        pass
+    first = metrics.phases['read']
+    with metrics.phase('read'):
+        pass
+
+    assert metrics.phases['read'] >= first
+    assert set(metrics.as_dict()) == {'phases', 'counts', 'peak_rss_mb'}
+    assert metrics.as_dict()['peak_rss_mb'] > 0
+
+
+def test_total_is_wall_clock_time():
+    metrics = RunMetrics()
+    with metrics.phase('load'):
+        with metrics.phase('read'):
+            pass
+    worker_metrics = RunMetrics()
+    worker_metrics.phases['parse'] = 60
+    metrics.merge(worker_metrics)
+
+    phases = metrics.as_dict()['phases']
+    assert phases['total'] >= phases['load']
+    assert phases['total'] < phases['parse']
+
+
+def test_rejected_rows_are_counted():
+    metrics = RunMetrics()
+    instances = list(load_dumps._yield_model_instances(
+        io.StringIO(FINDING_TEXT_CSV),
+        metrics=metrics,
+        **load_dumps.FAC_TABLES['findingtext'],
+    ))
+
+    assert [instance.seq_number for instance in instances] == ['1', '3']
+    assert all(isinstance(instance, models.FindingText) for instance in instances)
+    assert metrics.counts == {
+        'rows_read': 3,
+        'rows_loaded': 2,
+        'rows_rejected': 1,
+        'rows_rejected_too_few_columns': 1,
+    }
@@ -0,0 +1,170 @@
+"""
+Tests for parsing table dumps in worker processes.
+"""
+
+import gzip
+
+from ..etls import load_dumps, parallel, partitions, quarantine
+from .. import models
+
+
+def _square(value):
+    return value * value
+
+
+def test_split_lines():
+    text = 'header\nrow 1\nrow 2\nrow 3\nlast row'
+    header_end = text.index('\n') + 1
+
+    chunks = list(parallel.split_lines(text, header_end, chunk_size=8))
+
+    assert [text[chunk.start:chunk.end] for chunk in chunks] == [
+        'row 1\nrow 2\n', 'row 3\nlast row',
+    ]
+    assert list(parallel.split_lines(text.encode(), header_end, chunk_size=8)) == chunks
+
+
+def test_mapped_line_reader(tmp_path):
+    path = tmp_path / 'dump.txt'
+    path.write_bytes(b'A|B\r\n1|caf\xe9\r\n\r\n2|x|y\r\n3|z')
+    header_end = len(b'A|B\r\n')
+
+    with parallel.map_file(str(path)) as mapped:
+        reader = parallel.MappedLineReader(mapped, header_end, len(mapped), ['A', 'B'])
+        rows = list(reader)
+
+    assert rows == [
+        ['A', 'B'], [b'1', b'caf\xe9'], [], [b'2', b'x', b'y'], [b'3', b'z'],
+    ]
+    assert reader.line_num == 5
+
+    (tmp_path / 'empty.txt').write_bytes(b'')
+    with parallel.map_file(str(tmp_path / 'empty.txt')) as mapped:
+        assert list(parallel.split_lines(mapped)) == []
+
+
+def test_map_bounded_keeps_order_and_bounds_pending():
+    consumed = []
+
+    def args():
+        for value in range(20):
+            consumed.append(value)
+            yield (value,)
+
+    results = parallel.map_bounded(_square, args(), workers=2, max_pending=3)
+
+    assert next(results) == 0
+    # The first result is yielded once `max_pending` are in flight.
+    assert len(consumed) == 4
+    assert list(results) == [value * value for value in range(1, 20)]
+
+
+def _dump_text():
+    lines = ['SEQ_NUMBER|DBKEY|AUDITYEAR|FINDINGREFNUMS|TEXT|CHARTSTABLES']
+    for seq_number in range(1, 201):
+        if seq_number % 50 == 0:
+            lines.append(f'{seq_number}|100010|2019')
+        else:
+            year = 2018 + seq_number % 2
+            lines.append(f'{seq_number}|100010|{year}|{year}-001|Finding é|N')
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def test_parsed_rows_match_serial_load(tmp_path, monkeypatch):
+    dump_path = tmp_path / 'findingstext19.txt'
+    dump_path.write_text(_dump_text(), encoding='latin-1')
+    monkeypatch.setattr(parallel, 'PARSE_CHUNK_SIZE', 1000)
+    table = load_dumps.FAC_TABLES['findingtext']
+
+    serial_metrics = load_dumps.RunMetrics()
+    serial_instances = [
+        instance
+        for instances in load_dumps._yield_file_instances(
+            [str(dump_path)], table, serial_metrics, str(tmp_path / 'serial')
+        )
+        for instance in instances
+    ]
+
+    parallel_metrics = load_dumps.RunMetrics()
+    copy_rows = list(load_dumps._yield_parsed_rows(
+        [str(dump_path)], 'findingtext', parallel_metrics, str(tmp_path / 'parallel'), 2
+    ))
+
+    assert len(copy_rows) > 1
+    for audit_year in (2018, 2019):
+        assert ''.join(rows.get(audit_year, '') for rows in copy_rows) == (
+            partitions.format_copy_rows(
+                models.FindingText,
+                [
+                    instance for instance in serial_instances
+                    if int(instance.audit_year) == audit_year
+                ],
+            )
+        )
+
+    for name in ('rows_read', 'rows_loaded', 'rows_rejected'):
+        assert parallel_metrics.counts[name] == serial_metrics.counts[name]
+    assert parallel_metrics.counts['rows_rejected'] == 4
+    assert 'parse' in parallel_metrics.phases
+
+    def read(directory):
+        path = quarantine.get_quarantine_path(str(directory), str(dump_path))
+        with gzip.open(path, 'rt', encoding='latin-1') as in_file:
+            return in_file.read()
+
+    assert read(tmp_path / 'parallel') == read(tmp_path / 'serial')
+    assert '\ntoo_few_columns,,51,50,100010,2019' in read(tmp_path / 'parallel')
+
+
+def test_mapped_chunk_matches_text_chunk(tmp_path):
+    text = _dump_text()
+    dump_path = tmp_path / 'findingstext19.txt'
+    dump_path.write_text(text, encoding='latin-1')
+    header_end = text.index('\n') + 1
+    header = text[:header_end].rstrip().split('|')
+
+    for chunk in parallel.split_lines(text, header_end, chunk_size=1000):
+        from_text = load_dumps._parse_chunk(
+            'findingtext', text[:header_end], text[chunk.start:chunk.end]
+        )
+        from_file = load_dumps._parse_mapped_chunk(
+            'findingtext', str(dump_path), header, chunk.start, chunk.end
+        )
+
+        assert from_file.copy_rows == from_text.copy_rows
+        assert from_file.rejected == from_text.rejected
+        assert from_file.lines == from_text.lines
+        assert from_file.metrics.counts == from_text.metrics.counts
+
+
+def test_update_table_copies_parsed_rows(tmp_path, monkeypatch):
+    dump_dir = tmp_path / 'findingtext' / '2020-01-01T00-00-00'
+    dump_dir.mkdir(parents=True)
+    (dump_dir / 'findingstext19.txt').write_text(_dump_text(), encoding='latin-1')
+    monkeypatch.setattr(parallel, 'PARSE_CHUNK_SIZE', 1000)
+
+    loaded = []
+
+    class FakePartitionLoader:
+        def __init__(self, model, batch_size):
+            pass
+
+        def load_rows(self, audit_year, rows):
+            loaded.append((audit_year, rows.count('\n')))
+
+        def finish(self):
+            pass
+
+        def swap_partitions(self):
+            pass
+
+    monkeypatch.setattr(load_dumps.partitions, 'PartitionLoader', FakePartitionLoader)
+
+    metrics = load_dumps.update_table('findingtext', str(tmp_path), workers=2)
+
+    assert {audit_year for audit_year, _count in loaded} == {2018, 2019}
+    assert sum(count for _year, count in loaded) == metrics.counts['rows_loaded'] == 196
+    assert {'read', 'parse', 'copy', 'load'} <= set(metrics.phases)
+    assert [path.name for path in (tmp_path / 'quarantine').rglob('*.gz')] == [
+        'findingstext19.txt.csv.gz'
+    ]
@@ -0,0 +1,144 @@
+"""
+Tests for loading FAC tables partitioned by audit year.
+"""
+
+import contextlib
+import os
+
+import pytest
+from django.db import IntegrityError, connection, transaction
+
+from ..etls import partitions
+from .. import models
+from .utils import RecordingCursor
+
+
+# Tests that load partitions need a PostgreSQL database (as in CI).
+requires_db = pytest.mark.skipif(
+    'DATABASE_URL' not in os.environ,
+    reason='requires a PostgreSQL database (set DATABASE_URL)',
+)
+
+
+def _finding_text(seq_number, audit_year):
+    return models.FindingText(
+        seq_number=seq_number,
+        audit_year=audit_year,
+        dbkey='100010',
+        finding_ref_nums='2019-001',
+        text='Finding, with "quotes"',
+        charts_tables=False,
+    )
+
+
+def test_format_copy_rows_keeps_empty_strings_apart_from_nulls():
+    finding_text = _finding_text(1, 2019)
+    finding_text.text = ''
+    finding_text.charts_tables = None
+
+    # COPY reads quoted empty values as empty strings, unquoted ones as NULL.
+    assert partitions.format_copy_rows(models.FindingText, [finding_text]) == (
+        '1,"100010","2019","2019-001","",\r\n'
+    )
+
+
+def test_partition_loader_swaps_loaded_years(monkeypatch):
+    cursor = RecordingCursor({
+        'FROM pg_constraint': [
+            ('data_findingtext_pkey', 'p', 'PRIMARY KEY (seq_number, audit_year)'),
+        ],
+        'FROM pg_indexes': [
+            ('data_findingtext_pkey', 'CREATE UNIQUE INDEX data_findingtext_pkey ...'),
+            (
+                'data_findin_audit_y_idx',
+                'CREATE INDEX data_findin_audit_y_idx ON ONLY public.data_findingtext '
+                'USING btree (audit_year, dbkey)',
+            ),
+        ],
+    })
+    monkeypatch.setattr(connection, 'cursor', lambda: cursor)
+    monkeypatch.setattr(partitions.transaction, 'atomic', contextlib.nullcontext)
+
+    loader = partitions.PartitionLoader(models.FindingText, batch_size=2)
+    loader.load([
+        _finding_text(1, 2019),
+        _finding_text(2, 2018),
+        _finding_text(3, 2019),
+    ])
+    loader.finish()
+    loader.swap_partitions()
+
+    assert cursor.copied == [
+        '1,"100010","2019","2019-001","Finding, with ""quotes""",False\r\n'
+        '3,"100010","2019","2019-001","Finding, with ""quotes""",False\r\n',
+        '2,"100010","2018","2019-001","Finding, with ""quotes""",False\r\n',
+    ]
+    assert (
+        'ALTER TABLE data_findingtext ATTACH PARTITION data_findingtext_y2018 '
+        'FOR VALUES IN (2018)'
+    ) in cursor.statements
+    assert (
+        'ALTER TABLE data_findingtext_y2019_load RENAME TO data_findingtext_y2019'
+    ) in cursor.statements
+    assert (
+        'CREATE INDEX data_findin_audit_y_idx_y2019_load ON data_findingtext_y2019_load '
+        'USING btree (audit_year, dbkey)'
+    ) in cursor.statements
+    assert (
+        'ALTER INDEX data_findingtext_pkey_y2019_load RENAME TO data_findingtext_pkey_y2019'
+    ) in cursor.statements
+    assert not any('TRUNCATE' in sql for sql in cursor.statements)
+
+
+@requires_db
+@pytest.mark.django_db
+def test_reload_replaces_partition():
+    models.FindingText.objects.create(
+        seq_number=1,
+        audit_year=2019,
+        dbkey='100010',
+        finding_ref_nums='2019-001',
+        text='Stale',
+        charts_tables=False,
+    )
+
+    loader = partitions.PartitionLoader(models.FindingText, batch_size=1_000)
+    loader.load([_finding_text(2, 2019), _finding_text(3, 2018)])
+    loader.finish()
+    loader.swap_partitions()
+
+    assert list(
+        models.FindingText.objects.order_by('seq_number').values_list(
+            'seq_number', flat=True
+        )
+    ) == [2, 3]
+
+    plan = models.FindingText.objects.filter(audit_year=2019).explain()
+    assert 'data_findingtext_y2019' in plan
+    assert 'data_findingtext_y2018' not in plan
+
+
+@requires_db
+@pytest.mark.django_db
+def test_reload_keeps_check_constraints():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'ALTER TABLE data_findingtext ADD CONSTRAINT data_findingtext_seq_number '
+            'CHECK (seq_number > 0)'
+        )
+
+    # ATTACH PARTITION requires the parent's check constraints, by name.
+    loader = partitions.PartitionLoader(models.FindingText, batch_size=1_000)
+    loader.load([_finding_text(2, 2019)])
+    loader.finish()
+    loader.swap_partitions()
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        models.FindingText.objects.create(
+            seq_number=-1,
+            audit_year=2019,
+            dbkey='100010',
+            finding_ref_nums='2019-001',
+            text='Finding',
+            charts_tables=False,
+        )
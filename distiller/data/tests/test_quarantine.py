@@ -0,0 +1,192 @@
+"""
+Tests for quarantining rows rejected from table dumps, and replaying them.
+"""
+
+import contextlib
+import csv
+import gzip
+import io
+import os
+
+import pytest
+
+from ..etls import load_dumps, quarantine
+from .. import models
+
+
+FINDING_TEXT_DUMP = (
+    'SEQ_NUMBER|DBKEY|AUDITYEAR|FINDINGREFNUMS|TEXT|CHARTSTABLES\r\n'
+    '1|100010|2019|2019-001|Finding|N\r\n'
+    '2|100010|2019|2019-002|Finding | with a pipe|N\r\n'
+    '3|100010|2019\r\n'
+    '4|100010|2019|2019-004|Finding|X\r\n'
+)
+
+
+def _strict_boolean(value):
+    return {'Y': True, 'N': False}[value]
+
+
+def _read_quarantine(path):
+    with gzip.open(path, 'rt', encoding='latin-1', newline='') as in_file:
+        return list(csv.reader(in_file))
+
+
+def _write_dump(source_dir, dump=FINDING_TEXT_DUMP):
+    dump_dir = source_dir / 'findingtext' / '2020-01-01T00-00-00'
+    dump_dir.mkdir(parents=True)
+    (dump_dir / 'findingstext19.txt').write_text(dump, encoding='latin-1')
+    return dump_dir
+
+
+def _quarantine(dump_dir, quarantine_dir):
+    for instances in load_dumps._yield_file_instances(
+        [str(dump_dir / 'findingstext19.txt')],
+        load_dumps.FAC_TABLES['findingtext'],
+        load_dumps.RunMetrics(),
+        quarantine_dir,
+    ):
+        list(instances)
+
+
+def test_rejected_rows_quarantined(tmp_path, monkeypatch):
+    monkeypatch.setitem(
+        load_dumps.FAC_TABLES['findingtext'],
+        'sanitizers',
+        {'CHARTSTABLES': _strict_boolean},
+    )
+    dump_dir = _write_dump(tmp_path)
+    quarantine_dir = quarantine.get_quarantine_dir(
+        str(tmp_path), 'findingtext', f'{dump_dir}/'
+    )
+    metrics = load_dumps.RunMetrics()
+
+    for instances in load_dumps._yield_file_instances(
+        [str(dump_dir / 'findingstext19.txt')],
+        load_dumps.FAC_TABLES['findingtext'],
+        metrics,
+        quarantine_dir,
+    ):
+        assert [instance.seq_number for instance in instances] == ['1']
+
+    assert _read_quarantine(
+        tmp_path / 'quarantine' / 'findingtext' / '2020-01-01T00-00-00'
+        / 'findingstext19.txt.csv.gz'
+    ) == [
+        ['reason', 'detail', 'line', 'SEQ_NUMBER', 'DBKEY', 'AUDITYEAR',
+         'FINDINGREFNUMS', 'TEXT', 'CHARTSTABLES'],
+        ['too_many_columns', '', '3',
+         '2', '100010', '2019', '2019-002', 'Finding ', ' with a pipe', 'N'],
+        ['too_few_columns', '', '4', '3', '100010', '2019'],
+        ['invalid_value', "CHARTSTABLES='X': 'X'", '5',
+         '4', '100010', '2019', '2019-004', 'Finding', 'X'],
+    ]
+    assert metrics.counts['rows_rejected'] == 3
+    assert metrics.counts['rows_rejected_invalid_value'] == 1
+
+
+def test_replay_quarantine(tmp_path, monkeypatch):
+    dump_dir = _write_dump(tmp_path)
+    quarantine_dir = quarantine.get_quarantine_dir(
+        str(tmp_path), 'findingtext', f'{dump_dir}/'
+    )
+    with monkeypatch.context() as patch:
+        patch.setitem(
+            load_dumps.FAC_TABLES['findingtext'],
+            'sanitizers',
+            {'CHARTSTABLES': _strict_boolean},
+        )
+        for instances in load_dumps._yield_file_instances(
+            [str(dump_dir / 'findingstext19.txt')],
+            load_dumps.FAC_TABLES['findingtext'],
+            load_dumps.RunMetrics(),
+            quarantine_dir,
+        ):
+            list(instances)
+
+    created = []
+    monkeypatch.setattr(
+        models.FindingText.objects,
+        'bulk_create',
+        lambda instances, batch_size: created.extend(instances),
+    )
+    monkeypatch.setattr(
+        load_dumps.transaction, 'atomic', contextlib.nullcontext
+    )
+    monkeypatch.setattr(load_dumps.transaction, 'on_commit', lambda func: func())
+
+    # With the default sanitizer, the row with an invalid value is accepted.
+    metrics = load_dumps.replay_quarantine('findingtext', str(tmp_path))
+
+    assert [instance.seq_number for instance in created] == ['4']
+    assert metrics.counts['rows_loaded'] == 1
+    assert metrics.counts['rows_rejected'] == 2
+    assert [
+        row[:3] for row in _read_quarantine(
+            f'{quarantine_dir}/findingstext19.txt.csv.gz'
+        )[1:]
+    ] == [['too_many_columns', '', '3'], ['too_few_columns', '', '4']]
+
+
+def test_failed_replay_keeps_quarantine(tmp_path, monkeypatch):
+    dump_dir = _write_dump(tmp_path)
+    quarantine_dir = quarantine.get_quarantine_dir(
+        str(tmp_path), 'findingtext', f'{dump_dir}/'
+    )
+    _quarantine(dump_dir, quarantine_dir)
+    quarantine_path = f'{quarantine_dir}/findingstext19.txt.csv.gz'
+    quarantined = _read_quarantine(quarantine_path)
+
+    def bulk_create(instances, batch_size):
+        list(instances)
+        raise RuntimeError('database error')
+
+    monkeypatch.setattr(models.FindingText.objects, 'bulk_create', bulk_create)
+    monkeypatch.setattr(
+        load_dumps.transaction, 'atomic', contextlib.nullcontext
+    )
+
+    with pytest.raises(RuntimeError):
+        load_dumps.replay_quarantine('findingtext', str(tmp_path))
+
+    # The quarantine file is left as it was, for the rows to be replayed again.
+    assert _read_quarantine(quarantine_path) == quarantined
+    assert not os.path.exists(quarantine.get_replay_path(quarantine_path))
+
+
+def test_unreadable_rows_kept(tmp_path, monkeypatch):
+    dump_dir = _write_dump(tmp_path)
+    quarantine_dir = quarantine.get_quarantine_dir(
+        str(tmp_path), 'findingtext', f'{dump_dir}/'
+    )
+    quarantine_path = f'{quarantine_dir}/findingstext19.txt.csv.gz'
+    quarantine_file = quarantine.QuarantineFile(quarantine_path)
+    # A carriage return within a line can't be read as CSV.
+    assert not list(load_dumps._yield_model_instances(
+        io.StringIO(
+            'SEQ_NUMBER|DBKEY|AUDITYEAR|FINDINGREFNUMS|TEXT|CHARTSTABLES\r\n'
+            '1|100010|2019|2019-001|Finding\rwith a return|N\r\n'
+        ),
+        quarantine_file=quarantine_file,
+        **load_dumps.FAC_TABLES['findingtext']
+    ))
+    quarantine_file.close()
+
+    reason, _detail, line, *values = _read_quarantine(quarantine_path)[1]
+    assert (reason, line) == (quarantine.UNREADABLE, '2')
+    assert values == ['1|100010|2019|2019-001|Finding\rwith a return|N']
+
+    monkeypatch.setattr(
+        models.FindingText.objects, 'bulk_create',
+        lambda instances, batch_size: list(instances),
+    )
+    monkeypatch.setattr(
+        load_dumps.transaction, 'atomic', contextlib.nullcontext
+    )
+    monkeypatch.setattr(load_dumps.transaction, 'on_commit', lambda func: func())
+
+    metrics = load_dumps.replay_quarantine('findingtext', str(tmp_path))
+
+    # Still unreadable, the row stays quarantined as it was.
+    assert metrics.counts['rows_rejected_unreadable'] == 1
+    assert _read_quarantine(quarantine_path)[1][2:] == [line, *values]
@@ -0,0 +1,187 @@
+"""
+Tests for loading tables through shadow copies.
+"""
+
+import contextlib
+import os
+from unittest import mock
+
+import pytest
+from django.db import IntegrityError, connection, transaction
+
+from ..etls import load_dumps, shadow_tables
+from .utils import RecordingCursor
+
+
+requires_db = pytest.mark.skipif(
+    'DATABASE_URL' not in os.environ,
+    reason='requires a PostgreSQL database (set DATABASE_URL)',
+)
+
+
+def test_shadow_table_swap(monkeypatch):
+    cursor = RecordingCursor({
+        'FROM pg_constraint': [('data_audit_pkey', 'p', 'PRIMARY KEY (id)')],
+        'FROM pg_indexes': [
+            ('data_audit_pkey', 'CREATE UNIQUE INDEX data_audit_pkey ...'),
+            (
+                'data_audit_dbkey_idx',
+                'CREATE INDEX data_audit_dbkey_idx ON public.data_audit '
+                'USING btree (dbkey)',
+            ),
+        ],
+        'FROM pg_attribute': [
+            ('id', 'public.data_audit_id_seq'),
+            ('dbkey', None),
+        ],
+    })
+    monkeypatch.setattr(connection, 'cursor', lambda: cursor)
+    monkeypatch.setattr(shadow_tables.transaction, 'atomic', contextlib.nullcontext)
+
+    shadow_table = shadow_tables.ShadowTable('data_audit')
+    shadow_table.create()
+    shadow_table.finish()
+    cursor.statements = []
+    shadow_table.swap()
+
+    assert cursor.statements[1:] == [
+        'ALTER SEQUENCE public.data_audit_id_seq OWNED BY data_audit_shadow.id',
+        'DROP TABLE data_audit',
+        'ALTER TABLE data_audit_shadow RENAME TO data_audit',
+        'ALTER INDEX data_audit_pkey_shadow RENAME TO data_audit_pkey',
+        'ALTER INDEX data_audit_dbkey_idx_shadow RENAME TO data_audit_dbkey_idx',
+    ]
+
+
+def test_shadow_table_keeps_check_constraints(monkeypatch):
+    cursor = RecordingCursor({
+        'FROM pg_constraint': [
+            ('data_audit_pkey', 'p', 'PRIMARY KEY (id)'),
+            ('data_audit_year_check', 'c', 'CHECK ((audit_year > 0))'),
+        ],
+    })
+    monkeypatch.setattr(connection, 'cursor', lambda: cursor)
+    monkeypatch.setattr(shadow_tables.transaction, 'atomic', contextlib.nullcontext)
+
+    shadow_table = shadow_tables.ShadowTable('data_audit')
+    shadow_table.create()
+    shadow_table.finish()
+    shadow_table.swap()
+
+    # Check constraint names are per table, so the clone keeps its name.
+    assert (
+        'ALTER TABLE data_audit_shadow ADD CONSTRAINT data_audit_year_check '
+        'CHECK ((audit_year > 0))'
+    ) in cursor.statements
+    assert shadow_table.index_names == ['data_audit_pkey']
+
+
+@requires_db
+@pytest.mark.django_db
+def test_swapped_table_keeps_check_constraints():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TABLE shadow_check (id serial PRIMARY KEY, '
+            'amount integer CONSTRAINT shadow_check_amount CHECK (amount >= 0))'
+        )
+
+    shadow_table = shadow_tables.ShadowTable('shadow_check')
+    shadow_table.create()
+    shadow_table.finish()
+    shadow_table.swap()
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('INSERT INTO shadow_check (amount) VALUES (-1)')
+
+
+def test_shadow_table_indexed_after_load(monkeypatch):
+    cursor = RecordingCursor({
+        'FROM pg_constraint': [('data_audit_pkey', 'p', 'PRIMARY KEY (id)')],
+    })
+    monkeypatch.setattr(connection, 'cursor', lambda: cursor)
+
+    shadow_table = shadow_tables.ShadowTable('data_audit')
+    shadow_table.create()
+    shadow_table.finish()
+
+    assert cursor.statements[1] == (
+        'CREATE UNLOGGED TABLE data_audit_shadow (LIKE data_audit INCLUDING DEFAULTS)'
+    )
+    assert (
+        'ALTER TABLE data_audit_shadow ADD CONSTRAINT data_audit_pkey_shadow PRIMARY KEY (id)'
+    ) in cursor.statements
+    assert cursor.statements[2] == 'SET maintenance_work_mem = %s'
+    assert cursor.statements[-3:] == [
+        'ALTER TABLE data_audit_shadow SET LOGGED',
+        'ANALYZE data_audit_shadow',
+        'RESET maintenance_work_mem',
+    ]
+
+
+def _fake_shadow_table(calls):
+    class FakeShadowTable:
+        def __init__(self, table):
+            self.shadow = f'{table}_shadow'
+
+        def create(self):
+            calls.append('create')
+
+        def finish(self):
+            calls.append('finish')
+
+        def swap(self):
+            calls.append('swap')
+
+    return FakeShadowTable
+
+
+def test_update_table_logs_phase_timings(monkeypatch, tmp_path):
+    calls = []
+    logged = {}
+    dump_dir = tmp_path / 'assistancelisting' / '2020-01-01T00-00-00'
+    dump_dir.mkdir(parents=True)
+    (dump_dir / 'listings.csv').write_text('Program Number\n')
+    monkeypatch.setattr(load_dumps.shadow_tables, 'ShadowTable', _fake_shadow_table(calls))
+    monkeypatch.setattr(load_dumps, '_copy_in_batches', lambda *args: None)
+    monkeypatch.setitem(
+        load_dumps.FAC_TABLES, 'assistancelisting',
+        {**load_dumps.FAC_TABLES['assistancelisting'], 'after_load': ()}
+    )
+    monkeypatch.setattr(
+        load_dumps.models.ETLLog.objects, 'log_load_table',
+        lambda table_name, metrics: logged.update(metrics['phases'])
+    )
+
+    load_dumps.update_table('assistancelisting', str(tmp_path), log_to_db=True)
+
+    assert calls == ['create', 'finish', 'swap']
+    assert set(logged) == {'read', 'load', 'index', 'swap', 'after_load', 'total'}
+
+
+def test_update_table_skips_chunks_without_accepted_rows(monkeypatch, tmp_path):
+    calls = []
+    copied = []
+    dump_dir = tmp_path / 'findingtext' / '2020-01-01T00-00-00'
+    dump_dir.mkdir(parents=True)
+    (dump_dir / 'findingtext.txt').write_text(
+        'SEQ_NUMBER|DBKEY|AUDITYEAR|FINDINGREFNUMS|TEXT|CHARTSTABLES\n'
+        '1|100010|2019|2019-001\n'
+        '2|100010|2019|2019-002\n'
+    )
+    monkeypatch.setattr(load_dumps.shadow_tables, 'ShadowTable', _fake_shadow_table(calls))
+    monkeypatch.setattr(load_dumps, 'connection', mock.MagicMock())
+    monkeypatch.setattr(
+        load_dumps.partitions, 'copy_rows',
+        lambda cursor, table_name, model, rows: copied.append(rows)
+    )
+    monkeypatch.setitem(
+        load_dumps.FAC_TABLES, 'findingtext',
+        {**load_dumps.FAC_TABLES['findingtext'], 'partitioned': False}
+    )
+
+    metrics = load_dumps.update_table('findingtext', str(tmp_path), workers=1)
+
+    assert metrics.counts['rows_rejected'] == 2
+    assert copied == []
+    assert calls == ['create', 'finish', 'swap']
@@ -0,0 +1,36 @@
+"""
+Test helpers for ETLs that issue SQL directly.
+"""
+
+
+class RecordingCursor:
+    """
+    A database cursor that records statements rather than executing them.
+    `results` maps a substring of a query to the rows it returns.
+    """
+
+    def __init__(self, results=None):
+        self.results = results or {}
+        self.statements = []
+        self.copied = []
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        self._rows = next(
+            (rows for match, rows in self.results.items() if match in sql),
+            []
+        )
+
+    def fetchall(self):
+        return self._rows
+
+    def copy_expert(self, sql, file):
+        self.statements.append(sql)
+        self.copied.append(file.read())
@@ -0,0 +1,80 @@
+"""
+Stream crawled documents to the document store as they are downloaded.
+"""
+
+import hashlib
+import os
+
+from distiller.gateways import files
+
+
+class AttachmentSink:
+    """
+    Writes a document to `path` chunk-by-chunk as it is downloaded, hashing
+    the content on the way through.
+
+    On S3, the document is uploaded as a multipart upload in parts of
+    `part_size` bytes, so only one part is buffered for upload at a time,
+    rather than a copy of the entire document. (Scrapy itself still buffers
+    the response body; see `DOWNLOAD_MAXSIZE` in the crawl settings.)
+
+    Retries and redirects of a download share its sink, so each `attempt`
+    (the request being downloaded) starts the document over.
+    """
+
+    def __init__(self, path: str, part_size: int):
+        self.path = path
+        self.part_size = part_size
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.attempt = None
+        self._file = None
+
+    def write(self, data: bytes, attempt=None):
+        if attempt is not self.attempt:
+            # Discard whatever an earlier attempt (eg, an error page or a cut
+            # off body) wrote.
+            self.abort()
+            self.hash = hashlib.sha256()
+            self.size = 0
+            self.attempt = attempt
+
+        # Open lazily, so we don't start an upload for a request that never
+        # receives a body.
+        if self._file is None:
+            self._file = files.output_file(
+                str(self.path), 'wb', part_size=self.part_size
+            )
+        self._file.write(data)
+        self.hash.update(data)
+        self.size += len(data)
+
+    def close(self):
+        """
+        Complete the write of the document.
+        """
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def abort(self):
+        """
+        Discard a partially-written document.
+        """
+
+        if self._file is None:
+            return
+
+        # S3 writers can cancel their multipart upload; local files are
+        # closed and removed.
+        if hasattr(self._file, 'terminate'):
+            self._file.terminate()
+        else:
+            self._file.close()
+            os.remove(self.path)
+        self._file = None
+
+    @property
+    def content_hash(self) -> str:
+        return self.hash.hexdigest()
@@ -3,14 +3,21 @@ Load/update references to FAC PDF and Excel files.
 """
 
 import csv
+import io
+import itertools
 import os
+import re
+import sys
 from datetime import datetime
+from typing import Optional
 
-from django.db import transaction
+from django.db import connection, transaction
 
+from distiller.data.etls.metrics import RunMetrics
 from distiller.data.models import ETLLog
 from ...gateways import files
 from .. import models
+from . import inventory
 
 
 def _parse_date(date_str: str):
@@ -33,45 +40,139 @@ def _yield_documents_from_csv(reader):
         )
 
 
+# Columns loaded for each document; together with the primary key, these are
+# all of `FacDocument`'s columns.
+DOCUMENT_COLUMNS = ('version', 'audit_year', 'dbkey', 'file_type', 'file_name')
+
+
+def _upsert_documents(
+    documents,
+    *,
+    batch_size: int,
+    delete_missing: bool,
+    metrics: Optional[RunMetrics] = None,
+):
+    """
+    Insert `documents` that aren't loaded yet, leaving existing rows alone.
+
+    Documents are COPY'd into a temporary staging table, then inserted with
+    `ON CONFLICT DO NOTHING` against the table's unique document key. Unlike
+    clearing the table and reloading it, this only locks new rows, so the
+    search page can read the table throughout.
+
+    If `delete_missing` is set, also delete rows for documents that are not in
+    `documents`.
+    """
+
+    metrics = metrics or RunMetrics()
+    table = models.FacDocument._meta.db_table  # pylint: disable=W0212
+    columns = ', '.join(DOCUMENT_COLUMNS)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TEMPORARY TABLE fac_document_staging
+            ON COMMIT DROP
+            AS SELECT {columns} FROM {table} WITH NO DATA
+        """)
+
+        batch = iter(documents)
+        while True:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            rows = [
+                [getattr(document, column) for column in DOCUMENT_COLUMNS]
+                for document in itertools.islice(batch, batch_size)
+            ]
+            if not rows:
+                break
+            metrics.count('rows_read', len(rows))
+            writer.writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(
+                f'COPY fac_document_staging ({columns}) FROM STDIN WITH CSV',
+                buffer
+            )
+
+        cursor.execute(f"""
+            INSERT INTO {table} ({columns})
+            SELECT {columns} FROM fac_document_staging
+            ON CONFLICT (audit_year, dbkey, file_type, version) DO NOTHING
+        """)
+        sys.stdout.write(f'Inserted {cursor.rowcount} new documents\n')
+        metrics.count('rows_loaded', cursor.rowcount)
+
+        if delete_missing:
+            cursor.execute(f"""
+                DELETE FROM {table} AS document
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM fac_document_staging AS staged
+                    WHERE staged.audit_year = document.audit_year
+                      AND staged.dbkey = document.dbkey
+                      AND staged.file_type = document.file_type
+                      AND staged.version = document.version
+                )
+            """)
+            sys.stdout.write(f'Deleted {cursor.rowcount} missing documents\n')
+            metrics.count('rows_deleted', cursor.rowcount)
+
+        cursor.execute('DROP TABLE fac_document_staging')
+
+
 @transaction.atomic
 def load_fac_csvs(
     # Load all files from this path prefix
     source_dir: str,
-    # Clear the target table before loading
+    # Remove documents that are not in the loaded CSVs
     reload: bool = False,
-    # Number of rows to INSERT per batch
-    batch_size: int = 1_000,
+    # Number of rows to COPY per batch
+    batch_size: int = 10_000,
     log_to_db: bool = False,
 ):
     """
     Load all CSVs in `source_dir` to FacDocument.
     """
 
-    if reload:
-        models.FacDocument.objects.all().delete()
-
-    csv_paths = files.glob(os.path.join(source_dir, '*'))
-    for csv_path in csv_paths:
-        with files.input_file(csv_path) as csv_file:
-            models.FacDocument.objects.bulk_create(
-                _yield_documents_from_csv(csv.DictReader(csv_file)),
-                batch_size=batch_size
-            )
+    def _yield_all_documents():
+        csv_paths = files.glob(os.path.join(source_dir, '*'))
+        for csv_path in csv_paths:
+            with files.input_file(csv_path) as csv_file:
+                yield from _yield_documents_from_csv(csv.DictReader(csv_file))
+
+    metrics = RunMetrics()
+    with metrics.phase('load'):
+        _upsert_documents(
+            _yield_all_documents(),
+            batch_size=batch_size,
+            delete_missing=reload,
+            metrics=metrics,
+        )
+    with metrics.phase('refresh'):
+        models.CurrentDocument.objects.refresh()
 
     if log_to_db:
-        ETLLog.objects.log_fac_document_crawl(source_dir)
+        ETLLog.objects.log_fac_document_crawl(
+            source_dir, metrics=metrics.as_dict()
+        )
+
+
+# Document file names: DBKEY, audit year and version, e.g. 10165120181.pdf
+DOCUMENT_FILE_NAME = re.compile(
+    r'^(?P<dbkey>\w+)(?P<audit_year>\d{4})(?P<version>\d)\.(?P<extension>\w+)$'
+)
 
 
 def _yield_documents_from_filenames(file_paths):
     for file_path in file_paths:
         file_name = os.path.basename(file_path)
-        # Format: 10165120181.pdf
-        base, extension = file_name.split('.')
-        file_type = 'form' if extension == 'xlsx' else 'audit'
+        match = DOCUMENT_FILE_NAME.match(file_name)
+        if not match:
+            sys.stdout.write(f'Skipping {file_path}: not a FAC document name\n')
+            continue
+        file_type = 'form' if match['extension'] == 'xlsx' else 'audit'
         yield models.FacDocument(
-            version=base[-1],
-            audit_year=base[-5:-1],
-            dbkey=base[:-5],
+            version=match['version'],
+            audit_year=match['audit_year'],
+            dbkey=match['dbkey'],
             file_type=file_type,
             file_name=file_name,
         )
@@ -81,26 +182,64 @@ def _yield_documents_from_filenames(file_paths):
 def load_fac_bucket(
     # Load all files from this path prefix
     source_dir: str,
-    # Clear the target table before loading
+    # Sync the table with the entire document store, rather than loading
+    # changes since the last inventory
     reload: bool = True,
-    # Number of rows to INSERT per batch
-    batch_size: int = 1_000,
+    # Number of rows to COPY per batch
+    batch_size: int = 10_000,
     log_to_db: bool = False,
+    # Path of the saved document store listing, used to find new documents.
+    inventory_path: Optional[str] = None,
 ):
     """
     Load all documents that are in the document store (S3 in production)
+
+    Unless reloading, only documents added since the previous inventory are
+    inserted, and documents that have been removed are deleted.
     """
 
-    if reload:
-        models.FacDocument.objects.all().delete()
+    metrics = RunMetrics()
+    with metrics.phase('inventory'):
+        current = inventory.take_inventory(source_dir)
+        previous = None
+        if inventory_path and not reload:
+            previous = inventory.load_inventory(inventory_path)
+
+        diff = inventory.diff_inventories(previous, current)
+    sys.stdout.write(
+        f'{len(current)} documents: {len(diff.added)} added, '
+        f'{len(diff.removed)} removed since the last inventory\n'
+    )
 
-    files.glob(f'{source_dir}/**')
+    with metrics.phase('load'):
+        if reload:
+            _upsert_documents(
+                _yield_documents_from_filenames(current.keys()),
+                batch_size=batch_size,
+                delete_missing=True,
+                metrics=metrics,
+            )
+        else:
+            deleted, _counts = models.FacDocument.objects.filter(file_name__in=[
+                os.path.basename(obj.path) for obj in diff.removed
+            ]).delete()
+            metrics.count('rows_deleted', deleted)
+            _upsert_documents(
+                _yield_documents_from_filenames(obj.path for obj in diff.added),
+                batch_size=batch_size,
+                delete_missing=False,
+                metrics=metrics,
+            )
+    with metrics.phase('refresh'):
+        models.CurrentDocument.objects.refresh()
 
-    crawled_files = files.glob(os.path.join(source_dir, '*'))
-    models.FacDocument.objects.bulk_create(
-        _yield_documents_from_filenames(crawled_files),
-        batch_size=batch_size
-    )
+    # Only replace the saved inventory once the table is in sync with it.
+    if inventory_path:
+        transaction.on_commit(
+            lambda: inventory.save_inventory(inventory_path, current)
+        )
 
     if log_to_db:
-        ETLLog.objects.log_fac_document_crawl(source_dir)
+        ETLLog.objects.log_fac_document_crawl(
+            source_dir, metrics=metrics.as_dict()
+        )
@@ -0,0 +1,78 @@
+"""
+Inventory of the FAC document store.
+
+Listing the document store is expensive - it holds hundreds of thousands of
+documents - so each listing is saved, and compared to the previous one to
+find the documents added or removed since the last load.
+"""
+
+import csv
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from ...gateways import files
+
+
+INVENTORY_COLUMNS = ('path', 'size', 'etag', 'last_modified')
+
+
+class InventoryDiff(NamedTuple):
+    added: List[files.ObjectInfo]
+    removed: List[files.ObjectInfo]
+
+
+def take_inventory(source_dir: str) -> Dict[str, files.ObjectInfo]:
+    """
+    List the documents in `source_dir`, keyed by path.
+    """
+
+    return {obj.path: obj for obj in files.list_objects(source_dir)}
+
+
+def load_inventory(path: str) -> Optional[Dict[str, files.ObjectInfo]]:
+    """
+    Load a previously-saved inventory, or `None` if there isn't one.
+    """
+
+    if not files.exists(path):
+        return None
+
+    with files.input_file(path) as inventory_file:
+        return {
+            row['path']: files.ObjectInfo(
+                path=row['path'],
+                size=int(row['size']),
+                etag=row['etag'] or None,
+                last_modified=datetime.fromisoformat(row['last_modified']),
+            )
+            for row in csv.DictReader(inventory_file)
+        }
+
+
+def save_inventory(path: str, inventory: Dict[str, files.ObjectInfo]):
+    with files.output_file(path) as inventory_file:
+        writer = csv.writer(inventory_file)
+        writer.writerow(INVENTORY_COLUMNS)
+        for obj in inventory.values():
+            writer.writerow((
+                obj.path,
+                obj.size,
+                obj.etag or '',
+                obj.last_modified.isoformat(),
+            ))
+
+
+def diff_inventories(
+    previous: Optional[Dict[str, files.ObjectInfo]],
+    current: Dict[str, files.ObjectInfo],
+) -> InventoryDiff:
+    """
+    Compare two inventories. If there is no previous inventory, every
+    document is new.
+    """
+
+    previous = previous or {}
+    return InventoryDiff(
+        added=[obj for path, obj in current.items() if path not in previous],
+        removed=[obj for path, obj in previous.items() if path not in current],
+    )
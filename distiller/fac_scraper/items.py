@@ -52,3 +52,8 @@ class FacSearchResultDocument(scrapy.Item):
     # `False` if this scrape job downloaded the file; `True` if the file was
     # previously downloaded.
     repeat_crawl = scrapy.Field()
+
+    # SHA-256 hex digest and size in bytes of the document, if this scrape job
+    # downloaded the file.
+    content_hash = scrapy.Field()
+    file_size = scrapy.Field()
@@ -9,6 +9,7 @@ import sys
 from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from distiller.gateways import files
 from ...etls import fac_documents
 
 
@@ -19,7 +20,7 @@ class Command(BaseCommand):
         parser.add_argument(
             '--reload',
             action='store_true',
-            help='Clear table before loading',
+            help='Clear table before loading, rather than loading new documents only',
         )
         parser.add_argument(
             '--log',
@@ -34,4 +35,7 @@ class Command(BaseCommand):
             source_dir=settings.FAC_DOCUMENT_DIR,
             reload=options['reload'],
             log_to_db=options['log'],
+            inventory_path=settings.FAC_DOCUMENT_INVENTORY,
         )
+
+        files.write_s3_call_counts(sys.stdout)
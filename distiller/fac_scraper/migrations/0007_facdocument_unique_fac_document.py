@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fac_scraper', '0006_facdocument_file_name'),
+    ]
+
+    operations = [
+        # Crawl CSVs include a document once per CFDA it was found under, so
+        # remove duplicates before adding the constraint.
+        migrations.RunSQL(
+            sql='''
+                DELETE FROM fac_scraper_facdocument AS document
+                USING fac_scraper_facdocument AS duplicate
+                WHERE document.audit_year = duplicate.audit_year
+                  AND document.dbkey = duplicate.dbkey
+                  AND document.file_type = duplicate.file_type
+                  AND document.version = duplicate.version
+                  AND document.id > duplicate.id
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='facdocument',
+            constraint=models.UniqueConstraint(fields=('audit_year', 'dbkey', 'file_type', 'version'), name='unique_fac_document'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fac_scraper', '0007_facdocument_unique_fac_document'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                '''
+                CREATE MATERIALIZED VIEW fac_scraper_currentdocument AS
+                SELECT DISTINCT ON (audit_year, dbkey, file_type)
+                    id, version, audit_year, dbkey, file_type, file_name
+                FROM fac_scraper_facdocument
+                ORDER BY audit_year, dbkey, file_type, version DESC
+                ''',
+                # A unique index is required for concurrent refreshes; it also
+                # serves lookups from the search page.
+                '''
+                CREATE UNIQUE INDEX fac_scraper_currentdocument_audit_file_type
+                ON fac_scraper_currentdocument (audit_year, dbkey, file_type)
+                ''',
+            ],
+            reverse_sql='DROP MATERIALIZED VIEW fac_scraper_currentdocument',
+        ),
+        migrations.CreateModel(
+            name='CurrentDocument',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('version', models.IntegerField()),
+                ('audit_year', models.DecimalField(decimal_places=0, max_digits=4)),
+                ('dbkey', models.CharField(max_length=6)),
+                ('file_type', models.CharField(max_length=8)),
+                ('file_name', models.CharField(max_length=32)),
+            ],
+            options={
+                'db_table': 'fac_scraper_currentdocument',
+                'managed': False,
+            },
+        ),
+    ]
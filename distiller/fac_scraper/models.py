@@ -6,7 +6,7 @@ import os
 
 from compositefk.fields import CompositeForeignKey
 from django.conf import settings
-from django.db import models
+from django.db import connection, models
 
 from distiller.data.models import Audit
 
@@ -17,6 +17,14 @@ class FacDocument(models.Model):
         indexes = [
            models.Index(fields=('dbkey', 'audit_year')),
         ]
+        constraints = [
+            # Each version of an audit's form/audit document is loaded once;
+            # document loads rely on this to skip loaded documents.
+            models.UniqueConstraint(
+                fields=('audit_year', 'dbkey', 'file_type', 'version'),
+                name='unique_fac_document',
+            ),
+        ]
 
     version = models.IntegerField()
     audit_year = models.DecimalField(
@@ -67,3 +75,42 @@ class FacDocument(models.Model):
 
     def get_absolute_url(self):
         return os.path.join(settings.FAC_DOWNLOAD_ROOT, self.file_name)
+
+
+class CurrentDocumentManager(models.Manager):
+    def refresh(self):
+        """
+        Refresh the current documents view. Call this after loading
+        documents. Concurrent refreshes don't block readers of the view.
+        """
+
+        table_name = self.model._meta.db_table  # pylint: disable=W0212
+        with connection.cursor() as cursor:
+            cursor.execute(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {table_name}')
+
+
+class CurrentDocument(models.Model):
+    """
+    The most recent version of each audit's form and audit documents.
+
+    This is a materialized view over `FacDocument`, so the search page can
+    join in the documents to link to rather than fetching every version of
+    each audit's documents.
+    """
+
+    objects = CurrentDocumentManager()
+
+    class Meta:
+        managed = False
+        db_table = 'fac_scraper_currentdocument'
+
+    # Primary key of the `FacDocument` this row refers to
+    id = models.IntegerField(primary_key=True)
+    version = models.IntegerField()
+    audit_year = models.DecimalField(max_digits=4, decimal_places=0)
+    dbkey = models.CharField(max_length=6)
+    file_type = models.CharField(max_length=8)
+    file_name = models.CharField(max_length=32)
+
+    def __str__(self):
+        return self.file_name
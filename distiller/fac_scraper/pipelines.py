@@ -5,7 +5,121 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from scrapy.exceptions import NotConfigured
+from twisted.internet import reactor, threads
+
+from distiller.instrumentation.metrics import record_pdf_extraction
+
 
 class FacPipeline(object):
     def process_item(self, item, spider):
         return item
+
+
+# Per-process NLP processor, initialized once per extraction worker.
+_processor = None
+
+
+def _init_extract_worker():
+    global _processor
+
+    import django
+    django.setup()
+
+    from distiller.data.etls import extract_pdf
+    _processor = extract_pdf.setup()
+
+
+def _extract_audit_file(audit_year, dbkey, file_name):
+    from distiller.data.etls import extract_pdf
+    from distiller.data.etls.metrics import RunMetrics
+
+    metrics = RunMetrics()
+    extracts = extract_pdf.process_audit_file(
+        _processor,
+        audit_year=audit_year,
+        dbkey=dbkey,
+        file_name=file_name,
+        metrics=metrics,
+    )
+    return extracts, metrics
+
+
+class PdfExtractPipeline(object):
+    """
+    Extract findings and corrective action plans from audit PDFs as they are
+    crawled, rather than in a separate `extract_pdfs --all` pass.
+
+    PDF parsing and NLP are CPU-bound, so extraction is handed off to a pool
+    of worker processes, each of which saves `PDFExtract` rows as it finishes
+    a document. The crawl itself is never blocked on extraction; the spider
+    only waits for outstanding extractions when it closes.
+    """
+
+    def __init__(self, workers, stats):
+        self.workers = workers
+        self.stats = stats
+        self.executor = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('EXTRACT_PDFS'):
+            raise NotConfigured('EXTRACT_PDFS is disabled')
+        return cls(
+            workers=crawler.settings.getint('EXTRACT_PDF_WORKERS'),
+            stats=crawler.stats,
+        )
+
+    def open_spider(self, spider):
+        # Spawn, rather than fork, so workers don't inherit the Twisted
+        # reactor or any open database connections.
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_extract_worker,
+        )
+
+    def close_spider(self, spider):
+        # Wait for in-flight extractions off of the reactor thread.
+        return threads.deferToThread(self.executor.shutdown, wait=True)
+
+    def process_item(self, item, spider):
+        # Only newly-downloaded audit PDFs need extraction; forms are Excel
+        # documents, and repeat crawls were extracted when first downloaded.
+        if item.get('file_type') != 'audit' or item.get('repeat_crawl'):
+            return item
+
+        future = self.executor.submit(
+            _extract_audit_file,
+            item['AUDITYEAR'],
+            item['DBKEY'],
+            item['file_name'],
+        )
+        # Done callbacks run on an executor thread; hand them to the reactor.
+        future.add_done_callback(
+            lambda f, name=item['file_name']: reactor.callFromThread(
+                self._extract_done, f, name, spider
+            )
+        )
+        self.stats.inc_value('pdf_extract/queued', spider=spider)
+        return item
+
+    def _extract_done(self, future, file_name, spider):
+        error = future.exception()
+        if error:
+            self.stats.inc_value('pdf_extract/failed', spider=spider)
+            spider.logger.error(f'PDF extraction failed for {file_name}: {error}')
+            return
+
+        extracts, metrics = future.result()
+        self.stats.inc_value('pdf_extract/extracted', spider=spider)
+        self.stats.inc_value(
+            'pdf_extract/extracts_saved', extracts, spider=spider
+        )
+        self.stats.inc_value(
+            'pdf_extract/pages', metrics.counts.get('pages', 0), spider=spider
+        )
+        record_pdf_extraction(metrics)
@@ -20,17 +20,32 @@ ROBOTSTXT_OBEY = True
 DUPEFILTER_DEBUG = True
 
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
-# Set to one to force synchronous download behavior, which is required to play
-# nice with FAC's view state session data (the PDF download page determines
-# what file to return based on session data).
-CONCURRENT_REQUESTS = 1
+# The FAC's view state session data requires that requests within a search
+# session are made one at a time (the PDF download page determines what file
+# to return based on session data). `FACSpider` ensures this by keeping each
+# search session in its own cookie jar with at most one request in flight, so
+# this setting bounds the number of sessions crawled in parallel.
+CONCURRENT_REQUESTS = 4
+
+# Documents are streamed to `FAC_DOCUMENT_DIR` as they are downloaded. On S3,
+# they are uploaded in parts of this size (S3's minimum is 5MB), which bounds
+# the upload buffer held per download.
+ATTACHMENT_PART_SIZE = 8 * 1024 * 1024
+
+# Scrapy still buffers each response's whole body, so streaming only bounds
+# the upload buffer; the crawler's memory is bounded by these limits (times
+# `CONCURRENT_REQUESTS`). Larger documents are logged and cancelled, and
+# their search session carries on.
+DOWNLOAD_WARNSIZE = 64 * 1024 * 1024
+DOWNLOAD_MAXSIZE = 256 * 1024 * 1024
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
 #DOWNLOAD_DELAY = 3
 # The download delay setting will honor only one of:
-#CONCURRENT_REQUESTS_PER_DOMAIN = 16
+# All requests go to the FAC server, so this is the overall politeness budget.
+CONCURRENT_REQUESTS_PER_DOMAIN = 4
 #CONCURRENT_REQUESTS_PER_IP = 16
 
 # Disable cookies (enabled by default)
@@ -65,20 +80,28 @@ CONCURRENT_REQUESTS = 1
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    'distiller.fac_scraper.pipelines.FacPipeline': 300,
-#}
+ITEM_PIPELINES = {
+    'distiller.fac_scraper.pipelines.PdfExtractPipeline': 500,
+}
+
+# Extract findings and CAPs from newly-downloaded audit PDFs as they are
+# crawled. Disable with `-s EXTRACT_PDFS=0`.
+EXTRACT_PDFS = True
+# Number of worker processes for PDF extraction. Each worker loads its own
+# spacy model, so keep this small on memory-constrained instances.
+EXTRACT_PDF_WORKERS = 2
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-#AUTOTHROTTLE_ENABLED = True
+# Back off if the FAC server slows down under parallel sessions.
+AUTOTHROTTLE_ENABLED = True
 # The initial download delay
-#AUTOTHROTTLE_START_DELAY = 5
+AUTOTHROTTLE_START_DELAY = 1
 # The maximum download delay to be set in case of high latencies
-#AUTOTHROTTLE_MAX_DELAY = 60
+AUTOTHROTTLE_MAX_DELAY = 30
 # The average number of requests Scrapy should be sending in parallel to
 # each remote server
-#AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
+AUTOTHROTTLE_TARGET_CONCURRENCY = 2.0
 # Enable showing throttling stats for every response received:
 #AUTOTHROTTLE_DEBUG = False
 
@@ -1,28 +1,101 @@
+import itertools
 import json
 import os
 import re
+import time
 from datetime import datetime
 
 from django.conf import settings
-from scrapy import FormRequest, Spider
-from scrapy.exceptions import CloseSpider
+from scrapy import FormRequest, Request, Spider, signals
 from scrapy.utils.response import open_in_browser
 
 from distiller.gateways import files
+from distiller.instrumentation import metrics, registry
+from ..attachments import AttachmentSink
 from ..items import FacSearchResultDocument
 
 
+def _parse_cfda_options(cfda):
+    parts = cfda.split('.')
+    if len(parts) < 2:
+        raise ValueError('CFDA numbers are of the form XX.XXX')
+
+    prefix = parts[0]
+    if len(prefix) < 2:
+        raise ValueError(f'CFDA "{cfda}" prefix "{prefix}" should be two digits')
+
+    ext = parts[1] if len(parts) > 1 else None
+    if ext and len(ext) > 3:
+        raise ValueError('CFDA "{cfda}" suffix "{ext}" should be no more than three digits')
+
+    wild = not (ext and len(ext) == 3)
+
+    return [{
+        # Treat all queries as wildcards, with
+        "Prefix": prefix,
+        "Ext": ext,
+        "Wild": wild
+
+        # For reference, these attributes are also present on some
+        # requests. (They may only be for the front-end's usage)
+        # 'IsFullCFDAQuery': False,
+        # "IsPrefixOnlyQuery": Flas,
+        # 'IsExtensionOnlyQuery': False,
+    }]
+
+
+def _parse_audit_years(audit_year):
+    """
+    Parse an audit year argument, which may be a single year, a
+    comma-separated list of years, or an inclusive range (`2013-2020`).
+    """
+
+    if not audit_year:
+        return ["All Years"]
+
+    years = []
+    for part in audit_year.split(','):
+        if '-' in part:
+            start, end = part.split('-')
+            years.extend(str(year) for year in range(int(start), int(end) + 1))
+        else:
+            years.append(part.strip())
+    return years
+
+
+def _attachment_file_name(response):
+    """
+    Get the file name of a document download from its headers.
+    """
+
+    disposition = response.headers.get('Content-Disposition')
+    match = disposition and re.match(
+        r'attachment;filename="(?P<file_name>.*)"', disposition.decode()
+    )
+    if not match:
+        raise ValueError(f'Not a document download; Content-Disposition: {disposition}')
+    return match.group('file_name')
+
+
 class FACSpider(Spider):
+    """
+    Crawl FAC search results, downloading any documents we don't have yet.
+
+    The FAC search is an ASP.NET application; each search session is a chain
+    of VIEWSTATE postbacks, and the server picks which document to return
+    based on session state. So within a session, requests must be made one at
+    a time.
+
+    To crawl quickly anyway, the crawl is split into slices (one per CFDA
+    prefix and audit year) and each slice runs its own search session, with
+    its own cookie jar, in parallel with the others. Overall load on the FAC
+    server is bounded by the concurrency settings in `settings.py`. An error
+    in one session stops only that session.
+    """
+
     name = 'fac'
     start_urls = ['https://facdissem.census.gov/SearchA133.aspx']
 
-    # Set `download_delay` to specify a period, in seconds, to wait between
-    # HTTP request.
-    # Leave to the default, zero, since ATM we are not able to do concurrent
-    # crawls. It seems unlikely that one un-staggered crawl will be a burden on
-    # the FAC server.
-    #download_delay = 1.5
-
     def __init__(
         self,
         *args,
@@ -44,51 +117,86 @@ class FACSpider(Spider):
         if not cfda and not (self.date_processed_from and self.date_processed_to):
             raise ValueError('A CFDA number/prefix or filing date range is required')
 
-        #self.audit_year = audit_year or datetime.now().year
-        self.audit_year = audit_year or "All Years"
+        # Both `cfda` and `audit_year` may specify multiple values; crawl
+        # every combination of them as a separate search session.
+        cfda_options = [
+            _parse_cfda_options(cfda_num.strip())
+            for cfda_num in cfda.split(',')
+        ] if cfda else [None]
+        self.slices = [
+            {'cfda_options': options, 'audit_year': year}
+            for options, year in itertools.product(
+                cfda_options, _parse_audit_years(audit_year)
+            )
+        ]
 
-        self.cfda_options = None
-        if cfda:
-            parts = cfda.split('.')
-            if len(parts) < 2:
-                raise ValueError('CFDA numbers are of the form XX.XXX')
+        # File names of documents already in `FAC_DOCUMENT_DIR`, loaded once
+        # when the crawl starts and updated as documents are saved.
+        self.saved_file_names = None
 
-            prefix = parts[0]
-            if len(prefix) < 2:
-                raise ValueError(f'CFDA "{cfda}" prefix "{prefix}" should be two digits')
+        self.started = time.monotonic()
 
-            ext = parts[1] if len(parts) > 1 else None
-            if ext and len(ext) > 3:
-                raise ValueError('CFDA "{cfda}" suffix "{ext}" should be no more than three digits')
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(
+            spider.stream_attachment, signal=signals.bytes_received
+        )
+        return spider
 
-            wild = not (ext and len(ext) == 3)
+    def closed(self, reason):
+        for operation, count in files.get_s3_call_counts().items():
+            self.crawler.stats.set_value(f's3_calls/{operation}', count)
 
-            self.cfda_options = [{
-                # Treat all queries as wildcards, with
-                "Prefix": prefix,
-                "Ext": ext,
-                "Wild": wild
+        items = self.crawler.stats.get_value('item_scraped_count', 0)
+        duration = time.monotonic() - self.started
+        metrics.CRAWL_ITEMS.inc(items, spider=self.name)
+        metrics.CRAWL_DURATION.inc(duration, spider=self.name)
+        if duration:
+            metrics.CRAWL_LAST_ITEMS_PER_SECOND.set(items / duration, spider=self.name)
+        registry.save_job_metrics('fac_crawl')
 
-                # For reference, these attributes are also present on some
-                # requests. (They may only be for the front-end's usage)
-                # 'IsFullCFDAQuery': False,
-                # "IsPrefixOnlyQuery": Flas,
-                # 'IsExtensionOnlyQuery': False,
-            }]
+    def load_saved_file_names(self):
+        """
+        List the document store once, rather than checking for each search
+        result's file individually (a HEAD request per file, on S3).
+        """
+
+        return {
+            os.path.basename(path)
+            for path in files.glob(os.path.join(settings.FAC_DOCUMENT_DIR, '*'))
+        }
+
+    def start_requests(self):
+        self.saved_file_names = self.load_saved_file_names()
+        self.logger.info(
+            f'{len(self.saved_file_names)} documents previously downloaded'
+        )
+
+        for session_id, search_slice in enumerate(self.slices):
+            for url in self.start_urls:
+                yield Request(
+                    url,
+                    dont_filter=True,
+                    meta={'cookiejar': session_id, 'slice': search_slice},
+                )
 
     def parse(self, response):
         ERROR_TEXT = 'The requested URL was rejected. Please consult with your administrator.'
         if ERROR_TEXT in response.text:
-            raise CloseSpider('Server error: ' + response.text)
+            self._end_session(response, 'Server error: ' + response.text)
+            return None
 
+        search_slice = response.meta['slice']
+        audit_year = search_slice['audit_year']
         year_input_name = response.css(
-            f'#MainContent_UcSearchFilters_FYear_CheckableItems input[value="{self.audit_year}"]'
+            f'#MainContent_UcSearchFilters_FYear_CheckableItems input[value="{audit_year}"]'
         ).xpath('@name').extract()[0]
 
         filter_options = {}
-        if self.cfda_options:
+        if search_slice['cfda_options']:
             filter_options["ctl00$MainContent$UcSearchFilters$CDFASelectionControl$txtCfdaData"] = json.dumps(
-                self.cfda_options
+                search_slice['cfda_options']
             )
 
         if self.date_processed_from and self.date_processed_to:
@@ -105,7 +213,7 @@ class FACSpider(Spider):
 
                 # Audit year(s):
                 #"ctl00$MainContent$UcSearchFilters$FYear$CheckableItems$2": "2020",
-                year_input_name: str(self.audit_year),
+                year_input_name: str(audit_year),
 
                 # Date range:
                 #'ctl00$MainContent$UcSearchFilters$DateProcessedControl$FromDate': '09/01/2019',
@@ -113,6 +221,7 @@ class FACSpider(Spider):
 
                 **filter_options,
             },
+            meta=self._session_meta(response),
             callback=self.parse_uniform_guidance_acknowledgement
         )
 
@@ -123,6 +232,7 @@ class FACSpider(Spider):
             formdata={
                 "ctl00$MainContent$chkAgree": "on"
             },
+            meta=self._session_meta(response),
             callback=self.parse_row_datas
         )
 
@@ -154,6 +264,7 @@ class FACSpider(Spider):
         #     "FACACCEPTEDDATE": "07/30/2019",
         #     "DATERECEIVED": "07/30/2019",
         # }
+        downloads = []
         for row in rows:
             row_data_common = {}
             expected_fields = FacSearchResultDocument.fields.keys()
@@ -201,59 +312,154 @@ class FACSpider(Spider):
                     'lnkbuttonForm': 'xlsx',
                 }[link_type]
                 row_data['file_name'] = f'{row_data["ID"]}{row_data["VERSION"]}.{ext}'
-                row_data['repeat_crawl'] = files.exists(os.path.join(
-                    settings.FAC_DOCUMENT_DIR, row_data['file_name']
-                ))
+                row_data['repeat_crawl'] = (
+                    row_data['file_name'] in self.saved_file_names
+                )
 
                 # If the file has already been downloaded, yield the result.
                 if row_data['repeat_crawl']:
                     yield row_data
 
-                # If the file has not been downloaded, download it and then
-                # yield it.
+                # If the file has not been downloaded, queue it for download.
                 else:
-                    yield self._do_post_back(
-                        response,
-                        **postback,
-                        callback=self.save_attachment,
-                        cb_kwargs={'row_data': row_data},
-                    )
-
-        # If there's a "next page", request it, recursing over this handler.
+                    downloads.append((postback, row_data))
+
+        # If there's a "next page", request it after this page's downloads,
+        # recursing over this handler.
         next_page_postback_url = response.xpath(
             '//*[@class="GridPager"]//td/span/../following-sibling::td/a/@href'
         ).extract_first()
-        if next_page_postback_url:
+        next_page = self._extract_postback(
+            next_page_postback_url
+        ) if next_page_postback_url else None
+
+        yield from self._continue_session(response, downloads, next_page)
+
+    def _continue_session(self, results_page, downloads, next_page):
+        """
+        Make the next request in this search session: the next queued
+        download from `results_page`, or if there are none left, the next page
+        of results. Only one request per session is in flight at a time.
+        """
+
+        if downloads:
+            (postback, row_data), *remaining = downloads
             yield self._do_post_back(
-                response,
-                **self._extract_postback(next_page_postback_url),
+                results_page,
+                **postback,
+                callback=self.save_attachment,
+                errback=self.attachment_failed,
+                cb_kwargs={
+                    'row_data': row_data,
+                    'results_page': results_page,
+                    'downloads': remaining,
+                    'next_page': next_page,
+                },
+                meta={
+                    'attachment_sink': AttachmentSink(
+                        os.path.join(
+                            settings.FAC_DOCUMENT_DIR, row_data['file_name']
+                        ),
+                        part_size=self.settings.getint('ATTACHMENT_PART_SIZE'),
+                    ),
+                },
+            )
+        elif next_page:
+            yield self._do_post_back(
+                results_page,
+                **next_page,
                 callback=self.parse_row_datas
             )
 
-    def save_attachment(self, response, *, row_data):
+    def save_attachment(
+        self, response, *, row_data, results_page, downloads=(), next_page=None
+    ):
         """
-        Save a PDF or Excel document from the given response.
+        Complete the save of a PDF or Excel document from the given response.
+        The document body has already been streamed to storage, by
+        `stream_attachment`, as it was downloaded.
         """
 
-        # Get the file name from the headers
-        #
-        pattern = re.compile(r'attachment;filename="(?P<file_name>.*)"')
-        match = pattern.match(response.headers['Content-Disposition'].decode())
-        file_name = match.group('file_name')
-
-        if row_data['file_name'] != file_name:
-            # Raise this as CloseSpider to make the error visible - this would
-            # indicate bad assumptions were made about the format of the
-            # system's file names.
-            raise CloseSpider(
-                f'Unexpected file name: `{file_name}`, expected: `{row_data["file_name"]}`'
-            )
+        sink = response.meta['attachment_sink']
+
+        try:
+            file_name = _attachment_file_name(response)
+
+            if row_data['file_name'] != file_name:
+                # This would indicate bad assumptions were made about the
+                # format of the system's file names, or that the session is
+                # out of step with the server; either way, later documents in
+                # the session can't be trusted.
+                sink.abort()
+                self._end_session(
+                    response,
+                    f'Unexpected file name: `{file_name}`, expected: `{row_data["file_name"]}`'
+                )
+                return
+
+            # The sink holds what was streamed for this response, unless it
+            # arrived without a body after an earlier attempt.
+            if sink.size != len(response.body):
+                raise ValueError(
+                    f'{sink.size} bytes saved of a {len(response.body)} byte response'
+                )
+
+            sink.close()
+        except Exception as error:  # pylint: disable=W0703
+            # Don't leave a partial document under the document's name, where
+            # later crawls would take it as downloaded.
+            sink.abort()
+            self.logger.error(f'Download of {row_data["file_name"]} failed: {error}')
+            yield from self._continue_session(results_page, downloads, next_page)
+            return
+
+        self.saved_file_names.add(file_name)
+
+        row_data['content_hash'] = sink.content_hash
+        row_data['file_size'] = sink.size
+        yield row_data
 
-        save_path = os.path.join(settings.FAC_DOCUMENT_DIR, file_name)
-        with files.output_file(save_path, 'wb') as out_file:
-            out_file.write(response.body)
+        yield from self._continue_session(results_page, downloads, next_page)
 
-        yield row_data
+    def attachment_failed(self, failure):
+        """
+        Discard a failed document download, and carry on with the rest of its
+        search session.
+        """
+
+        request = failure.request
+        request.meta['attachment_sink'].abort()
+        self.logger.error(
+            f'Download of {request.cb_kwargs["row_data"]["file_name"]} failed: {failure.value}'
+        )
+
+        yield from self._continue_session(
+            request.cb_kwargs['results_page'],
+            request.cb_kwargs['downloads'],
+            request.cb_kwargs['next_page'],
+        )
+
+    def _end_session(self, response, error):
+        """
+        Stop the search session of `response` (by not making its next
+        request), leaving the crawl's other sessions running.
+        """
+
+        self.crawler.stats.inc_value('search_sessions_failed')
+        self.logger.error(
+            f'Search session {response.meta["cookiejar"]} '
+            f'({response.meta["slice"]}) stopped: {error}'
+        )
+
+    def stream_attachment(self, data, request, spider):
+        """
+        `bytes_received` signal handler: write each chunk of a document
+        download to its sink as it arrives.
+        """
+
+        sink = request.meta.get('attachment_sink')
+        if sink is not None:
+            sink.write(data, attempt=request)
 
     def _extract_postback(self, url):
         pattern = re.compile(r"javascript:__doPostBack\('(?P<event_target>.*)','(?P<event_argument>.*)'\)$")
@@ -263,7 +469,17 @@ class FACSpider(Spider):
             'event_argument': match.group('event_argument'),
         }
 
-    def _do_post_back(self, response, *, event_target, event_argument, callback, cb_kwargs={}):
+    def _do_post_back(
+        self,
+        response,
+        *,
+        event_target,
+        event_argument,
+        callback,
+        errback=None,
+        cb_kwargs={},
+        meta={},
+    ):
         """
         ASP VIEWSTATE is modified by a server callback, which looks like this:
 
@@ -286,6 +502,16 @@ class FACSpider(Spider):
                 '__EVENTTARGET': event_target,
                 '__EVENTARGUMENT': event_argument
             },
+            meta={**self._session_meta(response), **meta},
             callback=callback,
+            errback=errback,
             cb_kwargs=cb_kwargs,
         )
+
+    def _session_meta(self, response):
+        # Carry the session's cookie jar and search parameters along to the
+        # next request in the session.
+        return {
+            'cookiejar': response.meta['cookiejar'],
+            'slice': response.meta['slice'],
+        }
@@ -0,0 +1,52 @@
+"""
+Tests for the FAC document store inventory.
+"""
+
+from ..etls import fac_documents, inventory
+
+
+def test_inventory_diff(tmp_path):
+    document_dir = tmp_path / 'fac-documents'
+    document_dir.mkdir()
+    for name in ('10165120181.pdf', '10165120181.xlsx'):
+        (document_dir / name).write_bytes(b'document')
+
+    inventory_path = str(tmp_path / 'inventory.csv')
+    assert inventory.load_inventory(inventory_path) is None
+
+    # Without a saved inventory, everything is new.
+    first = inventory.take_inventory(str(document_dir))
+    diff = inventory.diff_inventories(None, first)
+    assert len(diff.added) == 2
+    inventory.save_inventory(inventory_path, first)
+    assert inventory.load_inventory(inventory_path) == first
+
+    (document_dir / '10165120181.xlsx').unlink()
+    (document_dir / '10165120182.pdf').write_bytes(b'document')
+    # Documents are keyed by name, so a rewritten document is neither added
+    # nor removed.
+    (document_dir / '10165120181.pdf').write_bytes(b'new document')
+
+    diff = inventory.diff_inventories(
+        inventory.load_inventory(inventory_path),
+        inventory.take_inventory(str(document_dir)),
+    )
+    assert [obj.path for obj in diff.added] == [str(document_dir / '10165120182.pdf')]
+    assert [obj.path for obj in diff.removed] == [str(document_dir / '10165120181.xlsx')]
+
+
+def test_documents_from_filenames_skip_other_names():
+    documents = list(fac_documents._yield_documents_from_filenames([
+        's3://bucket/fac-documents/10165120181.pdf',
+        's3://bucket/fac-documents/10165120192.xlsx',
+        's3://bucket/fac-documents/README',
+        's3://bucket/fac-documents/10165120181.pdf.bak',
+    ]))
+
+    assert [
+        (document.dbkey, document.audit_year, document.version, document.file_type)
+        for document in documents
+    ] == [
+        ('101651', '2018', '1', 'audit'),
+        ('101651', '2019', '2', 'form'),
+    ]
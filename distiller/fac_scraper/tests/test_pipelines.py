@@ -0,0 +1,48 @@
+"""
+Tests for the FAC crawl item pipelines.
+"""
+
+from concurrent.futures import Future
+from unittest import mock
+
+from ..items import FacSearchResultDocument
+from ..pipelines import PdfExtractPipeline
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args)
+        return Future()
+
+
+def _item(**kwargs):
+    return FacSearchResultDocument(
+        AUDITYEAR='2019',
+        DBKEY='131854',
+        file_name='13185420191.pdf',
+        file_type='audit',
+        repeat_crawl=False,
+        **kwargs
+    )
+
+
+def test_only_new_audits_are_queued():
+    pipeline = PdfExtractPipeline(workers=1, stats=mock.Mock())
+    pipeline.executor = FakeExecutor()
+    spider = mock.Mock()
+
+    new_audit = _item()
+    repeat_audit = _item()
+    repeat_audit['repeat_crawl'] = True
+    form = _item()
+    form['file_type'] = 'form'
+
+    for item in (new_audit, repeat_audit, form):
+        assert pipeline.process_item(item, spider) is item
+
+    assert pipeline.executor.submitted == [
+        ('2019', '131854', '13185420191.pdf'),
+    ]
@@ -0,0 +1,230 @@
+"""
+Tests for the FAC search spider, run against a local copy of a search results
+page.
+"""
+
+import hashlib
+import os
+from unittest import mock
+
+import pytest
+from scrapy.http import HtmlResponse, Request, Response
+from scrapy.utils.test import get_crawler
+from twisted.python.failure import Failure
+
+from ..items import FacSearchResultDocument
+from ..spiders.reports import FACSpider
+
+
+RESULTS_PAGE_PATH = os.path.join(
+    os.path.dirname(__file__),
+    'data',
+    'search_results.html'
+)
+
+
+def _results_page(session_id=0):
+    search_slice = {'cfda_options': None, 'audit_year': '2019'}
+    request = Request(
+        'https://facdissem.census.gov/SearchA133.aspx',
+        meta={'cookiejar': session_id, 'slice': search_slice},
+    )
+    with open(RESULTS_PAGE_PATH, 'rb') as results_file:
+        return HtmlResponse(
+            url=request.url,
+            body=results_file.read(),
+            request=request,
+        )
+
+
+def _spider(**kwargs):
+    crawler = get_crawler(FACSpider, {'ATTACHMENT_PART_SIZE': 1024})
+    return FACSpider.from_crawler(crawler, **kwargs)
+
+
+def _attachment(spider, request, file_name):
+    # Stream the body through the `bytes_received` handler, as Scrapy would.
+    spider.stream_attachment(b'document', request, spider)
+    return Response(
+        url=request.url,
+        headers={'Content-Disposition': f'attachment;filename="{file_name}"'},
+        body=b'document',
+        request=request,
+    )
+
+
+@pytest.fixture
+def document_dir(settings, tmp_path):
+    settings.FAC_DOCUMENT_DIR = str(tmp_path)
+    return tmp_path
+
+
+def test_slices():
+    spider = _spider(cfda='10.1,93.04', audit_year='2018-2019')
+    assert [
+        (s['cfda_options'][0]['Prefix'], s['cfda_options'][0]['Ext'], s['audit_year'])
+        for s in spider.slices
+    ] == [
+        ('10', '1', '2018'),
+        ('10', '1', '2019'),
+        ('93', '04', '2018'),
+        ('93', '04', '2019'),
+    ]
+
+    requests = list(spider.start_requests())
+    assert [r.meta['cookiejar'] for r in requests] == [0, 1, 2, 3]
+
+
+def test_slices_require_cfda_or_dates():
+    with pytest.raises(ValueError):
+        FACSpider()
+
+
+@mock.patch('distiller.fac_scraper.spiders.reports.files')
+def test_session_requests_are_sequential(mock_files, document_dir):
+    mock_files.glob.return_value = []
+    spider = _spider(cfda='10.1', audit_year='2019')
+    list(spider.start_requests())
+
+    # A results page starts a single download in the page's session.
+    results_page = _results_page(session_id=3)
+    requests = list(spider.parse_row_datas(results_page))
+    assert len(requests) == 1
+    assert requests[0].meta['cookiejar'] == 3
+    assert requests[0].cb_kwargs['row_data']['file_name'] == '13185420191.xlsx'
+
+    # Saving that download makes the next download request in the session.
+    output = list(spider.save_attachment(
+        _attachment(spider, requests[0], '13185420191.xlsx'),
+        **requests[0].cb_kwargs
+    ))
+    assert isinstance(output[0], FacSearchResultDocument)
+    assert output[0]['content_hash'] == hashlib.sha256(b'document').hexdigest()
+    assert (document_dir / '13185420191.xlsx').read_bytes() == b'document'
+    assert len(output) == 2
+    assert output[1].meta['cookiejar'] == 3
+    assert output[1].cb_kwargs['row_data']['file_name'] == '13185420191.pdf'
+
+    # Once downloads are done, the session moves on to the next page.
+    output = list(spider.save_attachment(
+        _attachment(spider, output[1], '13185420191.pdf'),
+        **output[1].cb_kwargs
+    ))
+    assert output[1].callback == spider.parse_row_datas
+    assert output[1].meta['cookiejar'] == 3
+    assert b'Page%242' in output[1].body
+
+
+@mock.patch('distiller.fac_scraper.spiders.reports.files')
+def test_saved_documents_are_not_downloaded(mock_files, document_dir):
+    mock_files.glob.return_value = [
+        's3://bucket/fac-documents/13185420191.xlsx',
+        's3://bucket/fac-documents/13185420191.pdf',
+    ]
+    spider = _spider(cfda='10.1', audit_year='2019')
+    list(spider.start_requests())
+
+    output = list(spider.parse_row_datas(_results_page()))
+
+    # Both documents are yielded as repeat crawls, and the session moves on
+    # to the next page without downloading anything.
+    assert [item['repeat_crawl'] for item in output[:2]] == [True, True]
+    assert output[2].callback == spider.parse_row_datas
+    assert mock_files.glob.call_count == 1
+    mock_files.exists.assert_not_called()
+
+
+@mock.patch('distiller.fac_scraper.spiders.reports.files')
+def test_failed_download_continues_session(mock_files, document_dir):
+    mock_files.glob.return_value = []
+    spider = _spider(cfda='10.1', audit_year='2019')
+    list(spider.start_requests())
+
+    request, = spider.parse_row_datas(_results_page())
+    spider.stream_attachment(b'partial', request, spider)
+
+    failure = Failure(ConnectionError('connection lost'))
+    failure.request = request
+    output = list(spider.attachment_failed(failure))
+
+    # The partial document is discarded, and the session's next download is
+    # requested.
+    assert not (document_dir / '13185420191.xlsx').exists()
+    assert output[0].cb_kwargs['row_data']['file_name'] == '13185420191.pdf'
+
+
+@mock.patch('distiller.fac_scraper.spiders.reports.files')
+def test_retried_download_starts_over(mock_files, document_dir):
+    mock_files.glob.return_value = []
+    spider = _spider(cfda='10.1', audit_year='2019')
+    list(spider.start_requests())
+
+    request, = spider.parse_row_datas(_results_page())
+    # A first attempt gets an error page; the retry, a copy of the request
+    # sharing its meta, gets the document.
+    spider.stream_attachment(b'<html>Service Unavailable</html>', request, spider)
+    retry = request.copy()
+    output = list(spider.save_attachment(
+        _attachment(spider, retry, '13185420191.xlsx'), **retry.cb_kwargs
+    ))
+
+    assert (document_dir / '13185420191.xlsx').read_bytes() == b'document'
+    assert output[0]['content_hash'] == hashlib.sha256(b'document').hexdigest()
+    assert output[0]['file_size'] == len(b'document')
+
+
+@mock.patch('distiller.fac_scraper.spiders.reports.files')
+def test_response_without_document_continues_session(mock_files, document_dir):
+    mock_files.glob.return_value = []
+    spider = _spider(cfda='10.1', audit_year='2019')
+    list(spider.start_requests())
+
+    request, = spider.parse_row_datas(_results_page())
+    spider.stream_attachment(b'<html>Error</html>', request, spider)
+    response = HtmlResponse(
+        url=request.url, body=b'<html>Error</html>', request=request
+    )
+    output = list(spider.save_attachment(response, **request.cb_kwargs))
+
+    # The error page isn't saved as the document, and the session's next
+    # download is requested.
+    assert not (document_dir / '13185420191.xlsx').exists()
+    assert '13185420191.xlsx' not in spider.saved_file_names
+    assert len(output) == 1
+    assert output[0].cb_kwargs['row_data']['file_name'] == '13185420191.pdf'
+
+
+@mock.patch('distiller.fac_scraper.spiders.reports.files')
+def test_session_error_stops_only_its_session(mock_files, document_dir):
+    mock_files.glob.return_value = []
+    spider = _spider(cfda='10.1,93.04', audit_year='2019')
+    list(spider.start_requests())
+
+    # Session 0 gets the server's error page.
+    error_page = HtmlResponse(
+        url='https://facdissem.census.gov/SearchA133.aspx',
+        body=b'The requested URL was rejected. Please consult with your administrator.',
+        request=Request(
+            'https://facdissem.census.gov/SearchA133.aspx',
+            meta={'cookiejar': 0, 'slice': spider.slices[0]},
+        ),
+    )
+    assert spider.parse(error_page) is None
+
+    # Session 1 gets a different document than the one it asked for.
+    request, = spider.parse_row_datas(_results_page(session_id=1))
+    output = list(spider.save_attachment(
+        _attachment(spider, request, '99999920191.xlsx'), **request.cb_kwargs
+    ))
+    assert output == []
+    assert not (document_dir / '13185420191.xlsx').exists()
+
+    # Session 2 carries on with its downloads.
+    request, = spider.parse_row_datas(_results_page(session_id=2))
+    output = list(spider.save_attachment(
+        _attachment(spider, request, '13185420191.xlsx'), **request.cb_kwargs
+    ))
+    assert output[0]['file_name'] == '13185420191.xlsx'
+    assert output[1].meta['cookiejar'] == 2
+
+    assert spider.crawler.stats.get_value('search_sessions_failed') == 2
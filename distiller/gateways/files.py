@@ -3,14 +3,19 @@ Filesystem operations supporting S3 and local filesystem
 """
 
 import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from glob import glob as stdlib_glob
 from pathlib import Path
-from typing import cast, Any, IO, List, Optional
+from typing import cast, Any, Dict, IO, List, NamedTuple, Optional, Sequence
 from urllib.parse import urlparse
 
 import boto3
 import s3fs
 import smart_open
+from botocore.config import Config
 from django.conf import settings
 
 
@@ -18,25 +23,144 @@ class FileOpenFailure(Exception):
     pass
 
 
+class ObjectInfo(NamedTuple):
+    """
+    A file in a listing, with the metadata needed to detect changes.
+    """
+
+    path: str
+    size: int
+    etag: Optional[str]
+    last_modified: datetime
+
+
+# Key boundaries used to split a listing into ranges that may be listed
+# concurrently. FAC document names start with a DBKEY, so leading digits
+# split them into roughly even shards.
+DEFAULT_SHARD_BOUNDARIES = tuple('123456789')
+
+
+# Connection pool and retry configuration for all S3 clients. The pool is
+# sized for concurrent use of a shared client from worker threads.
+S3_CONFIG_KWARGS = {
+    'max_pool_connections': 32,
+    'retries': {
+        'max_attempts': 5,
+        'mode': 'standard',
+    },
+}
+
+# Count of S3 API calls made by this process, by operation name
+# (eg, `ListObjectsV2`, `HeadObject`, `UploadPart`).
+_s3_call_counts: Counter = Counter()
+
+# Process-wide cache of the boto3 session, S3 client and s3fs filesystem.
+# Creating these resolves credentials and sets up a new connection pool, so
+# they are shared across file operations rather than created per call. The
+# pooled connections are reused by `get_s3_client` users (eg, `move`) and by
+# `glob` and `exists`; files opened with smart_open share only the session.
+_s3_cache: Dict[str, Any] = {}
+_s3_cache_lock = threading.Lock()
+
+
+def _reset_s3_cache():
+    # boto3 sessions and their connection pools are not safe to share across
+    # a fork; child processes create their own. The lock may have been held
+    # by another thread of the parent when it forked, so it is replaced too.
+    global _s3_cache_lock  # pylint: disable=W0603
+    _s3_cache_lock = threading.Lock()
+    _s3_cache.clear()
+    _s3_call_counts.clear()
+
+
+os.register_at_fork(after_in_child=_reset_s3_cache)
+
+
+def _count_s3_call(model, **_kwargs):
+    _s3_call_counts[model.name] += 1
+
+
+def get_s3_call_counts() -> Dict[str, int]:
+    """
+    Get the number of S3 API calls made by this process, by operation.
+    """
+
+    return dict(_s3_call_counts)
+
+
+def write_s3_call_counts(out):
+    """
+    Write a summary of S3 API calls made by this process to `out`.
+    """
+
+    for operation, count in sorted(_s3_call_counts.items()):
+        out.write(f'S3 {operation}: {count} calls\n')
+
+
 def _get_boto3_session():
-    # Add AWS session credentials for S3
-    return boto3.Session(
-        aws_access_key_id=settings.S3_KEY_DETAILS['access_key_id'],
-        aws_secret_access_key=settings.S3_KEY_DETAILS['secret_access_key'],
-        region_name=settings.S3_KEY_DETAILS['region'],
-    )
+    with _s3_cache_lock:
+        if 'session' not in _s3_cache:
+            # Add AWS session credentials for S3
+            session = boto3.Session(
+                aws_access_key_id=settings.S3_KEY_DETAILS['access_key_id'],
+                aws_secret_access_key=settings.S3_KEY_DETAILS['secret_access_key'],
+                region_name=settings.S3_KEY_DETAILS['region'],
+            )
+            session.events.register('before-call.s3', _count_s3_call)
+            _s3_cache['session'] = session
+        return _s3_cache['session']
+
+
+def get_s3_client():
+    """
+    Get the shared boto3 S3 client. Clients are thread-safe, so this may be
+    used from worker threads.
+    """
+
+    session = _get_boto3_session()
+    with _s3_cache_lock:
+        if 'client' not in _s3_cache:
+            _s3_cache['client'] = session.client(
+                's3', config=Config(**S3_CONFIG_KWARGS)
+            )
+        return _s3_cache['client']
+
+
+def _get_s3fs():
+    session = _get_boto3_session()
+    with _s3_cache_lock:
+        if 'fs' not in _s3_cache:
+            _s3_cache['fs'] = s3fs.S3FileSystem(
+                anon=False,
+                session=session,
+                config_kwargs=S3_CONFIG_KWARGS,
+            )
+        return _s3_cache['fs']
 
 
 def _open(
-    scheme: str, path: str, mode: str, encoding: Optional[str] = None, **kwargs
+    scheme: str,
+    path: str,
+    mode: str,
+    encoding: Optional[str] = None,
+    part_size: Optional[int] = None,
+    **kwargs
 ) -> IO[Any]:
     transport_params = None
 
-    # If S3, create boto3 session with necessary credentials.
+    # If S3, use the shared boto3 session with the necessary credentials.
+    # smart_open 1.9 creates a new S3 resource, with its own connection
+    # pool, from the session for each file it opens; it can't be given the
+    # shared client.
     if scheme == 's3':
         transport_params = {
-            'session': _get_boto3_session()
+            'session': _get_boto3_session(),
+            'resource_kwargs': {'config': Config(**S3_CONFIG_KWARGS)},
         }
+        # Multipart upload part size; at most this much is buffered in memory
+        # while writing.
+        if part_size:
+            transport_params['min_part_size'] = part_size
 
     return cast(IO[Any], smart_open.open(
         path,
@@ -64,10 +188,15 @@ def input_file(
         raise FileOpenFailure(f'Load failure: {path} with error {e}')
 
 
-def output_file(path: str, mode: str = 'w') -> IO[Any]:
+def output_file(
+    path: str, mode: str = 'w', part_size: Optional[int] = None
+) -> IO[Any]:
     """
     Open a file for output purposes. Supports all filesystems supported by
     `smart_open`.
+
+    On S3, files are uploaded in parts of `part_size` bytes as they are
+    written (default: smart_open's `DEFAULT_MIN_PART_SIZE`).
     """
 
     url = urlparse(path)
@@ -76,7 +205,7 @@ def output_file(path: str, mode: str = 'w') -> IO[Any]:
     if url.scheme == '':
         Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
 
-    return _open(url.scheme, path, mode)
+    return _open(url.scheme, path, mode, part_size=part_size)
 
 
 def glob(path: str) -> List[str]:
@@ -92,7 +221,9 @@ def glob(path: str) -> List[str]:
         # s3fs won't expand non-globs
         if not any(char in url.path for char in ('*', '?')):
             return [path]
-        fs = s3fs.S3FileSystem(anon=False, session=_get_boto3_session())
+        fs = _get_s3fs()
+        # The filesystem is shared, so drop listings cached by earlier calls.
+        fs.invalidate_cache()
         return [
             f's3://{path}'
             for path in fs.glob(f'{url.netloc}{url.path}')
@@ -107,6 +238,105 @@ def glob(path: str) -> List[str]:
 def exists(path: str) -> bool:
     url = urlparse(path)
     if url.scheme == 's3':
-        fs = s3fs.S3FileSystem(anon=False)
+        fs = _get_s3fs()
+        fs.invalidate_cache()
         return fs.exists(path)
     return os.path.exists(path)
+
+
+def move(src: str, dest: str) -> None:
+    """
+    Move the file `src` to `dest`, on the same filesystem, replacing any
+    file at `dest`.
+    """
+
+    src_url = urlparse(src)
+    if src_url.scheme == 's3':
+        dest_url = urlparse(dest)
+        client = get_s3_client()
+        client.copy_object(
+            Bucket=dest_url.netloc,
+            Key=dest_url.path.lstrip('/'),
+            CopySource={'Bucket': src_url.netloc, 'Key': src_url.path.lstrip('/')},
+        )
+        client.delete_object(Bucket=src_url.netloc, Key=src_url.path.lstrip('/'))
+        return
+    os.replace(src, dest)
+
+
+def delete(path: str) -> None:
+    """
+    Delete the file `path`, if it exists.
+    """
+
+    url = urlparse(path)
+    if url.scheme == 's3':
+        get_s3_client().delete_object(Bucket=url.netloc, Key=url.path.lstrip('/'))
+        return
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _list_s3_shard(bucket: str, prefix: str, lower: Optional[str], upper: Optional[str]):
+    # List keys under `prefix` in the range (prefix + lower, prefix + upper).
+    paginator = get_s3_client().get_paginator('list_objects_v2')
+    # With a delimiter, keys in "subdirectories" are grouped into common
+    # prefixes rather than listed.
+    kwargs = {'Bucket': bucket, 'Prefix': prefix, 'Delimiter': '/'}
+    if lower:
+        kwargs['StartAfter'] = prefix + lower
+
+    objects = []
+    for page in paginator.paginate(**kwargs):
+        for obj in page.get('Contents', []):
+            if upper and obj['Key'] >= prefix + upper:
+                return objects
+            objects.append(ObjectInfo(
+                path=f's3://{bucket}/{obj["Key"]}',
+                size=obj['Size'],
+                etag=obj['ETag'].strip('"'),
+                last_modified=obj['LastModified'],
+            ))
+    return objects
+
+
+def list_objects(
+    path: str,
+    shard_boundaries: Sequence[str] = DEFAULT_SHARD_BOUNDARIES,
+    workers: int = 8,
+) -> List[ObjectInfo]:
+    """
+    List all files directly under the directory `path` (not in its
+    subdirectories), with their size, ETag (S3 only) and last-modified time,
+    in alpha-numeric sort order.
+
+    On S3, the key space is split into ranges at `shard_boundaries`, which are
+    listed concurrently. Keys exactly equal to a boundary are not listed.
+    """
+
+    url = urlparse(str(path))
+
+    if url.scheme == 's3':
+        prefix = url.path.lstrip('/').rstrip('/') + '/'
+        bounds = [None, *shard_boundaries, None]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            shards = executor.map(
+                lambda shard: _list_s3_shard(url.netloc, prefix, *shard),
+                zip(bounds[:-1], bounds[1:]),
+            )
+            return [obj for shard in shards for obj in shard]
+
+    # Assume filesystem path
+    objects = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            objects.append(ObjectInfo(
+                path=entry.path,
+                size=stat.st_size,
+                etag=None,
+                last_modified=datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+            ))
+    return sorted(objects)
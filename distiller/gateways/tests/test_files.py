@@ -0,0 +1,77 @@
+"""
+Tests for the filesystem gateway's S3 session handling.
+"""
+
+from unittest import mock
+
+import pytest
+
+from .. import files
+
+
+@pytest.fixture
+def s3_settings(settings):
+    settings.S3_KEY_DETAILS = {
+        'access_key_id': 'XX',
+        'secret_access_key': 'XXX',
+        'region': 'us-gov-west-1',
+        'bucket': 'XX',
+    }
+    files._reset_s3_cache()
+    yield settings
+    files._reset_s3_cache()
+
+
+@mock.patch.object(files.boto3, 'Session')
+def test_session_is_shared(mock_session, s3_settings):
+    assert files._get_boto3_session() is files._get_boto3_session()
+    assert files.get_s3_client() is files.get_s3_client()
+    assert mock_session.call_count == 1
+    mock_session.return_value.client.assert_called_once()
+
+    # A forked child process starts over with its own session.
+    files._reset_s3_cache()
+    files._get_boto3_session()
+    assert mock_session.call_count == 2
+
+
+def test_forked_child_gets_unlocked_cache(s3_settings):
+    # Another thread of the parent may hold the lock when it forks.
+    with files._s3_cache_lock:
+        files._reset_s3_cache()
+        assert not files._s3_cache_lock.locked()
+
+
+def test_s3_calls_are_counted(s3_settings):
+    for operation in ('HeadObject', 'ListObjectsV2', 'HeadObject'):
+        model = mock.Mock()
+        model.name = operation
+        files._count_s3_call(model)
+
+    assert files.get_s3_call_counts() == {'HeadObject': 2, 'ListObjectsV2': 1}
+
+
+@mock.patch.object(files, 'get_s3_client')
+def test_list_objects_shards(mock_get_client):
+    keys = ['fac-documents/10165120181.pdf', 'fac-documents/2345620191.pdf',
+            'fac-documents/9876520191.xlsx']
+
+    nested_keys = ['fac-documents/2019/10165120191.pdf']
+
+    def paginate(Bucket, Prefix, Delimiter, StartAfter=''):
+        # Keys under a delimiter after the prefix are left out of Contents.
+        yield {'Contents': [
+            {'Key': key, 'Size': 1, 'ETag': '"abc"', 'LastModified': None}
+            for key in sorted(keys + nested_keys)
+            if key > StartAfter and Delimiter not in key[len(Prefix):]
+        ]}
+
+    mock_get_client.return_value.get_paginator.return_value.paginate = paginate
+
+    objects = files.list_objects(
+        's3://bucket/fac-documents', shard_boundaries=('2', '5')
+    )
+
+    # Each key is listed once, by the shard covering it, in sort order.
+    assert [obj.path for obj in objects] == [f's3://bucket/{key}' for key in keys]
+    assert objects[0].etag == 'abc'
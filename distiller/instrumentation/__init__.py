@@ -0,0 +1,4 @@
+"""
+Prometheus-style metrics for the search pages and ETL jobs, served at
+`/metrics`.
+"""
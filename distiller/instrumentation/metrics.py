@@ -0,0 +1,90 @@
+"""
+Metrics recorded by the web app and ETL jobs.
+
+Durations are in seconds. Rates (e.g. PDF pages per second) are derived by
+Prometheus from the counters, with `rate()`.
+"""
+
+from .registry import Counter, Gauge, Histogram
+
+
+# Search pages
+
+REQUEST_LATENCY = Histogram(
+    'distiller_request_duration_seconds',
+    'Time to respond to a request, by view and the query parameters given.',
+    labelnames=('view', 'method', 'params'),
+)
+REQUEST_QUERIES = Histogram(
+    'distiller_request_db_queries',
+    'Database queries made per request, by view.',
+    labelnames=('view',),
+    buckets=(1, 2, 5, 10, 25, 50, 100),
+)
+REQUEST_QUERY_DURATION = Histogram(
+    'distiller_request_db_query_duration_seconds',
+    'Time spent on database queries per request, by view.',
+    labelnames=('view',),
+)
+ROWS_EXPORTED = Counter(
+    'distiller_rows_exported_total',
+    'Search results exported to CSV.',
+)
+
+
+# FAC document crawls
+
+CRAWL_ITEMS = Counter(
+    'distiller_crawl_items_total',
+    'Documents found by the FAC crawler.',
+    labelnames=('spider',),
+)
+CRAWL_DURATION = Counter(
+    'distiller_crawl_duration_seconds_total',
+    'Time spent crawling the FAC.',
+    labelnames=('spider',),
+)
+CRAWL_LAST_ITEMS_PER_SECOND = Gauge(
+    'distiller_crawl_last_items_per_second',
+    'Documents found per second by the most recent crawl.',
+    labelnames=('spider',),
+)
+
+
+# PDF extraction
+
+PDF_DOCUMENTS = Counter(
+    'distiller_pdf_documents_total',
+    'Audit PDFs processed, by outcome.',
+    labelnames=('outcome',),
+)
+PDF_PAGES = Counter(
+    'distiller_pdf_pages_total',
+    'Pages of audit PDFs analyzed.',
+)
+PDF_DURATION = Counter(
+    'distiller_pdf_duration_seconds_total',
+    'Time spent reading and analyzing audit PDFs.',
+)
+PDF_LAST_PAGES_PER_SECOND = Gauge(
+    'distiller_pdf_last_pages_per_second',
+    'Pages analyzed per second by the most recent extraction run.',
+)
+
+
+def record_pdf_extraction(metrics) -> None:
+    """
+    Record PDF extraction `metrics` (an `etls.metrics.RunMetrics`).
+    """
+
+    for outcome in ('extracted', 'rejected', 'missing'):
+        count = metrics.counts.get(f'pdfs_{outcome}')
+        if count:
+            PDF_DOCUMENTS.inc(count, outcome=outcome)
+
+    pages = metrics.counts.get('pages', 0)
+    seconds = metrics.phases.get('read', 0) + metrics.phases.get('analyze', 0)
+    PDF_PAGES.inc(pages)
+    PDF_DURATION.inc(seconds)
+    if seconds:
+        PDF_LAST_PAGES_PER_SECOND.set(pages / seconds)
@@ -0,0 +1,78 @@
+"""
+Django middleware recording request metrics.
+"""
+
+import time
+
+from django.db import connection
+
+from ..audit_search.forms import AgencySelectionForm
+from . import metrics
+
+
+# Query parameters used as the `params` label. Any others are labelled
+# `other`, so that clients can't create new label combinations.
+PARAM_NAMES = frozenset(AgencySelectionForm.base_fields)
+
+
+def get_param_names(request) -> str:
+    """
+    Return the names of the non-empty search query parameters of `request`,
+    e.g. "agency,audit_year" for a search by agency and audit year.
+    """
+
+    names = set()
+    for name, values in request.GET.lists():
+        if any(values):
+            names.add(name if name in PARAM_NAMES else 'other')
+    return ','.join(sorted(names))
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting and timing queries.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.monotonic() - start
+
+
+class MetricsMiddleware:
+    """
+    Record the latency and database queries of each request, by view.
+
+    Streaming responses (CSV exports) are timed up to the start of the
+    response, not until the last row is sent.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryRecorder()
+        start = time.monotonic()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        duration = time.monotonic() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.REQUEST_LATENCY.observe(
+            duration,
+            view=view,
+            method=request.method,
+            params=get_param_names(request),
+        )
+        metrics.REQUEST_QUERIES.observe(queries.count, view=view)
+        metrics.REQUEST_QUERY_DURATION.observe(queries.duration, view=view)
+
+        return response
@@ -0,0 +1,238 @@
+"""
+Minimal counters, gauges and histograms, rendered in the Prometheus text
+exposition format.
+
+Metrics are kept in memory, per process. Batch jobs (crawls, PDF
+extraction) don't live long enough to be scraped, so when they finish they
+save a snapshot of their metrics to `settings.METRICS_ROOT`, which the
+`/metrics` view merges with the web process's own.
+"""
+
+import json
+import math
+import os
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from django.conf import settings
+
+from ..gateways import files
+
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Label added to the metrics of each batch job's snapshot
+JOB_LABEL = 'etl_job'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, 'Metric'] = {}
+
+    def register(self, metric: 'Metric') -> None:
+        if metric.name in self.metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self.metrics[metric.name] = metric
+
+    def collect(self) -> Dict[str, dict]:
+        """
+        Return a JSON-serializable snapshot of every metric, keyed by name.
+        """
+
+        return {
+            name: {
+                'type': metric.type,
+                'help': metric.help,
+                'samples': metric.samples(),
+            }
+            for name, metric in self.metrics.items()
+        }
+
+    def reset(self) -> None:
+        for metric in self.metrics.values():
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    type = ''
+
+    def __init__(
+        self,
+        name: str,
+        help: str,  # pylint: disable=W0622
+        labelnames: Sequence[str] = (),
+        registry: Registry = REGISTRY,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}'
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values = {}
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """
+        Return (name suffix, labels, value) for each sample.
+        """
+
+        with self._lock:
+            return [
+                ('', self._labels(key), value)
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            counts = [
+                count + (value <= bound)
+                for count, bound in zip(counts, self.buckets)
+            ]
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+
+        samples = []
+        for key, (counts, total) in values:
+            labels = self._labels(key)
+            for count, bound in zip(counts, self.buckets):
+                samples.append(
+                    ('_bucket', {**labels, 'le': _format_value(bound)}, count)
+                )
+            samples.append(('_sum', labels, total))
+            samples.append(('_count', labels, counts[-1]))
+        return samples
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def render(snapshots: Iterable[Dict[str, dict]]) -> str:
+    """
+    Render metric snapshots (see `Registry.collect`) in the Prometheus text
+    format. Samples of a metric found in several snapshots are merged under
+    one metric; metrics without samples are left out.
+    """
+
+    families: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, family in snapshot.items():
+            merged = families.setdefault(
+                name, {'type': family['type'], 'help': family['help'], 'samples': []}
+            )
+            merged['samples'].extend(family['samples'])
+
+    lines = []
+    for name, family in sorted(families.items()):
+        if not family['samples']:
+            continue
+        lines.append(f'# HELP {name} {family["help"]}')
+        lines.append(f'# TYPE {name} {family["type"]}')
+        for suffix, labels, value in family['samples']:
+            label_str = ','.join(
+                f'{label}="{_escape(str(label_value))}"'
+                for label, label_value in labels.items()
+            )
+            lines.append(
+                f'{name}{suffix}{{{label_str}}} {_format_value(value)}'
+                if label_str else
+                f'{name}{suffix} {_format_value(value)}'
+            )
+    return '\n'.join(lines) + '\n'
+
+
+def save_job_metrics(job: str, registry: Registry = REGISTRY) -> None:
+    """
+    Save a snapshot of this process's metrics as those of batch job `job`,
+    replacing the job's previous snapshot. Does nothing unless
+    `settings.METRICS_ROOT` is set.
+    """
+
+    if not settings.METRICS_ROOT:
+        return
+
+    snapshot = {
+        name: {
+            **family,
+            'samples': [
+                (suffix, {**labels, JOB_LABEL: job}, value)
+                for suffix, labels, value in family['samples']
+            ],
+        }
+        for name, family in registry.collect().items()
+        if family['samples']
+    }
+    path = os.path.join(settings.METRICS_ROOT, f'{job}.json')
+    with files.output_file(path, mode='w') as out_file:
+        json.dump(snapshot, out_file)
+
+
+def load_job_metrics() -> List[Dict[str, dict]]:
+    """
+    Load the most recent snapshot saved by each batch job.
+    """
+
+    if not settings.METRICS_ROOT:
+        return []
+
+    snapshots = []
+    for path in files.glob(os.path.join(settings.METRICS_ROOT, '*.json')):
+        with files.input_file(path, mode='r') as in_file:
+            snapshots.append(json.load(in_file))
+    return snapshots
@@ -0,0 +1,104 @@
+"""
+Tests for Prometheus-style metrics.
+"""
+
+import pytest
+
+from . import registry
+from .metrics import record_pdf_extraction
+from .views import CONTENT_TYPE
+from ..data.etls.metrics import RunMetrics
+
+
+@pytest.fixture
+def metrics_registry():
+    registry.REGISTRY.reset()
+    yield registry.REGISTRY
+    registry.REGISTRY.reset()
+
+
+def test_render():
+    test_registry = registry.Registry()
+    counter = registry.Counter(
+        'test_total', 'A counter.', labelnames=('kind',), registry=test_registry
+    )
+    histogram = registry.Histogram(
+        'test_seconds', 'A histogram.', buckets=(0.1, 1), registry=test_registry
+    )
+    registry.Gauge('test_unset', 'A gauge with no value.', registry=test_registry)
+
+    counter.inc(kind='a "quoted" kind')
+    counter.inc(2, kind='a "quoted" kind')
+    histogram.observe(0.5)
+    histogram.observe(2)
+
+    assert registry.render([test_registry.collect()]) == (
+        '# HELP test_seconds A histogram.\n'
+        '# TYPE test_seconds histogram\n'
+        'test_seconds_bucket{le="0.1"} 0\n'
+        'test_seconds_bucket{le="1"} 1\n'
+        'test_seconds_bucket{le="+Inf"} 2\n'
+        'test_seconds_sum 2.5\n'
+        'test_seconds_count 2\n'
+        '# HELP test_total A counter.\n'
+        '# TYPE test_total counter\n'
+        'test_total{kind="a \\"quoted\\" kind"} 3\n'
+    )
+
+    with pytest.raises(ValueError):
+        counter.inc()
+
+
+def test_job_metrics_are_merged(metrics_registry, settings, tmp_path):
+    settings.METRICS_ROOT = str(tmp_path)
+
+    run = RunMetrics()
+    run.phases['analyze'] = 4
+    run.counts.update({'pages': 20, 'pdfs_extracted': 2})
+    record_pdf_extraction(run)
+    registry.save_job_metrics('extract_pdfs')
+    metrics_registry.reset()
+
+    text = registry.render([
+        metrics_registry.collect(),
+        *registry.load_job_metrics(),
+    ])
+    assert 'distiller_pdf_pages_total{etl_job="extract_pdfs"} 20\n' in text
+    assert 'distiller_pdf_last_pages_per_second{etl_job="extract_pdfs"} 5\n' in text
+    assert (
+        'distiller_pdf_documents_total{outcome="extracted",etl_job="extract_pdfs"} 2\n'
+    ) in text
+    assert text.count('# TYPE distiller_pdf_pages_total counter') == 1
+
+
+def test_metrics_endpoint_records_requests(client, metrics_registry, settings):
+    settings.METRICS_TOKEN = 'token'
+    auth = {'HTTP_AUTHORIZATION': 'Bearer token'}
+    client.get('/metrics', {'agency': '93', 'page': ''}, **auth)
+    client.get('/metrics', {'agency': '93', 'x1': '1', 'x2': '2'}, **auth)
+    response = client.get('/metrics', **auth)
+
+    assert response['Content-Type'] == CONTENT_TYPE
+    text = response.content.decode()
+    assert (
+        'distiller_request_duration_seconds_count'
+        '{view="metrics",method="GET",params="agency"} 1\n'
+    ) in text
+    # Unknown parameters share a label value.
+    assert (
+        'distiller_request_duration_seconds_count'
+        '{view="metrics",method="GET",params="agency,other"} 1\n'
+    ) in text
+    assert 'distiller_request_db_queries_count{view="metrics"} 2\n' in text
+
+
+def test_metrics_endpoint_requires_token(client, settings):
+    settings.METRICS_TOKEN = 'token'
+    assert client.get('/metrics').status_code == 401
+    assert client.get(
+        '/metrics', HTTP_AUTHORIZATION='Bearer wrong'
+    ).status_code == 401
+
+    settings.METRICS_TOKEN = None
+    settings.DEBUG = False
+    assert client.get('/metrics').status_code == 404
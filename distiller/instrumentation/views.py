@@ -0,0 +1,35 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from . import registry
+
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics(request):
+    """
+    Serve this process's metrics, and those last saved by each batch job.
+
+    Requests must be authorized with the bearer token `METRICS_TOKEN`. If
+    it isn't set, metrics are only served in DEBUG mode.
+    """
+
+    token = settings.METRICS_TOKEN
+    if token:
+        authorization = request.META.get('HTTP_AUTHORIZATION', '')
+        if not hmac.compare_digest(authorization, f'Bearer {token}'):
+            return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    elif not settings.DEBUG:
+        raise Http404()
+
+    return HttpResponse(
+        registry.render([
+            registry.REGISTRY.collect(),
+            *registry.load_job_metrics(),
+        ]),
+        content_type=CONTENT_TYPE,
+    )
@@ -22,6 +22,25 @@ LOAD_TABLE_ROOT = None
 # In production, it may be an S3 url (s3://...)
 FAC_DOCUMENT_DIR = None
 
+# Set this to the path to save the listing of `FAC_DOCUMENT_DIR` to. Each
+# document load compares the current listing to this one to find new
+# documents.
+# On local dev, this may be a filesystem path.
+# In production, it may be an S3 url (s3://...)
+FAC_DOCUMENT_INVENTORY = None
+
+# Memory for each index build after a table load. Index builds are much
+# faster when the sort fits in memory; this applies to the loading session
+# only.
+ETL_MAINTENANCE_WORK_MEM = os.environ.get('ETL_MAINTENANCE_WORK_MEM', '256MB')
+
+# Worker processes parsing pipe-delimited table dumps while they are loaded.
+# With 1, dumps are parsed in the loading process. Each worker is a forked
+# copy of the loading process that also holds a few 4MB chunks of the dump
+# and their parsed rows, so size this to the task's memory limit rather than
+# its CPU count, which in containers reports the host's cores.
+ETL_PARSE_WORKERS = int(os.environ.get('ETL_PARSE_WORKERS', min(os.cpu_count() or 1, 2)))
+
 # Set this to the root https path for FAC documents.
 # On local dev, this may be a filesystem path.
 # In production, it may be an S3 url (s3://...)
@@ -32,6 +51,21 @@ FAC_DOWNLOAD_ROOT = None
 # In production, it may be an S3 url (s3://...)
 FAC_CRAWL_ROOT = None
 
+# Set this to the path batch jobs (crawls, PDF extraction) save their metrics
+# to, for the `/metrics` endpoint. If unset, only the web process's metrics
+# are served.
+# On local dev, this may be a filesystem path.
+# In production, it may be an S3 url (s3://...)
+METRICS_ROOT = None
+
+# Bearer token required to read `/metrics`, which is otherwise only served in
+# DEBUG mode.
+METRICS_TOKEN = None
+
+# Set this to a number of seconds to log search queries slower than that, with
+# their query plans, to the `SlowQuery` table (see `audit_search.profiling`).
+SLOW_QUERY_THRESHOLD = None
+
 # Set this to a dict of the form:
 # {'access_key_id': 'XX',
 #  'secret_access_key': 'XXX',
@@ -68,6 +102,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'distiller.instrumentation.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
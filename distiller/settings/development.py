@@ -13,5 +13,6 @@ SECRET_KEY = 'SECRET'
 
 LOAD_TABLE_ROOT = str(PROJECT_ROOT / 'imports')
 FAC_DOCUMENT_DIR = PROJECT_ROOT / 'fac-documents'
+FAC_DOCUMENT_INVENTORY = str(PROJECT_ROOT / 'fac-inventory' / 'documents.csv')
 FAC_CRAWL_ROOT = PROJECT_ROOT / 'fac-crawls'
 FAC_DOWNLOAD_ROOT = FAC_CRAWL_ROOT
@@ -14,6 +14,14 @@ ADMINS = [
 SECRET_KEY = os.environ['SECRET_KEY']
 
 DEBUG = bool(os.environ.get('DEBUG'))
+
+# Bearer token for the metrics endpoint; unset, `/metrics` isn't served.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Log search queries slower than this many seconds; see `audit_search.profiling`.
+if os.environ.get('SLOW_QUERY_THRESHOLD'):
+    SLOW_QUERY_THRESHOLD = float(os.environ['SLOW_QUERY_THRESHOLD'])
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -63,7 +71,9 @@ VCAP_SERVICES_SECRET = json.loads(os.environ['VCAP_SERVICES'])
 S3_KEY_DETAILS = VCAP_SERVICES_SECRET['s3'][0]['credentials']
 LOAD_TABLE_ROOT = f's3://{S3_KEY_DETAILS["bucket"]}/data-sources'
 FAC_DOCUMENT_DIR = f's3://{S3_KEY_DETAILS["bucket"]}/fac-documents'
+FAC_DOCUMENT_INVENTORY = f's3://{S3_KEY_DETAILS["bucket"]}/fac-inventory/documents.csv'
 FAC_CRAWL_ROOT = f's3://{S3_KEY_DETAILS["bucket"]}/fac-crawls'
+METRICS_ROOT = f's3://{S3_KEY_DETAILS["bucket"]}/metrics'
 # Example:
 # https://s3-us-gov-west-1.amazonaws.com/cg-d344f772-e57b-42a2-bb24-fe9c8d057351/fac-documents/
 FAC_DOWNLOAD_ROOT = f'https://s3-{S3_KEY_DETAILS["region"]}.amazonaws.com/{S3_KEY_DETAILS["bucket"]}/fac-documents/'
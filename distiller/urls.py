@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from distiller.instrumentation.views import metrics
+
 
 admin.site.site_header = "FAC Distiller Admin"
 admin.site.site_title = "FAC Distiller Admin Portal"
@@ -8,5 +10,6 @@ admin.site.index_title = "Welcome to FAC Distiller Portal"
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('', include('distiller.audit_search.urls', namespace='audit_search')),
 ]